@@ -0,0 +1,86 @@
+import shutil
+import statistics
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+
+
+# Root of the repository
+REPO_ROOT = Path(__file__).resolve().parent.parent
+# Source directory of the webhook_user_notification_service, the service is run from here
+SERVICE_APP_DIR = REPO_ROOT / "webhook_user_notification_service" / "app"
+# Source directory of the webhook_receiver, the receiver is run from here
+RECEIVER_DIR = REPO_ROOT / "webhook_receiver"
+
+# Runtime files of the service that are not copied along with its source
+_RUNTIME_FILES = (
+    "__pycache__",
+    "webhook_outbox.db*",
+    "webhook_data.db*",
+    "webhook_data.journal",
+    "webhook_data.lock",
+)
+
+
+def copy_service(destination: Path) -> Path:
+    """
+    Copy the source of the webhook_user_notification_service to a scratch directory.
+
+    Benchmarks run the service from the copy, so the webhook registry, the outbox and the
+    SQLite database they fill up never touch the files of the working tree.
+
+    Args:
+        destination (Path): The directory to copy the service into. Must not exist yet.
+
+    Returns:
+        app_dir (Path): The directory of the copy to run the service from.
+    """
+    shutil.copytree(SERVICE_APP_DIR, destination, ignore=shutil.ignore_patterns(*_RUNTIME_FILES))
+    return destination
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> Optional[float]:
+    """
+    Return the nearest-rank percentile of sorted values, or None if there are no values.
+
+    Args:
+        sorted_values (Sequence[float]): The values in ascending order.
+        fraction (float): The percentile as a fraction, e.g. 0.99 for p99.
+    """
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize_latencies(latencies: List[float]) -> Dict[str, Optional[float]]:
+    """
+    Summarize latencies (in seconds) as their count, mean, p50, p99 and maximum.
+    """
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values) if values else None,
+        "p50": percentile(values, 0.50),
+        "p99": percentile(values, 0.99),
+        "max": values[-1] if values else None,
+    }
+
+
+def format_seconds(value: Optional[float], unit: str = "ms") -> str:
+    """
+    Format a duration in seconds as milliseconds ("ms") or microseconds ("us") for a report table.
+    """
+    if value is None:
+        return "-"
+    scale = 1_000_000 if unit == "us" else 1_000
+    return f"{value * scale:.1f}{unit}"
+
+
+def format_table(header: Sequence[str], rows: List[Sequence[str]]) -> str:
+    """
+    Format rows of strings as a plain-text table with right-aligned columns.
+    """
+    widths = [max(len(str(row[column])) for row in [header, *rows]) for column in range(len(header))]
+    lines = ["  ".join(str(cell).rjust(width) for cell, width in zip(row, widths)) for row in [header, *rows]]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
@@ -0,0 +1,335 @@
+"""
+Load test of the webhook_user_notification_service fanning out to local webhook_receiver instances.
+
+The harness starts the service from a scratch copy of its source and `--receivers` receivers, of
+which `--slow-receivers` answer every webhook after `--receiver-latency` seconds and
+`--failing-receivers` reject a `--receiver-error-rate` fraction of the webhooks with a 503. Every
+receiver is subscribed to both events. The harness then drives, one phase after the other and
+each at `--rate` requests per second for `--duration` seconds:
+
+    users     POST /users
+    messages  POST /users/messages
+    ping      POST /ping (at `--ping-rate`)
+    register  POST /webhook
+
+Requests are sent open-loop: a request is started at its scheduled time whether or not the
+earlier ones have completed, so a slow service shows up as latency instead of a lower request
+rate. Once all phases are done, the harness waits until the outbox is drained and reports the
+throughput and p50/p99 latency of every phase, plus the delivery lag (event creation to receipt,
+including retries) measured by every receiver.
+
+Usage:
+    python benchmarks/load_test.py --receivers 4 --slow-receivers 1 --failing-receivers 1 --rate 50 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from bench_utils import RECEIVER_DIR, copy_service, format_seconds, format_table, summarize_latencies
+
+
+
+# Port of the service, the receivers listen on the following ports
+DEFAULT_SERVICE_PORT = 8100
+# Maximum time (in seconds) to wait for a started service or receiver to accept requests
+STARTUP_TIMEOUT_SECONDS = 30.0
+# Timeout (in seconds) of every request sent by the load generator
+REQUEST_TIMEOUT_SECONDS = 30.0
+# Interval (in seconds) between two checks of the outbox while waiting for it to drain
+DRAIN_POLL_INTERVAL_SECONDS = 0.5
+# Matches the sample of the pending deliveries gauge in the service's /metrics output
+_OUTBOX_PENDING_PATTERN = re.compile(r"^webhook_outbox_pending (\S+)$", re.MULTILINE)
+
+
+@dataclass
+class ReceiverSpec:
+    """
+    A webhook_receiver instance started by the harness.
+
+    Attributes:
+        port (int): The port the receiver listens on.
+        latency_seconds (float): The injected delay before every webhook is answered.
+        error_rate (float): The injected fraction of webhooks that are rejected.
+    """
+    port: int
+    latency_seconds: float = 0.0
+    error_rate: float = 0.0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+
+def _start_server(cwd: Path, port: int, env: Dict[str, str], workers: int = 1) -> subprocess.Popen:
+    """
+    Start `main:app` from a directory with uvicorn in a subprocess, with the given number of worker processes.
+    """
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        cwd=cwd,
+        env={**os.environ, **env},
+        stdout=subprocess.DEVNULL,
+    )
+
+
+async def _wait_until_ready(client: httpx.AsyncClient, url: str, process: subprocess.Popen) -> None:
+    """
+    Wait until a started server answers a GET request.
+
+    Raises:
+        RuntimeError: If the server exits or does not answer within the startup timeout.
+    """
+    deadline = time.monotonic() + STARTUP_TIMEOUT_SECONDS
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"The server for {url} exited with code {process.returncode}.")
+        try:
+            await client.get(url)
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"The server for {url} did not start within {STARTUP_TIMEOUT_SECONDS} seconds.")
+
+
+async def _drive(
+    rate: float,
+    duration: float,
+    send: Callable[[int], Awaitable[httpx.Response]],
+) -> Dict[str, Any]:
+    """
+    Start `rate * duration` requests at a fixed rate and wait for all of them to complete.
+
+    Args:
+        rate (float): The number of requests started per second.
+        duration (float): The time (in seconds) over which the requests are started.
+        send (Callable[[int], Awaitable[httpx.Response]]): Sends the request with the given sequence number.
+
+    Returns:
+        result (Dict[str, Any]): The number of sent, successful and failed requests, the throughput
+            of successful requests and the latency summary of all completed requests.
+    """
+    latencies: List[float] = []
+    failures: Dict[str, int] = {}
+
+    async def measure(sequence: int) -> None:
+        started_at = time.perf_counter()
+        try:
+            response = await send(sequence)
+            outcome = None if response.is_success else str(response.status_code)
+        except httpx.HTTPError as error:
+            outcome = type(error).__name__
+        latencies.append(time.perf_counter() - started_at)
+        if outcome is not None:
+            failures[outcome] = failures.get(outcome, 0) + 1
+
+    total = int(rate * duration)
+    tasks: List[asyncio.Task] = []
+    started_at = time.perf_counter()
+    for sequence in range(total):
+        delay = started_at + sequence / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(measure(sequence)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started_at
+
+    failed = sum(failures.values())
+    return {
+        "sent": total,
+        "succeeded": total - failed,
+        "failed": failed,
+        "failures": failures,
+        "elapsed_seconds": elapsed,
+        "throughput": (total - failed) / elapsed if elapsed > 0 else None,
+        "latency_seconds": summarize_latencies(latencies),
+    }
+
+
+async def _outbox_pending(client: httpx.AsyncClient, service_url: str) -> Optional[float]:
+    """
+    Read the number of pending deliveries from the service's metrics.
+    """
+    response = await client.get(f"{service_url}/metrics")
+    match = _OUTBOX_PENDING_PATTERN.search(response.text)
+    return float(match.group(1)) if match else None
+
+
+async def _wait_for_drain(client: httpx.AsyncClient, service_url: str, timeout: float) -> Dict[str, Any]:
+    """
+    Wait until the outbox holds no pending deliveries, or until the timeout has passed.
+    """
+    started_at = time.monotonic()
+    pending = await _outbox_pending(client, service_url)
+    while pending and time.monotonic() - started_at < timeout:
+        await asyncio.sleep(DRAIN_POLL_INTERVAL_SECONDS)
+        pending = await _outbox_pending(client, service_url)
+    return {"seconds": time.monotonic() - started_at, "pending": pending}
+
+
+async def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Start the service and the receivers, run every load phase and collect the results.
+    """
+    receivers = [ReceiverSpec(port=args.service_port + 1 + index) for index in range(args.receivers)]
+    for receiver in receivers[:args.slow_receivers]:
+        receiver.latency_seconds = args.receiver_latency
+    for receiver in receivers[args.slow_receivers:args.slow_receivers + args.failing_receivers]:
+        receiver.error_rate = args.receiver_error_rate
+
+    service_url = f"http://127.0.0.1:{args.service_port}"
+    processes: List[subprocess.Popen] = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+    async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT_SECONDS, limits=limits) as client:
+        with tempfile.TemporaryDirectory(prefix="load-test-") as scratch:
+            try:
+                app_dir = copy_service(Path(scratch) / "app")
+                service = _start_server(
+                    app_dir,
+                    args.service_port,
+                    {"WEBHOOK_STORAGE_BACKEND": args.backend, "LOG_LEVEL": "WARNING"},
+                    args.service_workers
+                )
+                processes.append(service)
+                for receiver in receivers:
+                    processes.append(_start_server(RECEIVER_DIR, receiver.port, {
+                        "RECEIVER_LATENCY_SECONDS": str(receiver.latency_seconds),
+                        "RECEIVER_ERROR_RATE": str(receiver.error_rate),
+                        "RECEIVER_RANDOM_SEED": str(receiver.port),
+                    }))
+                await _wait_until_ready(client, f"{service_url}/metrics", service)
+                for receiver, process in zip(receivers, processes[1:]):
+                    await _wait_until_ready(client, f"{receiver.base_url}/stats", process)
+
+                for receiver in receivers:
+                    for event in ("user_registered", "user_send_message"):
+                        response = await client.post(
+                            f"{service_url}/webhook", json={"event": event, "url": f"{receiver.base_url}/webhook"}
+                        )
+                        response.raise_for_status()
+
+                usernames = [f"load-test-user-{sequence}" for sequence in range(int(args.rate * args.duration))]
+                phases = {
+                    "users": (args.rate, lambda sequence: client.post(
+                        f"{service_url}/users", json={"username": usernames[sequence]}
+                    )),
+                    "messages": (args.rate, lambda sequence: client.post(f"{service_url}/users/messages", json={
+                        "sender": usernames[sequence % len(usernames)],
+                        "recipient": usernames[(sequence + 1) % len(usernames)],
+                        "subject": "Load test",
+                        "message": f"Message {sequence}",
+                    })),
+                    "ping": (args.ping_rate, lambda sequence: client.post(f"{service_url}/ping")),
+                    "register": (args.rate, lambda sequence: client.post(f"{service_url}/webhook", json={
+                        "event": "user_registered",
+                        "url": f"{receivers[sequence % len(receivers)].base_url}/webhook?subscription={sequence}",
+                    })),
+                }
+                results: Dict[str, Any] = {"phases": {}}
+                for name, (rate, send) in phases.items():
+                    results["phases"][name] = await _drive(rate, args.duration, send)
+
+                results["drain"] = await _wait_for_drain(client, service_url, args.drain_timeout)
+                results["receivers"] = []
+                for receiver in receivers:
+                    stats = (await client.get(f"{receiver.base_url}/stats")).json()
+                    results["receivers"].append({
+                        "port": receiver.port,
+                        "latency_seconds": receiver.latency_seconds,
+                        "error_rate": receiver.error_rate,
+                        **stats,
+                    })
+                return results
+            finally:
+                for process in processes:
+                    process.terminate()
+                for process in processes:
+                    process.wait()
+
+
+def _print_report(results: Dict[str, Any]) -> None:
+    phase_rows = [
+        [
+            name,
+            str(phase["sent"]),
+            str(phase["failed"]),
+            f"{phase['throughput']:.1f}/s",
+            format_seconds(phase["latency_seconds"]["p50"]),
+            format_seconds(phase["latency_seconds"]["p99"]),
+            format_seconds(phase["latency_seconds"]["max"]),
+        ]
+        for name, phase in results["phases"].items()
+    ]
+    print(format_table(["phase", "sent", "failed", "throughput", "p50", "p99", "max"], phase_rows))
+    for name, phase in results["phases"].items():
+        if phase["failures"]:
+            print(f"{name} failures: {phase['failures']}")
+
+    drain = results["drain"]
+    pending = "unknown" if drain["pending"] is None else f"{drain['pending']:.0f}"
+    print(f"\nWaited {drain['seconds']:.1f}s for the outbox to drain, {pending} deliveries still pending.\n")
+
+    receiver_rows = [
+        [
+            str(receiver["port"]),
+            format_seconds(receiver["latency_seconds"]),
+            f"{receiver['error_rate']:.0%}",
+            str(receiver["received_count"]),
+            str(receiver["rejected_count"]),
+            format_seconds(receiver["delivery_lag_seconds"]["p50"]),
+            format_seconds(receiver["delivery_lag_seconds"]["p99"]),
+            format_seconds(receiver["delivery_lag_seconds"]["max"]),
+        ]
+        for receiver in results["receivers"]
+    ]
+    print(format_table(
+        ["receiver", "latency", "errors", "received", "rejected", "lag p50", "lag p99", "lag max"], receiver_rows
+    ))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the webhook fan-out with local webhook receivers.")
+    parser.add_argument("--receivers", type=int, default=4, help="The number of webhook receivers.")
+    parser.add_argument("--slow-receivers", type=int, default=1, help="How many receivers answer with a delay.")
+    parser.add_argument("--failing-receivers", type=int, default=1, help="How many receivers reject webhooks.")
+    parser.add_argument("--receiver-latency", type=float, default=0.2,
+                        help="The delay (in seconds) of the slow receivers.")
+    parser.add_argument("--receiver-error-rate", type=float, default=0.2,
+                        help="The fraction of webhooks the failing receivers reject.")
+    parser.add_argument("--rate", type=float, default=50.0,
+                        help="Requests per second of the users, messages and register phases.")
+    parser.add_argument("--ping-rate", type=float, default=2.0, help="Requests per second of the ping phase.")
+    parser.add_argument("--duration", type=float, default=10.0, help="The duration (in seconds) of every phase.")
+    parser.add_argument("--drain-timeout", type=float, default=60.0,
+                        help="The maximum time (in seconds) to wait for the outbox to drain.")
+    parser.add_argument("--backend", choices=("json", "sqlite"), default="json", help="The storage backend of the service.")
+    parser.add_argument("--service-workers", type=int, default=1,
+                        help="The number of worker processes of the service. More than one requires --backend sqlite.")
+    parser.add_argument("--service-port", type=int, default=DEFAULT_SERVICE_PORT,
+                        help="The port of the service, the receivers listen on the following ports.")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file, e.g. to compare runs.")
+    args = parser.parse_args()
+    if args.slow_receivers + args.failing_receivers > args.receivers:
+        parser.error("--slow-receivers plus --failing-receivers must not exceed --receivers.")
+    if args.service_workers > 1 and args.backend != "sqlite":
+        parser.error("--service-workers above 1 requires --backend sqlite.")
+
+    results = asyncio.run(run_load_test(args))
+    _print_report(results)
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
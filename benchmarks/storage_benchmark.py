@@ -0,0 +1,146 @@
+"""
+Micro-benchmarks of `webhook_storage.read`, `update`, `route` and `remove` as the webhook registry grows.
+
+For every storage backend and registry size, the registry is filled with the given number of
+subscriptions spread over the default events, then every operation is timed one call at a time.
+The service is imported from a scratch copy, so the storage files of the working tree are never
+touched.
+
+Usage:
+    python benchmarks/storage_benchmark.py --sizes 100 1000 10000 --operations 200
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from bench_utils import copy_service, format_seconds, format_table, summarize_latencies
+
+
+
+# The events the registry is filled with, the default events of both storage backends
+EVENTS = ("user_registered", "user_send_message")
+# Registry sizes (number of subscribed URLs) benchmarked by default
+DEFAULT_SIZES = (100, 1_000, 10_000)
+# Number of timed calls of every operation by default
+DEFAULT_OPERATIONS = 200
+
+
+def _registry_urls(size: int) -> Dict[str, List[str]]:
+    """
+    Spread `size` subscriber URLs evenly over the events.
+    """
+    urls: Dict[str, List[str]] = {event: [] for event in EVENTS}
+    for index in range(size):
+        urls[EVENTS[index % len(EVENTS)]].append(f"http://subscriber-{index}.example.com/webhook")
+    return urls
+
+
+def _fill_registry(backend: str, size: int) -> Any:
+    """
+    Create a storage backend of the given type whose registry holds `size` subscriptions.
+
+    The registry is written in one go instead of through `update`, so filling a large registry
+    is not part of the measurement.
+    """
+    from database_management.storage_backend import STORAGE_FILE, create_storage_backend
+
+    for path in [*STORAGE_FILE.parent.glob("webhook_data.db*"), STORAGE_FILE.with_suffix(".journal")]:
+        path.unlink(missing_ok=True)
+    urls = _registry_urls(size)
+    if backend == "json":
+        STORAGE_FILE.write_text(json.dumps(urls))
+        return create_storage_backend("json")
+    storage = create_storage_backend("sqlite")
+    storage.backend.import_webhooks({event: {url: {} for url in event_urls} for event, event_urls in urls.items()})
+    return storage
+
+
+def _time_calls(calls: List[Callable[[], Any]]) -> Dict[str, Any]:
+    """
+    Call every function once and summarize the durations of the calls.
+    """
+    latencies: List[float] = []
+    started_at = time.perf_counter()
+    for call in calls:
+        call_started_at = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - call_started_at)
+    elapsed = time.perf_counter() - started_at
+    summary = summarize_latencies(latencies)
+    summary["ops_per_second"] = len(calls) / elapsed if elapsed > 0 else None
+    return summary
+
+
+def run(backends: List[str], sizes: List[int], operations: int) -> List[Dict[str, Any]]:
+    """
+    Benchmark `read`, `update`, `route` and `remove` of every backend at every registry size.
+
+    The first `route` call compiles the routing table after the updates, so its cost shows up as the max.
+
+    Returns:
+        results (List[Dict[str, Any]]): One entry per backend, size and operation with the latency summary.
+    """
+    import database_management  # noqa: F401, binds the storage singletons to the scratch copy
+    storage_module = sys.modules["database_management.webhook_storage"]
+
+    results: List[Dict[str, Any]] = []
+    for backend in backends:
+        for size in sizes:
+            storage_module.storage.close()
+            storage_module.storage = _fill_registry(backend, size)
+            new_urls = [
+                (EVENTS[index % len(EVENTS)], f"http://new-subscriber-{index}.example.com/webhook")
+                for index in range(operations)
+            ]
+            measurements = {
+                "update": [lambda event=event, url=url: storage_module.update(event, url) for event, url in new_urls],
+                "read(event)": [lambda event=event: storage_module.read(event) for event, _ in new_urls],
+                "read()": [storage_module.read for _ in range(operations)],
+                "route": [lambda event=event: storage_module.route(event, {}) for event, _ in new_urls],
+                "remove": [lambda event=event, url=url: storage_module.remove(event, url) for event, url in new_urls],
+            }
+            for operation, calls in measurements.items():
+                results.append({"backend": backend, "size": size, "operation": operation, **_time_calls(calls)})
+    storage_module.storage.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the webhook registry operations as the registry grows.")
+    parser.add_argument("--backends", nargs="+", choices=("json", "sqlite"), default=["json", "sqlite"],
+                        help="The storage backends to benchmark.")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES),
+                        help="The registry sizes (number of subscribed URLs) to benchmark.")
+    parser.add_argument("--operations", type=int, default=DEFAULT_OPERATIONS,
+                        help="The number of timed calls of every operation.")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this file, e.g. to compare runs.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="storage-benchmark-") as scratch:
+        app_dir = copy_service(Path(scratch) / "app")
+        sys.path.insert(0, str(app_dir))
+        results = run(args.backends, args.sizes, args.operations)
+
+    rows = [
+        [
+            result["backend"],
+            str(result["size"]),
+            result["operation"],
+            f"{result['ops_per_second']:.0f}",
+            format_seconds(result["p50"], "us"),
+            format_seconds(result["p99"], "us"),
+            format_seconds(result["max"], "us"),
+        ]
+        for result in results
+    ]
+    print(format_table(["backend", "size", "operation", "ops/s", "p50", "p99", "max"], rows))
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
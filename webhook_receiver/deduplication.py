@@ -0,0 +1,148 @@
+import hashlib
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import List, Optional
+
+
+
+# Header carrying the ID of a delivery, or the comma-separated IDs of the events of a batch in array order
+DELIVERY_ID_HEADER = "Webhook-Delivery-Id"
+# Number of delivery IDs remembered by default
+DEFAULT_DEDUP_CAPACITY = 100_000
+# Time (in seconds) a delivery ID is remembered by default, longer than the sender's retry schedule
+DEFAULT_DEDUP_TTL_SECONDS = 24 * 60 * 60
+# False-positive rate of the Bloom filter by default, the share of new deliveries wrongly dropped as duplicates
+DEFAULT_BLOOM_FALSE_POSITIVE_RATE = 0.001
+
+
+class Deduplicator(ABC):
+    """
+    Remember the IDs of received deliveries to detect duplicates in O(1) with a fixed memory ceiling.
+    """
+
+    @abstractmethod
+    def seen(self, delivery_id: str) -> bool:
+        """
+        Record a delivery ID and return whether it had been recorded before.
+        """
+
+
+class SeenIdCache(Deduplicator):
+    """
+    Remember the most recent delivery IDs exactly, up to a capacity and for a time window.
+
+    The IDs are kept in an ordered dict in the order they were first seen, so both the least
+    recently added ID (once the cache is full) and the expired IDs are evicted from its front
+    in amortized O(1). There are no false positives, at the cost of storing every ID.
+
+    Attributes:
+        capacity (int): The maximum number of remembered IDs.
+        ttl_seconds (float): The time an ID is remembered after it was first seen.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_DEDUP_CAPACITY, ttl_seconds: float = DEFAULT_DEDUP_TTL_SECONDS):
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        # Delivery ID -> monotonic time it was first seen, oldest first
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def seen(self, delivery_id: str) -> bool:
+        now = time.monotonic()
+        # Evict the expired IDs, they are at the front because IDs are never moved
+        while self._seen and next(iter(self._seen.values())) <= now - self.ttl_seconds:
+            self._seen.popitem(last=False)
+        if delivery_id in self._seen:
+            return True
+        if len(self._seen) >= self.capacity:
+            self._seen.popitem(last=False)
+        self._seen[delivery_id] = now
+        return False
+
+
+class BloomFilter(Deduplicator):
+    """
+    Remember delivery IDs approximately in a fixed-size bit array, for very high volumes.
+
+    The memory does not depend on the length of the IDs. Every ID sets `hash_count` bits derived
+    from a single BLAKE2 digest (double hashing). A new ID is wrongly reported as seen with the
+    configured false-positive rate, a seen ID is never missed.
+
+    To keep the false-positive rate bounded as IDs keep arriving, two filters are kept: once the
+    current filter holds `capacity` IDs, it becomes the previous filter and a new one is started.
+    An ID is therefore remembered for at least `capacity` further deliveries.
+
+    Attributes:
+        capacity (int): The number of IDs per filter.
+        size_bits (int): The number of bits per filter.
+        hash_count (int): The number of bits set per ID.
+    """
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_DEDUP_CAPACITY,
+        false_positive_rate: float = DEFAULT_BLOOM_FALSE_POSITIVE_RATE,
+    ):
+        self.capacity = capacity
+        # Optimal size and number of hashes for `capacity` IDs at the false-positive rate (halved, two filters are checked)
+        self.size_bits = max(8, math.ceil(-capacity * math.log(false_positive_rate / 2) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size_bits / capacity * math.log(2)))
+        self._current = bytearray((self.size_bits + 7) // 8)
+        self._previous: Optional[bytearray] = None
+        self._count = 0
+
+    def _positions(self, delivery_id: str) -> List[int]:
+        digest = hashlib.blake2b(delivery_id.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + index * second) % self.size_bits for index in range(self.hash_count)]
+
+    @staticmethod
+    def _contains(bits: bytearray, positions: List[int]) -> bool:
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in positions)
+
+    def seen(self, delivery_id: str) -> bool:
+        positions = self._positions(delivery_id)
+        if self._contains(self._current, positions):
+            return True
+        if self._previous is not None and self._contains(self._previous, positions):
+            return True
+        if self._count >= self.capacity:
+            self._previous, self._current = self._current, bytearray(len(self._current))
+            self._count = 0
+        for position in positions:
+            self._current[position >> 3] |= 1 << (position & 7)
+        self._count += 1
+        return False
+
+
+def create_deduplicator(
+    name: str,
+    capacity: int = DEFAULT_DEDUP_CAPACITY,
+    ttl_seconds: float = DEFAULT_DEDUP_TTL_SECONDS,
+) -> Optional[Deduplicator]:
+    """
+    Create the deduplicator with the given name.
+
+    Args:
+        name (str): "lru" for the exact `SeenIdCache`, "bloom" for the `BloomFilter`, or "off" to keep duplicates.
+        capacity (int): The number of remembered IDs.
+        ttl_seconds (float): The time an ID is remembered ("lru" only).
+
+    Returns:
+        deduplicator (Deduplicator | None): The deduplicator, or None if deduplication is off.
+
+    Raises:
+        ValueError: If the name is unknown.
+    """
+    if name == "lru":
+        return SeenIdCache(capacity, ttl_seconds)
+    if name == "bloom":
+        return BloomFilter(capacity)
+    if name == "off":
+        return None
+    raise ValueError(f"Unknown deduplicator '{name}'. Use 'lru', 'bloom' or 'off'.")
@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Dict, Type
+
+from pydantic import BaseModel, ConfigDict
+
+
+class UserRegisteredData(BaseModel):
+    """
+    The data of a `user_registered` event sent by the webhook_user_notification_service.
+    """
+    model_config = ConfigDict(extra="allow")
+
+    username: str
+    registered_at: datetime
+
+
+class UserSendMessageData(BaseModel):
+    """
+    The data of a `user_send_message` event sent by the webhook_user_notification_service.
+    """
+    model_config = ConfigDict(extra="allow")
+
+    sender: str
+    recipient: str
+    subject: str
+    message: str
+    received_at: datetime
+
+
+# Event type -> the schema the data of its events is validated against; events of other types are not validated
+EVENT_SCHEMAS: Dict[str, Type[BaseModel]] = {
+    "user_registered": UserRegisteredData,
+    "user_send_message": UserSendMessageData,
+}
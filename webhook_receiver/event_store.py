@@ -0,0 +1,266 @@
+import asyncio
+import json
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from operator import itemgetter
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+
+
+# Number of events kept in memory by default, older events are dropped (or spilled to disk)
+DEFAULT_EVENT_CAPACITY = 10_000
+
+_sequence = itemgetter("sequence")
+
+
+class EventStore:
+    """
+    Keep the most recent received webhook events in a bounded ring buffer.
+
+    Every event gets an increasing sequence number, which doubles as the cursor of the paginated
+    views. Once the buffer holds `capacity` events, storing another event evicts the oldest one,
+    so memory stays bounded however long the receiver runs. Events are also indexed by their
+    event type, so a filtered page costs O(k) in the number of events on it instead of a scan
+    over all stored events.
+
+    If a spill path is given, evicted events are appended as JSON lines to an append-only log
+    instead of being dropped, and pages continue into the log once the events in memory are
+    exhausted. The file offset of every spilled event is indexed by its sequence number, for all
+    events and per event type (16 bytes per event and index), so a page of spilled events seeks
+    straight to its lines instead of scanning the log. An existing log is indexed once on startup.
+
+    Evicted events wait in memory until `flush_spilled` writes them to the log, which is meant to
+    run in a worker thread, like `page`; the state shared with the event loop is guarded by a lock.
+
+    Attributes:
+        capacity (int): The maximum number of events kept in memory.
+        spill_path (Path | None): The append-only log of evicted events, or None to drop them.
+        received_count (int): The number of events stored since the receiver started.
+        last_sequence (int): The sequence number of the most recently stored event.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_EVENT_CAPACITY, spill_path: Optional[Path] = None):
+        if capacity < 1:
+            raise ValueError("The event store capacity must be at least 1.")
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.received_count = 0
+        self._events: Deque[Dict] = deque()
+        # Event type -> the stored events of the type, oldest first
+        self._events_by_type: Dict[str, Deque[Dict]] = {}
+        # Evicted events that are not written to the spill log yet, oldest first
+        self._unspilled: List[Dict] = []
+        # Event type (None for all events) -> the sequence numbers and file offsets of the spilled events, oldest first
+        self._spilled: Dict[Optional[str], Tuple[array, array]] = {}
+        self._lock = threading.Lock()
+        self._spill_file = None
+        self.last_sequence = 0
+        if spill_path is not None:
+            self._spill_file = open(spill_path, "ab+")
+            # Continue the numbering of a spill log written before a restart, so sequence numbers stay unique
+            self.last_sequence = self._index_spill_log()
+        # Set (and replaced) whenever an event is stored, to wake up the live feeds
+        self._added = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+    def add(self, event_type: str, data: Dict, received_at: str) -> Dict:
+        """
+        Store a received event, evicting the oldest event if the buffer is full.
+
+        Args:
+            event_type (str): The type of the event.
+            data (Dict): The data of the event.
+            received_at (str): The ISO 8601 timestamp when the event was received.
+
+        Returns:
+            event (Dict): The stored event, with its `sequence`, `event_type`, `data` and `received_at`.
+        """
+        self.received_count += 1
+        self.last_sequence += 1
+        event = {"sequence": self.last_sequence, "event_type": event_type, "data": data, "received_at": received_at}
+        with self._lock:
+            if len(self._events) >= self.capacity:
+                self._evict()
+            self._events.append(event)
+            self._events_by_type.setdefault(event_type, deque()).append(event)
+        self._added.set()
+        self._added = asyncio.Event()
+        return event
+
+    def _evict(self) -> None:
+        """
+        Remove the oldest event, which is also the oldest event of its type, in O(1).
+        """
+        oldest = self._events.popleft()
+        events_of_type = self._events_by_type[oldest["event_type"]]
+        events_of_type.popleft()
+        if not events_of_type:
+            # Drop empty index entries, so the index is bounded by the capacity as well
+            del self._events_by_type[oldest["event_type"]]
+        if self._spill_file is not None:
+            self._unspilled.append(oldest)
+
+    @property
+    def spill_pending(self) -> bool:
+        """
+        Whether evicted events are waiting for `flush_spilled` to write them to the spill log.
+        """
+        return bool(self._unspilled)
+
+    def flush_spilled(self) -> None:
+        """
+        Write the evicted events to the spill log and index them.
+
+        The events stay readable from memory until they are indexed. This blocks on file I/O, so
+        it should run in a worker thread, and only one flush may run at a time.
+        """
+        with self._lock:
+            events = list(self._unspilled)
+        if not events:
+            return
+        positions = self._write_spilled(events)
+        with self._lock:
+            self._index_spilled(positions)
+            del self._unspilled[:len(events)]
+
+    def _write_spilled(self, events: List[Dict]) -> List[Tuple[int, str, int]]:
+        """
+        Append events to the spill log and return their `(sequence, event_type, offset)`.
+        """
+        offset = self._spill_file.seek(0, 2)
+        positions: List[Tuple[int, str, int]] = []
+        lines: List[bytes] = []
+        for event in events:
+            line = json.dumps(event, separators=(",", ":")).encode() + b"\n"
+            positions.append((_sequence(event), event["event_type"], offset))
+            lines.append(line)
+            offset += len(line)
+        self._spill_file.write(b"".join(lines))
+        self._spill_file.flush()
+        return positions
+
+    def _index_spilled(self, positions: List[Tuple[int, str, int]]) -> None:
+        for sequence, event_type, offset in positions:
+            for key in (None, event_type):
+                sequences, offsets = self._spilled.setdefault(key, (array("q"), array("q")))
+                sequences.append(sequence)
+                offsets.append(offset)
+
+    def _index_spill_log(self) -> int:
+        """
+        Index the events of an existing spill log and return the last sequence number in it.
+        """
+        positions: List[Tuple[int, str, int]] = []
+        self._spill_file.seek(0)
+        offset = 0
+        for line in self._spill_file:
+            if line.strip():
+                event = json.loads(line)
+                positions.append((_sequence(event), event["event_type"], offset))
+            offset += len(line)
+        self._index_spilled(positions)
+        return positions[-1][0] if positions else 0
+
+    def _indexed(self, event_type: Optional[str]) -> Sequence[Dict]:
+        """
+        Return the events held in memory, oldest first, optionally only those of one event type.
+        """
+        if event_type is None:
+            return self._events
+        return self._events_by_type.get(event_type, ())
+
+    def page(self, event_type: Optional[str] = None, before: Optional[int] = None, limit: int = 100) -> List[Dict]:
+        """
+        Return a page of events, newest first.
+
+        A page reaching into the spill log reads its events from the file, so it should run in a worker thread.
+
+        Args:
+            event_type (str | None): Only return events of this type. If None, events of all types are returned.
+            before (int | None): Only return events older than this sequence number, i.e. the cursor
+                of the previous page. If None, the page starts at the newest event.
+            limit (int): The maximum number of events on the page.
+
+        Returns:
+            page (List[Dict]): The events, newest first. The sequence number of the last event is
+                the cursor of the next page.
+        """
+        with self._lock:
+            events = self._indexed(event_type)
+            end = len(events) if before is None else bisect_left(events, before, key=_sequence)
+            page = [events[index] for index in range(end - 1, max(end - limit, 0) - 1, -1)]
+            # The evicted events that are not written yet are older than the events in memory
+            # and newer than everything in the spill log
+            older_than = _sequence(page[-1]) if page else before
+            for event in reversed(self._unspilled):
+                if len(page) >= limit:
+                    break
+                if older_than is not None and _sequence(event) >= older_than:
+                    continue
+                if event_type is None or event["event_type"] == event_type:
+                    page.append(event)
+            older_than = _sequence(page[-1]) if page else before
+            sequences, offsets = self._spilled.get(event_type, ((), ()))
+            end = len(sequences) if older_than is None else bisect_left(sequences, older_than)
+            spilled_offsets = [offsets[index] for index in range(end - 1, max(end - (limit - len(page)), 0) - 1, -1)]
+        if spilled_offsets:
+            page += self._read_spilled(spilled_offsets)
+        return page
+
+    def _read_spilled(self, offsets: List[int]) -> List[Dict]:
+        """
+        Read the spilled events at the given offsets of the spill log.
+        """
+        events: List[Dict] = []
+        with open(self.spill_path, "rb") as spill_file:
+            for offset in offsets:
+                spill_file.seek(offset)
+                events.append(json.loads(spill_file.readline()))
+        return events
+
+    def since(self, after: int, event_type: Optional[str] = None) -> List[Dict]:
+        """
+        Return the events held in memory that are newer than a sequence number, oldest first.
+
+        Args:
+            after (int): Only return events newer than this sequence number.
+            event_type (str | None): Only return events of this type. If None, events of all types are returned.
+        """
+        with self._lock:
+            events = self._indexed(event_type)
+            start = bisect_right(events, after, key=_sequence)
+            return [events[index] for index in range(start, len(events))]
+
+    async def wait_for_event(self, timeout: float) -> bool:
+        """
+        Wait until the next event is stored.
+
+        Returns:
+            stored (bool): True if an event was stored, False if the timeout passed first.
+        """
+        try:
+            await asyncio.wait_for(self._added.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def close(self) -> None:
+        """
+        Write the events still held in memory to the spill log and close it.
+
+        The spill log then holds the complete history, so it can be paged through after a restart.
+        """
+        if self._spill_file is not None:
+            with self._lock:
+                events = self._unspilled + list(self._events)
+                self._unspilled = []
+                self._events.clear()
+                self._events_by_type.clear()
+            self._index_spilled(self._write_spilled(events))
+            self._spill_file.close()
+            self._spill_file = None
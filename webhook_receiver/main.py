@@ -1,12 +1,103 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import zlib
+from collections import deque
+from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, Request, Query
+from pydantic import ValidationError
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple, Union
 from datetime import datetime, timezone
+from deduplication import DEFAULT_DEDUP_CAPACITY, DEFAULT_DEDUP_TTL_SECONDS, DELIVERY_ID_HEADER, create_deduplicator
+from event_schemas import EVENT_SCHEMAS
+from event_store import DEFAULT_EVENT_CAPACITY, EventStore
+from signature_verification import SIGNATURE_HEADER, SignatureVerifier
 
-app = FastAPI()
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library parser is used without it
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, zstd compressed webhooks are rejected with a 415 without it
+    zstandard = None
+
+# Parse JSON straight from the body bytes, with orjson when it is installed
+loads = orjson.loads if orjson is not None else json.loads
+
+# Write log records from a background thread, so logging never blocks the endpoint
+log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+log_listener = QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+log_listener.start()
+# Write the remaining log records before the receiver exits
+atexit.register(log_listener.stop)
+logger = logging.getLogger("webhook_receiver")
+logger.addHandler(QueueHandler(log_queue))
+logger.setLevel(logging.INFO)
+logger.propagate = False
+
+# Fault injection for load tests: delay (in seconds) before every webhook is answered
+RECEIVER_LATENCY_SECONDS = float(os.getenv("RECEIVER_LATENCY_SECONDS", "0"))
+# Fault injection for load tests: fraction (0 to 1) of webhooks that are rejected with RECEIVER_ERROR_STATUS
+RECEIVER_ERROR_RATE = float(os.getenv("RECEIVER_ERROR_RATE", "0"))
+# Status code of the rejected webhooks, a 5xx status code makes the sender retry the delivery
+RECEIVER_ERROR_STATUS = int(os.getenv("RECEIVER_ERROR_STATUS", "503"))
+# Seed of the random rejections, so a load test rejects the same webhooks every run
+fault_random = random.Random(os.getenv("RECEIVER_RANDOM_SEED"))
+# Number of received events kept in memory, older events are dropped (or spilled to RECEIVER_SPILL_PATH)
+RECEIVER_EVENT_CAPACITY = int(os.getenv("RECEIVER_EVENT_CAPACITY", str(DEFAULT_EVENT_CAPACITY)))
+# Optional append-only log the events evicted from memory are written to, e.g. "received_events.jsonl"
+RECEIVER_SPILL_PATH = os.getenv("RECEIVER_SPILL_PATH")
+# Maximum number of received webhooks waiting to be stored, further webhooks are rejected with a 503
+RECEIVER_INGEST_QUEUE_SIZE = int(os.getenv("RECEIVER_INGEST_QUEUE_SIZE", "10000"))
+# Maximum size (in bytes) of a webhook body, before and after it is decompressed; larger webhooks are rejected with a 413
+RECEIVER_MAX_BODY_BYTES = int(os.getenv("RECEIVER_MAX_BODY_BYTES", str(10 * 1024 * 1024)))
+# Validate the data of known event types against their schema in event_schemas.py, rejecting invalid events with a 422
+RECEIVER_VALIDATE_EVENTS = os.getenv("RECEIVER_VALIDATE_EVENTS", "false").lower() in ("1", "true", "yes")
+# How duplicate deliveries (retries of a delivery that was already received) are detected: "lru", "bloom" or "off"
+RECEIVER_DEDUP = os.getenv("RECEIVER_DEDUP", "lru")
+# Number of delivery IDs remembered to detect duplicates
+RECEIVER_DEDUP_CAPACITY = int(os.getenv("RECEIVER_DEDUP_CAPACITY", str(DEFAULT_DEDUP_CAPACITY)))
+# Time (in seconds) a delivery ID is remembered to detect duplicates ("lru" only)
+RECEIVER_DEDUP_TTL_SECONDS = float(os.getenv("RECEIVER_DEDUP_TTL_SECONDS", str(DEFAULT_DEDUP_TTL_SECONDS)))
+# Comma-separated signing secrets issued by the webhook_user_notification_service when the webhooks were registered;
+# if set, webhooks without a valid `Webhook-Signature` are rejected with a 401
+RECEIVER_WEBHOOK_SECRETS = [secret.strip() for secret in os.getenv("RECEIVER_WEBHOOK_SECRETS", "").split(",") if secret.strip()]
+# Number of events shown per page of /received-events when no limit is given
+DEFAULT_PAGE_SIZE = 50
+# Upper bound on the number of events per page
+MAX_PAGE_SIZE = 1000
+# Response header carrying the cursor of the next (older) page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Interval (in seconds) between keep-alive comments on an idle live feed, so proxies do not close it
+LIVE_FEED_KEEPALIVE_SECONDS = 15.0
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global ingest_queue
+    ingest_queue = asyncio.Queue(maxsize=RECEIVER_INGEST_QUEUE_SIZE)
+    consumer = asyncio.create_task(_consume_webhooks(ingest_queue))
+    yield
+    # Store the webhooks that were already acknowledged before shutting down
+    await ingest_queue.join()
+    consumer.cancel()
+    # Write the buffered events to the spill log on shutdown. Uvicorn re-raises the shutdown
+    # signal once the application has stopped, so an atexit handler would never run.
+    received_events.close()
+
+app = FastAPI(lifespan=lifespan)
 
 CORS_SETTINGS = {
     "allow_origins": ["*"],  # Allow all origins
@@ -22,29 +113,241 @@ app.add_middleware(CORSMiddleware, **CORS_SETTINGS)
 templates = Jinja2Templates(directory="templates")
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# In-memory database
-received_events: List[Dict] = []  # To store all received webhook events
+# In-memory database, a bounded ring buffer of the most recent received webhook events
+received_events = EventStore(RECEIVER_EVENT_CAPACITY, Path(RECEIVER_SPILL_PATH) if RECEIVER_SPILL_PATH else None)
+# Seconds between the creation of an event (its `registered_at` or `received_at` timestamp) and its receipt,
+# for the most recent events
+delivery_lags: Deque[float] = deque(maxlen=RECEIVER_EVENT_CAPACITY)
+rejected_count = 0
+# Detects the duplicate deliveries by their `Webhook-Delivery-Id`, None if duplicates are kept
+deduplicator = create_deduplicator(RECEIVER_DEDUP, RECEIVER_DEDUP_CAPACITY, RECEIVER_DEDUP_TTL_SECONDS)
+duplicate_count = 0
+# Verifies the signatures of received webhooks, None if signatures are not checked
+signature_verifier = SignatureVerifier(RECEIVER_WEBHOOK_SECRETS) if RECEIVER_WEBHOOK_SECRETS else None
+# Received webhooks waiting to be stored, as `(received_at, events)` pairs; created when the app starts
+ingest_queue: "Optional[asyncio.Queue[Tuple[datetime, List[Dict]]]]" = None
+
+
+def _event_created_at(event_data: Dict) -> Optional[datetime]:
+    """
+    Return the creation timestamp of a user or message event, or None for other events (e.g. pings).
+    """
+    if not isinstance(event_data, dict):
+        return None
+    timestamp = event_data.get("registered_at") or event_data.get("received_at")
+    if not isinstance(timestamp, str):
+        return None
+    try:
+        return datetime.fromisoformat(timestamp)
+    except ValueError:
+        return None
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    """
+    Return the nearest-rank percentile of sorted values, or None if there are no values.
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
 
 @app.post("/webhook")
 async def webhook_endpoint(request: Request):
     """
-    A simple webhook endpoint that logs the received payload and stores them in the in-memory database.
-    """
-    payload: Dict = await request.json()
-    print(f"Received webhook payload: {payload}")
-    
-    event_type = payload.get("event", "unknown")
-    event_data = payload.get("data", {})
-    event = {
-        "event_type": event_type,
-        "data": event_data,
-        "received_at": datetime.now(timezone.utc).isoformat()
-    }
-    received_events.append(event)
-    
-    print(f"Webhook received: {event}")
-    
-    return {"message": "Webhook received successfully"}
+    A simple webhook endpoint that stores the received payload in the in-memory database.
+
+    Accepts a single event (a JSON object) or a batch of events (a JSON array of objects), 
+    optionally gzip or zstd compressed as indicated by the `Content-Encoding` header. zstd needs
+    the optional `zstandard` package; without it zstd compressed webhooks are rejected with a 415.
+
+    The body is parsed and, if `RECEIVER_VALIDATE_EVENTS` is set, validated; the events are then
+    handed to a background consumer and the webhook is acknowledged right away. If the consumer
+    falls behind by more than `RECEIVER_INGEST_QUEUE_SIZE` webhooks, further webhooks are
+    rejected with a 503 so the sender retries them later.
+
+    Events whose delivery ID was already received are acknowledged but not stored again, so
+    retried deliveries do not show up twice. The ID of each event is taken from the
+    `Webhook-Delivery-Id` header (a comma-separated list in array order for a batch), or from
+    the `delivery_id` of the body if the header does not name every event.
+
+    If `RECEIVER_WEBHOOK_SECRETS` is set, the signature in the `Webhook-Signature` header is
+    verified over the raw body before it is decompressed or parsed, and webhooks without a valid
+    signature are rejected with a 401.
+
+    Bodies larger than `RECEIVER_MAX_BODY_BYTES`, as sent or once decompressed, are rejected with
+    a 413; a compressed body is never decompressed past that limit.
+    """
+    global rejected_count, duplicate_count
+    if RECEIVER_LATENCY_SECONDS > 0:
+        await asyncio.sleep(RECEIVER_LATENCY_SECONDS)
+    if RECEIVER_ERROR_RATE > 0 and fault_random.random() < RECEIVER_ERROR_RATE:
+        rejected_count += 1
+        return JSONResponse(status_code=RECEIVER_ERROR_STATUS, content={"message": "Injected failure"})
+
+    too_large = JSONResponse(status_code=413, content={"message": f"The body must be at most {RECEIVER_MAX_BODY_BYTES} bytes."})
+    body = await _read_body(request)
+    if body is None:
+        return too_large
+    if signature_verifier is not None and not signature_verifier.verify(body, request.headers.get(SIGNATURE_HEADER)):
+        return JSONResponse(status_code=401, content={"message": "The webhook signature is missing or invalid."})
+    content_encoding = request.headers.get("content-encoding")
+    if content_encoding == "zstd" and zstandard is None:
+        return JSONResponse(status_code=415, content={"message": "zstd compressed webhooks need the 'zstandard' package."})
+    try:
+        body = _decompress(body, content_encoding)
+        if body is None:
+            return too_large
+        payload: Union[Dict, List[Dict]] = loads(body)
+    except (zlib.error, EOFError, ValueError) + ((zstandard.ZstdError,) if zstandard is not None else ()):
+        return JSONResponse(status_code=400, content={"message": "The body is not valid (gzip or zstd compressed) JSON."})
+
+    # A batched delivery carries several events in one JSON array
+    payloads: List[Dict] = payload if isinstance(payload, list) else [payload]
+    if not all(isinstance(event_payload, dict) for event_payload in payloads):
+        return JSONResponse(status_code=400, content={"message": "Every event must be a JSON object."})
+    if RECEIVER_VALIDATE_EVENTS:
+        for event_payload in payloads:
+            schema = EVENT_SCHEMAS.get(event_payload.get("event"))
+            if schema is None:
+                continue
+            try:
+                schema.model_validate(event_payload.get("data", {}))
+            except ValidationError as error:
+                return JSONResponse(status_code=422, content={
+                    "message": f"Invalid '{event_payload['event']}' event.",
+                    "errors": error.errors(include_url=False, include_context=False),
+                })
+
+    if ingest_queue.full():
+        # Checked before the delivery IDs are recorded, so the retry of a rejected webhook is not dropped
+        return JSONResponse(
+            status_code=503,
+            content={"message": "The receiver is overloaded, retry later."},
+            headers={"Retry-After": "1"}
+        )
+    new_payloads = payloads
+    if deduplicator is not None:
+        new_payloads = [
+            event_payload for event_payload, delivery_id in zip(payloads, _delivery_ids(request, payloads))
+            if delivery_id is None or not deduplicator.seen(delivery_id)
+        ]
+        duplicate_count += len(payloads) - len(new_payloads)
+    if new_payloads:
+        ingest_queue.put_nowait((datetime.now(timezone.utc), new_payloads))
+    return JSONResponse(content={
+        "message": "Webhook received successfully",
+        "received_count": len(new_payloads),
+        "duplicate_count": len(payloads) - len(new_payloads),
+    })
+
+
+def _delivery_ids(request: Request, payloads: List[Dict]) -> List[Optional[str]]:
+    """
+    Return the delivery ID of every event of a webhook, or None for an event without one.
+
+    The IDs in the `Webhook-Delivery-Id` header identify the delivery to this subscriber; the
+    `delivery_id` of the body is the fallback, it is shared by every subscriber of the event.
+    """
+    header = request.headers.get(DELIVERY_ID_HEADER)
+    if header is not None:
+        delivery_ids = [delivery_id.strip() for delivery_id in header.split(",")]
+        if len(delivery_ids) == len(payloads) and all(delivery_ids):
+            return delivery_ids
+    return [
+        event_payload["delivery_id"] if isinstance(event_payload.get("delivery_id"), str) else None
+        for event_payload in payloads
+    ]
+
+
+async def _read_body(request: Request) -> Optional[bytes]:
+    """
+    Read the body of a webhook, counting its bytes as it is streamed.
+
+    Returns:
+        body (bytes | None): The body, or None if it is larger than `RECEIVER_MAX_BODY_BYTES`.
+    """
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > RECEIVER_MAX_BODY_BYTES:
+        return None
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > RECEIVER_MAX_BODY_BYTES:
+            return None
+    return bytes(body)
+
+
+def _decompress(body: bytes, content_encoding: Optional[str]) -> Optional[bytes]:
+    """
+    Decompress a gzip or zstd compressed webhook body, never producing more than `RECEIVER_MAX_BODY_BYTES`.
+
+    Returns:
+        body (bytes | None): The decompressed body (the body itself if it is not compressed), or None
+            if it is larger than `RECEIVER_MAX_BODY_BYTES` once decompressed.
+
+    Raises:
+        zlib.error, EOFError or zstandard.ZstdError: If the body is not validly compressed.
+    """
+    if content_encoding == "gzip":
+        decompressor = zlib.decompressobj(wbits=31)
+        body = decompressor.decompress(body, RECEIVER_MAX_BODY_BYTES + 1)
+        if len(body) > RECEIVER_MAX_BODY_BYTES:
+            return None
+        if not decompressor.eof:
+            raise EOFError("The gzip stream is truncated.")
+    elif content_encoding == "zstd":
+        decompressor = zstandard.ZstdDecompressor()
+        if zstandard.frame_content_size(body) > RECEIVER_MAX_BODY_BYTES:
+            return None
+        try:
+            body = decompressor.decompress(body, max_output_size=RECEIVER_MAX_BODY_BYTES)
+        except zstandard.ZstdError:
+            # A frame that does not record its content size fails alike when it is too large and when it is corrupt
+            if len(decompressor.stream_reader(body).read(RECEIVER_MAX_BODY_BYTES + 1)) > RECEIVER_MAX_BODY_BYTES:
+                return None
+            raise
+    return body
+
+
+async def _consume_webhooks(queue: "asyncio.Queue[Tuple[datetime, List[Dict]]]") -> None:
+    """
+    Store the events of the received webhooks in the order they were received.
+    """
+    while True:
+        now, payloads = await queue.get()
+        try:
+            received_at = now.isoformat()
+            for event_payload in payloads:
+                event_type = event_payload.get("event", "unknown")
+                event_data = event_payload.get("data", {})
+                created_at = _event_created_at(event_data)
+                if created_at is not None and created_at.tzinfo is not None:
+                    delivery_lags.append((now - created_at).total_seconds())
+                received_events.add(event_type, event_data, received_at)
+            if received_events.spill_pending:
+                # Write the evicted events to the spill log without blocking the event loop
+                await asyncio.to_thread(received_events.flush_spilled)
+            logger.debug("Stored %d received events", len(payloads))
+        except Exception:
+            # Keep consuming, a single malformed webhook must not stop the receiver from storing events
+            logger.exception("Failed to store a received webhook")
+        finally:
+            queue.task_done()
+
+
+def _take_page(event_filter: Optional[str], before: Optional[int], limit: int) -> Tuple[List[Dict], Optional[int]]:
+    """
+    Take one page of events, newest first, and return it with the cursor of the next (older) page.
+
+    Only `limit + 1` events are read, the extra event tells whether there is a next page.
+    A page may read the spill log, so it is taken in a worker thread.
+    """
+    events = received_events.page(event_filter, before, limit + 1)
+    if len(events) > limit:
+        events = events[:limit]
+        return events, events[-1]["sequence"]
+    return events, None
 
 
 @app.get("/received-events", response_class=HTMLResponse)
@@ -53,21 +356,115 @@ async def show_received_events(
     event_filter: Optional[str] = Query(
         default=None, 
         description="Filter webhooks by specific event name (e.g., 'payment_received')."
+    ),
+    before: Optional[int] = Query(
+        default=None,
+        ge=1,
+        description="Cursor of the page: only show events older than this sequence number. If omitted, the newest events are shown."
+    ),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of events per page.")):
+    """
+    Display one page of the received webhook events in a simple UI, newest first.
+
+    The first page subscribes to the live feed (`/received-events/stream`) and adds new events
+    to the top of the table as they arrive, so the page is rendered once instead of being
+    reloaded. Older events are reached through the "Older events" link, whose cursor is the
+    sequence number of the last event on the page. Pages continue into the events spilled to
+    disk once the events in memory are exhausted.
+    """
+    # Filter events based on the event_filter query parameter
+    events, next_cursor = await asyncio.to_thread(_take_page, event_filter, before, limit)
+    filter_params = {"event_filter": event_filter} if event_filter is not None else {}
+    older_url = str(request.url.include_query_params(before=next_cursor)) if next_cursor is not None else None
+    stream_url = None
+    if before is None:
+        stream_url = str(request.url_for("stream_received_events").include_query_params(
+            after=received_events.last_sequence, **filter_params
+        ))
+    return templates.TemplateResponse(request, "index.html", {
+        "events": events,
+        "older_url": older_url,
+        "newest_url": str(request.url.remove_query_params("before")) if before is not None else None,
+        "stream_url": stream_url,
+    })
+
+
+@app.get("/received-events/page")
+async def get_received_events_page(
+    event_filter: Optional[str] = Query(default=None, description="Only return events of this event type."),
+    before: Optional[int] = Query(
+        default=None,
+        ge=1,
+        description="Cursor of the page: only return events older than this sequence number. If omitted, the newest events are returned."
+    ),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of events per page.")):
+    """
+    Return one page of the received webhook events as JSON, newest first.
+
+    If there are older events, the cursor of the next page is returned in the `X-Next-Cursor`
+    header; pass it as `before` to fetch the next page.
+    """
+    events, next_cursor = await asyncio.to_thread(_take_page, event_filter, before, limit)
+    headers = {NEXT_CURSOR_HEADER: str(next_cursor)} if next_cursor is not None else None
+    return JSONResponse(content=events, headers=headers)
+
+
+@app.get("/received-events/stream")
+async def stream_received_events(
+    request: Request,
+    event_filter: Optional[str] = Query(default=None, description="Only stream events of this event type."),
+    after: Optional[int] = Query(
+        default=None,
+        ge=0,
+        description="Stream the events newer than this sequence number. If omitted, only events received from now on are streamed."
     )):
     """
-    Display the received webhook events in a simple UI.
+    Stream received webhook events as server-sent events as they arrive.
+
+    Every event is sent as a `webhook` event whose id is its sequence number, so a reconnecting
+    client resumes after the last event it received (through the `Last-Event-ID` header). An
+    idle feed sends a keep-alive comment every `LIVE_FEED_KEEPALIVE_SECONDS`.
+    """
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id is not None and last_event_id.isdigit():
+        after = int(last_event_id)
+    elif after is None:
+        after = received_events.last_sequence
+
+    async def encode() -> AsyncIterator[str]:
+        cursor = after
+        while not await request.is_disconnected():
+            events = received_events.since(cursor, event_filter)
+            for event in events:
+                yield f"id: {event['sequence']}\nevent: webhook\ndata: {json.dumps(event)}\n\n"
+                cursor = event["sequence"]
+            if not events and not await received_events.wait_for_event(LIVE_FEED_KEEPALIVE_SECONDS):
+                yield ": keep-alive\n\n"
+
+    return StreamingResponse(encode(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/stats")
+async def show_stats():
     """
-    filtered_events: List[Dict] = []
-    if event_filter is not None:
-        # Filter events based on the event_filter query parameter
-        for received_event in received_events:
-            if received_event["event_type"] == event_filter:
-                filtered_events.append(received_event)
-                
-        return templates.TemplateResponse("index.html", {"request": request, "events": filtered_events})
-    
-    return templates.TemplateResponse("index.html", {"request": request, "events": received_events})
+    Return the number of received, rejected and duplicate webhook events and their delivery lag, used by the load tests.
 
+    The delivery lag is the time between the creation of a user or message event in the
+    webhook_user_notification_service and its receipt here, including retries. It is measured over
+    the most recent `RECEIVER_EVENT_CAPACITY` user and message events.
+    """
+    lags = sorted(delivery_lags)
+    return {
+        "received_count": received_events.received_count,
+        "rejected_count": rejected_count,
+        "duplicate_count": duplicate_count,
+        "delivery_lag_seconds": {
+            "count": len(lags),
+            "p50": _percentile(lags, 0.50),
+            "p99": _percentile(lags, 0.99),
+            "max": lags[-1] if lags else None,
+        },
+    }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,51 @@
+import hashlib
+import hmac
+from typing import Iterable, List, Optional
+
+
+
+# Header carrying the signature of a webhook body, set by the webhook_user_notification_service
+SIGNATURE_HEADER = "Webhook-Signature"
+# Prefix of the signature, naming the digest it was computed with
+SIGNATURE_PREFIX = "sha256="
+
+
+class SignatureVerifier:
+    """
+    Verify the HMAC-SHA256 signatures of received webhook bodies against the known signing secrets.
+
+    Every secret is keyed into an HMAC state once, when the verifier is created; verifying a body
+    copies the keyed states instead of hashing the keys again. Signatures are compared in
+    constant time, so the comparison leaks nothing about the expected signature.
+
+    A receiver subscribed to several events holds one secret per subscription, so a signature is
+    accepted if it matches any of them.
+
+    Attributes:
+        secret_count (int): The number of known signing secrets.
+    """
+
+    def __init__(self, secrets: Iterable[str]):
+        self._keys: List["hmac.HMAC"] = [
+            hmac.new(secret.encode(), digestmod=hashlib.sha256) for secret in secrets
+        ]
+        self.secret_count = len(self._keys)
+
+    def verify(self, body: bytes, signature: Optional[str]) -> bool:
+        """
+        Return whether the signature of a body was made with one of the known secrets.
+
+        Args:
+            body (bytes): The raw body as received, before it is decompressed.
+            signature (str | None): The value of the `Webhook-Signature` header, or None if it is missing.
+        """
+        if not signature or not signature.startswith(SIGNATURE_PREFIX):
+            return False
+        expected = signature[len(SIGNATURE_PREFIX):].encode()
+        valid = False
+        for key in self._keys:
+            signer = key.copy()
+            signer.update(body)
+            # Check every key, so the time taken does not reveal which one matched
+            valid |= hmac.compare_digest(signer.hexdigest().encode(), expected)
+        return valid
@@ -0,0 +1,119 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import deduplication
+import main
+from deduplication import DELIVERY_ID_HEADER, BloomFilter, SeenIdCache, create_deduplicator
+from event_store import EventStore
+
+
+
+class FakeClock:
+    """
+    Stands in for the `time` module of deduplication, so the tests control the time.
+    """
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def test_seen_ids_expire_after_their_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(deduplication, "time", clock)
+    cache = SeenIdCache(capacity=10, ttl_seconds=60)
+
+    assert not cache.seen("a")
+    clock.now += 30
+    assert not cache.seen("b")
+    assert cache.seen("a")
+
+    clock.now += 30
+    # "a" was first seen 60 seconds ago, seeing it again does not extend its time
+    assert not cache.seen("a")
+    assert cache.seen("b")
+    clock.now += 31
+    assert not cache.seen("b")
+    assert cache.seen("a")
+
+
+def test_oldest_ids_are_evicted_at_capacity():
+    cache = SeenIdCache(capacity=2, ttl_seconds=60)
+    for delivery_id in ("a", "b", "c"):
+        assert not cache.seen(delivery_id)
+
+    assert len(cache) == 2
+    assert cache.seen("c")
+    assert cache.seen("b")
+    assert not cache.seen("a")
+
+
+def test_bloom_filter_remembers_ids_for_a_generation_after_rotating():
+    bloom = BloomFilter(capacity=100, false_positive_rate=0.001)
+    first = [f"first-{index}" for index in range(100)]
+    second = [f"second-{index}" for index in range(100)]
+
+    assert not any(bloom.seen(delivery_id) for delivery_id in first)
+    assert all(bloom.seen(delivery_id) for delivery_id in first)
+    # The current filter is full: the next new ID starts a new generation, the first one is still checked
+    assert sum(bloom.seen(delivery_id) for delivery_id in second) <= 1
+    assert all(bloom.seen(delivery_id) for delivery_id in first)
+    # Once the second generation is full as well, the first one is forgotten
+    bloom.seen("third-0")
+    assert sum(bloom.seen(delivery_id) for delivery_id in first[:50]) <= 1
+
+
+def test_deduplicators_are_created_by_name():
+    assert isinstance(create_deduplicator("lru"), SeenIdCache)
+    assert isinstance(create_deduplicator("bloom", capacity=10), BloomFilter)
+    assert create_deduplicator("off") is None
+    with pytest.raises(ValueError):
+        create_deduplicator("exact")
+
+
+@pytest.fixture
+def receiver(monkeypatch):
+    store = EventStore(capacity=100)
+    monkeypatch.setattr(main, "received_events", store)
+    monkeypatch.setattr(main, "deduplicator", SeenIdCache())
+    monkeypatch.setattr(main, "duplicate_count", 0)
+    monkeypatch.setattr(main, "signature_verifier", None)
+    return store
+
+
+def test_retried_delivery_is_acknowledged_but_stored_once(receiver):
+    body = json.dumps({"delivery_id": "event-1", "event": "user_registered", "data": {"username": "alice"}})
+    with TestClient(main.app) as client:
+        first = client.post("/webhook", content=body, headers={DELIVERY_ID_HEADER: "41"})
+        retry = client.post("/webhook", content=body, headers={DELIVERY_ID_HEADER: "41"})
+        # The same event delivered to another subscription of the receiver is a delivery of its own
+        other = client.post("/webhook", content=body, headers={DELIVERY_ID_HEADER: "42"})
+
+    assert first.status_code == retry.status_code == 200
+    assert (first.json()["received_count"], retry.json()["received_count"], other.json()["received_count"]) == (1, 0, 1)
+    assert retry.json()["duplicate_count"] == 1
+    assert receiver.received_count == 2
+    assert main.duplicate_count == 1
+
+
+def test_batch_is_deduplicated_per_event(receiver):
+    batch = json.dumps([{"event": "user_registered", "data": {}}, {"event": "user_registered", "data": {}}])
+    with TestClient(main.app) as client:
+        client.post("/webhook", content=batch, headers={DELIVERY_ID_HEADER: "1,2"})
+        response = client.post("/webhook", content=batch, headers={DELIVERY_ID_HEADER: "2, 3"})
+
+    assert (response.json()["received_count"], response.json()["duplicate_count"]) == (1, 1)
+    assert receiver.received_count == 3
+
+
+def test_body_delivery_id_is_used_without_the_header(receiver):
+    body = json.dumps({"delivery_id": "ping-1", "event": "ping", "data": {}})
+    with TestClient(main.app) as client:
+        client.post("/webhook", content=body)
+        response = client.post("/webhook", content=body)
+
+    assert response.json()["duplicate_count"] == 1
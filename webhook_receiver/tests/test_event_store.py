@@ -0,0 +1,90 @@
+import pytest
+
+from event_store import EventStore
+
+
+
+def add(store: EventStore, *event_types: str):
+    return [store.add(event_type, {"n": store.last_sequence + 1}, "2025-05-07T04:00:00+00:00") for event_type in event_types]
+
+
+def sequences(events):
+    return [event["sequence"] for event in events]
+
+
+def test_capacity_must_be_positive():
+    with pytest.raises(ValueError):
+        EventStore(0)
+
+
+def test_eviction_keeps_the_ring_buffer_and_the_type_index_consistent():
+    store = EventStore(capacity=3)
+    add(store, "a", "b", "a", "a", "c")
+
+    assert len(store) == 3
+    assert sequences(store._events) == [3, 4, 5]
+    assert {event_type: sequences(events) for event_type, events in store._events_by_type.items()} == {"a": [3, 4], "c": [5]}
+    assert store.received_count == 5
+
+
+def test_pages_are_newest_first_with_the_sequence_as_cursor():
+    store = EventStore(capacity=10)
+    add(store, "a", "b", "a", "b", "a")
+
+    assert sequences(store.page(limit=2)) == [5, 4]
+    assert sequences(store.page(before=4, limit=2)) == [3, 2]
+    assert sequences(store.page("a", before=5, limit=5)) == [3, 1]
+    assert store.page("missing") == []
+
+
+def test_evicted_events_are_dropped_without_a_spill_log():
+    store = EventStore(capacity=2)
+    add(store, "a", "a", "a")
+
+    assert sequences(store.page(limit=10)) == [3, 2]
+    assert not store.spill_pending
+
+
+def test_pages_continue_from_memory_into_the_spill_log(tmp_path):
+    store = EventStore(capacity=2, spill_path=tmp_path / "events.jsonl")
+    add(store, "a", "b", "a", "b", "a", "b")
+
+    # Evicted events are paged from memory until they are written
+    assert store.spill_pending
+    assert sequences(store.page(limit=10)) == [6, 5, 4, 3, 2, 1]
+    store.flush_spilled()
+    assert not store.spill_pending
+
+    assert sequences(store.page(limit=3)) == [6, 5, 4]
+    assert sequences(store.page(before=4, limit=3)) == [3, 2, 1]
+    assert sequences(store.page("a", limit=10)) == [5, 3, 1]
+    assert sequences(store.page("b", before=6, limit=2)) == [4, 2]
+    assert store.page(before=1) == []
+    store.close()
+
+
+def test_spill_log_is_indexed_again_after_a_restart(tmp_path):
+    path = tmp_path / "events.jsonl"
+    store = EventStore(capacity=2, spill_path=path)
+    add(store, "a", "b", "a")
+    store.flush_spilled()
+    store.close()
+
+    restarted = EventStore(capacity=2, spill_path=path)
+    assert restarted.last_sequence == 3
+    (event,) = add(restarted, "b")
+    assert event["sequence"] == 4
+    assert sequences(restarted.page(limit=10)) == [4, 3, 2, 1]
+    assert sequences(restarted.page("a", limit=10)) == [3, 1]
+    assert restarted.page("a", limit=1)[0]["data"] == {"n": 3}
+    restarted.close()
+
+
+def test_since_returns_the_newer_events_oldest_first():
+    store = EventStore(capacity=3)
+    add(store, "a", "b", "a", "b", "a")
+
+    assert sequences(store.since(3)) == [4, 5]
+    assert sequences(store.since(0)) == [3, 4, 5]
+    assert sequences(store.since(2, "a")) == [3, 5]
+    assert store.since(5) == []
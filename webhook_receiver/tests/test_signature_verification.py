@@ -0,0 +1,87 @@
+import gzip
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from deduplication import SeenIdCache
+from event_store import EventStore
+from signature_verification import SIGNATURE_HEADER, SIGNATURE_PREFIX, SignatureVerifier
+
+
+
+def load_service_signing():
+    """
+    Load the signing module of the webhook_user_notification_service by its path, it only depends on the standard library.
+    """
+    path = Path(__file__).parents[2] / "webhook_user_notification_service" / "app" / "webhook_delivery" / "payload_signing.py"
+    spec = importlib.util.spec_from_file_location("service_payload_signing", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+service_signing = load_service_signing()
+
+
+def gzip_body(event: str = "user_registered") -> bytes:
+    return gzip.compress(json.dumps({"delivery_id": "1", "event": event, "data": {"username": "alice"}}).encode())
+
+
+def test_receiver_accepts_the_signature_of_the_service_over_the_compressed_body():
+    secret = service_signing.generate_signing_secret()
+    body = gzip_body()
+    signature = service_signing.sign_payload(body, secret)
+
+    assert service_signing.SIGNATURE_HEADER == SIGNATURE_HEADER
+    assert SignatureVerifier([secret]).verify(body, signature)
+    # The signature covers the bytes on the wire, not the decompressed JSON
+    assert not SignatureVerifier([secret]).verify(gzip.decompress(body), signature)
+
+
+def test_missing_signature_is_rejected():
+    verifier = SignatureVerifier(["secret"])
+    assert not verifier.verify(b"{}", None)
+    assert not verifier.verify(b"{}", "")
+
+
+def test_signature_without_the_digest_prefix_is_rejected():
+    signature = service_signing.sign_payload(b"{}", "secret")
+    verifier = SignatureVerifier(["secret"])
+
+    assert verifier.verify(b"{}", signature)
+    assert not verifier.verify(b"{}", signature[len(SIGNATURE_PREFIX):])
+    assert not verifier.verify(b"{}", "sha1=" + signature[len(SIGNATURE_PREFIX):])
+
+
+def test_any_of_several_secrets_is_accepted_during_a_rotation():
+    old_secret, new_secret = "old-secret", "new-secret"
+    verifier = SignatureVerifier([old_secret, new_secret])
+
+    assert verifier.secret_count == 2
+    assert verifier.verify(b"{}", service_signing.sign_payload(b"{}", old_secret))
+    assert verifier.verify(b"{}", service_signing.sign_payload(b"{}", new_secret))
+    assert not verifier.verify(b"{}", service_signing.sign_payload(b"{}", "revoked-secret"))
+    # Once the old secret is dropped, its signatures are no longer accepted
+    assert not SignatureVerifier([new_secret]).verify(b"{}", service_signing.sign_payload(b"{}", old_secret))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "received_events", EventStore(capacity=100))
+    monkeypatch.setattr(main, "deduplicator", SeenIdCache())
+    monkeypatch.setattr(main, "signature_verifier", SignatureVerifier(["secret"]))
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_webhook_endpoint_rejects_unsigned_webhooks(client):
+    body = gzip_body()
+    headers = {"Content-Encoding": "gzip"}
+
+    assert client.post("/webhook", content=body, headers=headers).status_code == 401
+    signed = {**headers, SIGNATURE_HEADER: service_signing.sign_payload(body, "secret")}
+    assert client.post("/webhook", content=body, headers=signed).status_code == 200
@@ -1,14 +1,43 @@
 from .webhook_storage import (
     update,
     remove,
+    update_many,
+    remove_many,
+    export_subscriptions,
     read,
+    patterns,
     send,
+    iter_send,
+    signing_secrets,
     trigger_webhooks,
+    trigger_webhooks_many,
+    events,
+    create_event,
+    route,
+    routing_table,
+    storage,
+)
+
+from .webhook_routing import (
+    Route,
+    RoutingTable,
+    is_event_pattern,
+)
+
+from .storage_backend import (
+    StorageBackend,
+    create_storage_backend,
 )
 
 from .webhook_errors import (
+    WebhookStorageError,
+    WebhookEventAlreadyExistsError,
     WebhookEventNotFoundError,
     WebhookEventHasNoURLsError,
     WebhookUrlAlreadyExistsError,
     WebhookUrlNotFoundError,
+)
+
+from .user_errors import (
+    UserAlreadyExistsError,
 )
\ No newline at end of file
@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+
+# Number of bytes read at a time while searching the journal backwards for its last complete line
+JOURNAL_READ_CHUNK_SIZE = 4096
+
+
+class FileLock:
+    """
+    An exclusive lock shared between threads and processes, backed by a lock file.
+
+    The lock is re-entrant within a thread, so nested `with` blocks are allowed. Across
+    processes (e.g. several uvicorn workers) it uses `fcntl.flock` on POSIX systems and
+    `msvcrt.locking` on Windows.
+
+    Attributes:
+        path (Path): The path to the lock file. It is created if it does not exist.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def __enter__(self) -> "FileLock":
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._file = open(self.path, "a+")
+                self._lock_file()
+            except BaseException:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            try:
+                self._unlock_file()
+            finally:
+                self._file.close()
+                self._file = None
+        self._thread_lock.release()
+
+    def _lock_file(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+            return
+        self._file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                return
+            except OSError:
+                time.sleep(0.01)
+
+    def _unlock_file(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            return
+        self._file.seek(0)
+        msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def atomic_write_json(path: Path, data: Any) -> None:
+    """
+    Write JSON data to a file so that readers see either the old or the new content, never a partial file.
+
+    The data is written to a temporary file in the same directory, flushed to disk and then
+    renamed over the target file.
+
+    Args:
+        path (Path): The file to write.
+        data (Any): The JSON serializable data to write.
+
+    Raises:
+        IOError: If there is an error writing the file.
+    """
+    temporary_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with temporary_path.open("w") as file:
+            json.dump(data, file, indent=4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        temporary_path.unlink(missing_ok=True)
+        raise
+    _fsync_directory(path.parent)
+
+
+def _fsync_directory(directory: Path) -> None:
+    """
+    Flush a directory entry to disk so a rename survives a crash. Not supported on Windows.
+    """
+    if fcntl is None:
+        return
+    directory_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+
+
+class ChangeJournal:
+    """
+    An append-only file of JSON change records, one per line.
+
+    Appending a record costs O(1) I/O regardless of how much data the journal describes.
+    A record is committed once its line, including the newline, is on disk. A record that was
+    only partially written (e.g. because the process crashed) is ignored when the journal is
+    read, and cut off before the next append, so later records never end up on the same line.
+
+    Attributes:
+        path (Path): The path to the journal file. It is created on the first append.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def append(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Append records to the journal and flush them to disk.
+
+        Must be called while holding the lock of the journal, like every other write.
+
+        Args:
+            records (List[Dict[str, Any]]): The change records to append.
+        """
+        lines = "".join(json.dumps(record) + "\n" for record in records).encode()
+        with self.path.open("ab+") as file:
+            self._truncate_torn_tail(file)
+            file.write(lines)
+            file.flush()
+            os.fsync(file.fileno())
+
+    @staticmethod
+    def _truncate_torn_tail(file) -> None:
+        """
+        Cut the journal back to its last complete line, removing a record that was only partially written.
+        """
+        end = file.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - JOURNAL_READ_CHUNK_SIZE)
+            file.seek(start)
+            newline = file.read(position - start).rfind(b"\n")
+            if newline != -1:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            file.truncate(position)
+            file.seek(position)
+
+    def read(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the records in the journal in the order they were appended.
+        """
+        if not self.path.exists():
+            return
+        with self.path.open("r") as file:
+            for line in file:
+                if not line.endswith("\n"):
+                    # A torn write at the end of the journal, the change was never committed
+                    return
+                yield json.loads(line)
+
+    def truncate(self) -> None:
+        """
+        Remove all records from the journal.
+        """
+        with self.path.open("w") as file:
+            file.flush()
+            os.fsync(file.fileno())
+
+    def signature(self) -> Optional[tuple]:
+        """
+        Return the modification time and size of the journal, or None if it does not exist.
+        """
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
@@ -0,0 +1,139 @@
+import time
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from observability import storage_duration
+from pydantic_models import UserResponse, SendMessageResponse
+from .storage_backend import StorageBackend
+from .user_errors import UserAlreadyExistsError
+from .webhook_errors import WebhookStorageError
+
+
+T = TypeVar("T")
+
+
+class InstrumentedStorageBackend(StorageBackend):
+    """
+    Wrap a storage backend and record the duration of every operation in the storage metrics.
+
+    Iterators are timed while they produce items, not while the caller consumes them, so a
+    streaming response to a slow client does not show up as a slow storage read.
+
+    Attributes:
+        backend (StorageBackend): The wrapped backend.
+        name (str): The name of the backend, used as the `backend` label of the metrics.
+    """
+
+    def __init__(self, backend: StorageBackend, name: str):
+        self.backend = backend
+        self.name = name
+
+    @contextmanager
+    def _measure(self, operation: str) -> Iterator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            storage_duration.labels(self.name, operation).observe(time.perf_counter() - started_at)
+
+    def _measure_iterator(self, operation: str, iterator: Iterator[T]) -> Iterator[T]:
+        elapsed = 0.0
+        try:
+            while True:
+                started_at = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - started_at
+                yield item
+        finally:
+            storage_duration.labels(self.name, operation).observe(elapsed)
+
+    def webhooks(self) -> Dict[str, List[str]]:
+        with self._measure("webhooks"):
+            return self.backend.webhooks()
+
+    def webhook_urls(self, event: str) -> Optional[List[str]]:
+        with self._measure("webhook_urls"):
+            return self.backend.webhook_urls(event)
+
+    def webhook_subscriptions(self, event: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        with self._measure("webhook_subscriptions"):
+            return self.backend.webhook_subscriptions(event)
+
+    def all_subscriptions(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        with self._measure("all_subscriptions"):
+            return self.backend.all_subscriptions()
+
+    def subscriptions_version(self) -> Any:
+        with self._measure("subscriptions_version"):
+            return self.backend.subscriptions_version()
+
+    def add_event(self, event: str) -> None:
+        with self._measure("add_event"):
+            self.backend.add_event(event)
+
+    def add_webhook(self, event: str, url: str, options: Optional[Dict[str, Any]] = None) -> None:
+        with self._measure("add_webhook"):
+            self.backend.add_webhook(event, url, options)
+
+    def remove_webhook(self, event: str, url: str) -> None:
+        with self._measure("remove_webhook"):
+            self.backend.remove_webhook(event, url)
+
+    def add_webhooks(
+        self,
+        subscriptions: List[Tuple[str, str, Optional[Dict[str, Any]]]],
+        atomic: bool = False,
+    ) -> List[Optional[WebhookStorageError]]:
+        with self._measure("add_webhooks"):
+            return self.backend.add_webhooks(subscriptions, atomic)
+
+    def remove_webhooks(
+        self,
+        subscriptions: List[Tuple[str, str]],
+        atomic: bool = False,
+    ) -> List[Optional[WebhookStorageError]]:
+        with self._measure("remove_webhooks"):
+            return self.backend.remove_webhooks(subscriptions, atomic)
+
+    def add_user(self, user: UserResponse) -> None:
+        with self._measure("add_user"):
+            self.backend.add_user(user)
+
+    def add_users(self, users: List[UserResponse]) -> List[Optional[UserAlreadyExistsError]]:
+        with self._measure("add_users"):
+            return self.backend.add_users(users)
+
+    def get_user(self, username: str) -> Optional[UserResponse]:
+        with self._measure("get_user"):
+            return self.backend.get_user(username)
+
+    def get_users(self, usernames: Iterable[str]) -> Dict[str, UserResponse]:
+        with self._measure("get_users"):
+            return self.backend.get_users(usernames)
+
+    def iter_users(self, after: Optional[int] = None, since: Optional[datetime] = None) -> Iterator[Tuple[int, UserResponse]]:
+        return self._measure_iterator("iter_users", self.backend.iter_users(after, since))
+
+    def add_message(self, message: SendMessageResponse) -> None:
+        with self._measure("add_message"):
+            self.backend.add_message(message)
+
+    def add_messages(self, messages: List[SendMessageResponse]) -> None:
+        with self._measure("add_messages"):
+            self.backend.add_messages(messages)
+
+    def iter_messages(
+        self,
+        recipient: str,
+        after: Optional[int] = None,
+        since: Optional[datetime] = None,
+    ) -> Iterator[Tuple[int, SendMessageResponse]]:
+        return self._measure_iterator("iter_messages", self.backend.iter_messages(recipient, after, since))
+
+    def close(self) -> None:
+        self.backend.close()
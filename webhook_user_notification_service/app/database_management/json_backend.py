@@ -0,0 +1,167 @@
+import threading
+from bisect import bisect_left
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from pydantic_models import UserResponse, SendMessageResponse
+from .storage_backend import StorageBackend, to_utc
+from .user_errors import UserAlreadyExistsError
+from .webhook_errors import (
+    WebhookEventAlreadyExistsError,
+    WebhookEventNotFoundError,
+    WebhookStorageError,
+    WebhookUrlAlreadyExistsError,
+    WebhookUrlNotFoundError
+    )
+from .webhook_registry import WebhookRegistry
+from .webhook_routing import is_event_pattern
+
+
+
+class JsonStorageBackend(StorageBackend):
+    """
+    The default storage backend.
+
+    Webhook subscriptions are stored in the JSON storage file through the in-memory
+    `WebhookRegistry`. Users and messages are kept in memory only and are lost on restart.
+
+    Users are indexed by their case-folded username and messages by their case-folded recipient,
+    so user lookups are O(1) and reading an inbox is O(k) in the number of messages it contains.
+    The cursor of a user or message is its 1-based position in registration or inbox order, so
+    resuming a page is O(1) and a `since` filter is a binary search over the creation timestamps.
+
+    Attributes:
+        registry (WebhookRegistry): The in-memory index of the storage file.
+    """
+
+    def __init__(self, path: Path):
+        self.registry = WebhookRegistry(path)
+        # Case-folded username -> user, in registration order
+        self._users: Dict[str, UserResponse] = {}
+        # Users in registration order, the position is the cursor
+        self._user_list: List[UserResponse] = []
+        # Case-folded recipient -> messages sent to the recipient, in the order they were sent
+        self._messages_by_recipient: Dict[str, List[SendMessageResponse]] = {}
+        # Makes checking and adding a username atomic, bulk registrations run in worker threads
+        self._users_lock = threading.Lock()
+
+    def webhooks(self) -> Dict[str, List[str]]:
+        return self.registry.snapshot()
+
+    def webhook_urls(self, event: str) -> Optional[List[str]]:
+        return self.registry.get(event)
+
+    def webhook_subscriptions(self, event: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        return self.registry.subscriptions(event)
+
+    def all_subscriptions(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        return self.registry.all_subscriptions()
+
+    def subscriptions_version(self) -> Any:
+        return self.registry.version()
+
+    def add_event(self, event: str) -> None:
+        if not self.registry.add_event(event):
+            raise WebhookEventAlreadyExistsError(event)
+
+    def add_webhook(self, event: str, url: str, options: Optional[Dict[str, Any]] = None) -> None:
+        try:
+            added = self.registry.add(event, url, options, create=is_event_pattern(event))
+        except KeyError:
+            raise WebhookEventNotFoundError(event)
+        if not added:
+            raise WebhookUrlAlreadyExistsError(url, event)
+
+    def remove_webhook(self, event: str, url: str) -> None:
+        try:
+            removed = self.registry.discard(event, url)
+        except KeyError:
+            raise WebhookEventNotFoundError(event)
+        if not removed:
+            raise WebhookUrlNotFoundError(url, event)
+
+    def add_webhooks(
+        self,
+        subscriptions: List[Tuple[str, str, Optional[Dict[str, Any]]]],
+        atomic: bool = False,
+    ) -> List[Optional[WebhookStorageError]]:
+        added = self.registry.add_many(
+            [(event, url, options, is_event_pattern(event)) for event, url, options in subscriptions],
+            atomic
+        )
+        return [
+            None if result else WebhookEventNotFoundError(event) if result is None else WebhookUrlAlreadyExistsError(url, event)
+            for (event, url, _), result in zip(subscriptions, added)
+        ]
+
+    def remove_webhooks(
+        self,
+        subscriptions: List[Tuple[str, str]],
+        atomic: bool = False,
+    ) -> List[Optional[WebhookStorageError]]:
+        removed = self.registry.discard_many(subscriptions, atomic)
+        return [
+            None if result else WebhookEventNotFoundError(event) if result is None else WebhookUrlNotFoundError(url, event)
+            for (event, url), result in zip(subscriptions, removed)
+        ]
+
+    def add_user(self, user: UserResponse) -> None:
+        key = user.username.casefold()
+        with self._users_lock:
+            if key in self._users:
+                raise UserAlreadyExistsError(user.username)
+            self._users[key] = user
+            self._user_list.append(user)
+
+    def add_users(self, users: List[UserResponse]) -> List[Optional[UserAlreadyExistsError]]:
+        # Check and insert the whole list under one lock acquisition
+        errors: List[Optional[UserAlreadyExistsError]] = []
+        with self._users_lock:
+            for user in users:
+                key = user.username.casefold()
+                if key in self._users:
+                    errors.append(UserAlreadyExistsError(user.username))
+                    continue
+                self._users[key] = user
+                self._user_list.append(user)
+                errors.append(None)
+        return errors
+
+    def get_user(self, username: str) -> Optional[UserResponse]:
+        return self._users.get(username.casefold())
+
+    def iter_users(self, after: Optional[int] = None, since: Optional[datetime] = None) -> Iterator[Tuple[int, UserResponse]]:
+        return _iter_from(self._user_list, after, since, lambda user: user.registered_at)
+
+    def add_message(self, message: SendMessageResponse) -> None:
+        self._messages_by_recipient.setdefault(message.recipient.casefold(), []).append(message)
+
+    def iter_messages(
+        self,
+        recipient: str,
+        after: Optional[int] = None,
+        since: Optional[datetime] = None,
+    ) -> Iterator[Tuple[int, SendMessageResponse]]:
+        messages = self._messages_by_recipient.get(recipient.casefold(), [])
+        return _iter_from(messages, after, since, lambda message: message.received_at)
+
+
+def _iter_from(
+    items: Sequence[Any],
+    after: Optional[int],
+    since: Optional[datetime],
+    timestamp: Callable[[Any], str],
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Yield `(cursor, item)` pairs of an append-only list, starting after a cursor and at a timestamp.
+
+    The items are appended in creation order, so their timestamps are sorted and the first item
+    at or after `since` can be found with a binary search. Only the timestamps it probes are parsed.
+    """
+    start = after if after is not None and after > 0 else 0
+    if since is not None:
+        start = max(start, bisect_left(items, to_utc(since), key=lambda item: datetime.fromisoformat(timestamp(item))))
+    # Bound the iteration by the current length, items appended meanwhile are picked up by the next page
+    for position in range(start, len(items)):
+        yield position + 1, items[position]
@@ -0,0 +1,48 @@
+"""
+Import the webhook subscriptions from the JSON storage file into the SQLite storage backend.
+
+Run from the `app` directory:
+
+    $ poetry run python -m database_management.migrate_json_to_sqlite
+
+Existing events and subscriptions in the database are kept, so the migration can be run more than once.
+"""
+import argparse
+from pathlib import Path
+from typing import Any, Dict
+
+from .sqlite_backend import SqliteStorageBackend
+from .storage_backend import STORAGE_FILE, SQLITE_STORAGE_FILE
+from .webhook_registry import WebhookRegistry
+
+
+def migrate(json_path: Path = STORAGE_FILE, sqlite_path: Path = SQLITE_STORAGE_FILE) -> int:
+    """
+    Import all events and subscriptions, with their options, of a JSON storage file (including its change journal) into a SQLite database.
+
+    Args:
+        json_path (Path): The path to the JSON storage file.
+        sqlite_path (Path): The path to the SQLite database. It is created if it does not exist.
+
+    Returns:
+        count (int): The number of subscriptions that were imported.
+    """
+    registry = WebhookRegistry(json_path)
+    data: Dict[str, Dict[str, Dict[str, Any]]] = {
+        event: registry.subscriptions(event) or {} for event in registry.snapshot()
+    }
+    backend = SqliteStorageBackend(sqlite_path)
+    try:
+        return backend.import_webhooks(data)
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--json", type=Path, default=STORAGE_FILE, help="The JSON storage file to import.")
+    parser.add_argument("--sqlite", type=Path, default=SQLITE_STORAGE_FILE, help="The SQLite database to import into.")
+    arguments = parser.parse_args()
+
+    imported = migrate(arguments.json, arguments.sqlite)
+    print(f"Imported {imported} subscriptions from {arguments.json} into {arguments.sqlite}")
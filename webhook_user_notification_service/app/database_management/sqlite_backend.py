@@ -0,0 +1,429 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic_models import UserResponse, SendMessageResponse
+from .storage_backend import StorageBackend, to_utc
+from .user_errors import UserAlreadyExistsError
+from .webhook_errors import (
+    WebhookEventAlreadyExistsError,
+    WebhookEventNotFoundError,
+    WebhookStorageError,
+    WebhookUrlAlreadyExistsError,
+    WebhookUrlNotFoundError
+    )
+from .webhook_routing import is_event_pattern
+
+
+
+# Number of rows fetched per query when iterating over users or messages
+ITER_PAGE_SIZE = 500
+# How long (in seconds) a write waits for the lock held by another worker process before it fails
+BUSY_TIMEOUT_SECONDS = 30.0
+# Events that exist in a newly created database
+DEFAULT_EVENTS = ("user_registered", "user_send_message")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    name TEXT PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS subscriptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event TEXT NOT NULL REFERENCES events (name),
+    url TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    UNIQUE (event, url)
+);
+CREATE INDEX IF NOT EXISTS idx_subscriptions_event ON subscriptions (event, id);
+
+-- Incremented by the triggers below whenever an event or a subscription is added or removed
+CREATE TABLE IF NOT EXISTS subscriptions_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO subscriptions_version (id, version) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS trg_events_insert AFTER INSERT ON events
+BEGIN UPDATE subscriptions_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_subscriptions_insert AFTER INSERT ON subscriptions
+BEGIN UPDATE subscriptions_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_subscriptions_update AFTER UPDATE ON subscriptions
+BEGIN UPDATE subscriptions_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS trg_subscriptions_delete AFTER DELETE ON subscriptions
+BEGIN UPDATE subscriptions_version SET version = version + 1; END;
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username TEXT NOT NULL,
+    registered_at TEXT NOT NULL,
+    -- The case-folded username, see `_username_key`
+    username_key TEXT NOT NULL DEFAULT ''
+);
+
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    message TEXT NOT NULL,
+    received_at TEXT NOT NULL,
+    -- The case-folded recipient, see `_username_key`
+    recipient_key TEXT NOT NULL DEFAULT ''
+);
+"""
+
+# Indexes on the columns added by `SqliteStorageBackend._migrate`, created once an existing database has them
+KEY_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username_key ON users (username_key);
+CREATE INDEX IF NOT EXISTS idx_messages_recipient_key ON messages (recipient_key, id);
+"""
+
+
+def _username_key(username: str) -> str:
+    """
+    Return the key under which a username is stored, looked up and checked for uniqueness.
+
+    Usernames are compared with full Unicode case folding, like the `json` backend does, so
+    "Straße" and "STRASSE" are the same user. `COLLATE NOCASE` only folds ASCII letters.
+    """
+    return username.casefold()
+
+
+class SqliteStorageBackend(StorageBackend):
+    """
+    A storage backend that keeps webhooks, users and messages in a SQLite database.
+
+    The database runs in WAL mode, so readers never block the writer, and it can be shared by
+    several worker processes (`WEBHOOK_WORKERS`): users and messages written by one process are
+    seen by all, and subscription changes bump a version that every process's routing table checks. Subscriptions are indexed by event, users by username and
+    messages by recipient, both through their case-folded keys. Each thread uses its own connection.
+
+    Attributes:
+        path (Path): The path to the SQLite database file.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        with self._connection() as connection:
+            connection.executescript(SCHEMA)
+            self._migrate(connection)
+            connection.executescript(KEY_INDEXES)
+            connection.executemany("INSERT OR IGNORE INTO events (name) VALUES (?)", [(event,) for event in DEFAULT_EVENTS])
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        Return the connection of the current thread, opening it on first use.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def _migrate(connection: sqlite3.Connection) -> None:
+        """
+        Add the columns introduced after the first version of the schema to an existing database.
+
+        Raises:
+            RuntimeError: If existing users only differ in the case of their usernames.
+        """
+        subscription_columns = {row[1] for row in connection.execute("PRAGMA table_info(subscriptions)")}
+        if "options" not in subscription_columns:
+            connection.execute("ALTER TABLE subscriptions ADD COLUMN options TEXT NOT NULL DEFAULT '{}'")
+
+        # Usernames and recipients used to be indexed with `COLLATE NOCASE`, replaced by case-folded keys
+        connection.execute("DROP INDEX IF EXISTS idx_users_username")
+        connection.execute("DROP INDEX IF EXISTS idx_messages_recipient")
+        user_columns = {row[1] for row in connection.execute("PRAGMA table_info(users)")}
+        if "username_key" not in user_columns:
+            connection.execute("ALTER TABLE users ADD COLUMN username_key TEXT NOT NULL DEFAULT ''")
+        message_columns = {row[1] for row in connection.execute("PRAGMA table_info(messages)")}
+        if "recipient_key" not in message_columns:
+            connection.execute("ALTER TABLE messages ADD COLUMN recipient_key TEXT NOT NULL DEFAULT ''")
+
+        # Fill in the keys of rows written before the columns existed (a no-op once they are filled in)
+        connection.executemany(
+            "UPDATE users SET username_key = ? WHERE id = ?",
+            [(_username_key(username), id) for id, username in connection.execute("SELECT id, username FROM users WHERE username_key = ''")]
+        )
+        connection.executemany(
+            "UPDATE messages SET recipient_key = ? WHERE id = ?",
+            [(_username_key(recipient), id) for id, recipient in connection.execute("SELECT id, recipient FROM messages WHERE recipient_key = ''")]
+        )
+        # Users that `COLLATE NOCASE` told apart may share a key, which the unique index of `KEY_INDEXES` would reject
+        if connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_users_username_key'").fetchone() is not None:
+            return
+        conflicts = connection.execute(
+            "SELECT group_concat(username, ', ') FROM users GROUP BY username_key HAVING count(*) > 1"
+        ).fetchall()
+        if conflicts:
+            raise RuntimeError(
+                f"Usernames that differ only in case cannot be told apart: {'; '.join(row[0] for row in conflicts)}. "
+                "Rename all but one user of each group before starting the service."
+            )
+
+    def webhooks(self) -> Dict[str, List[str]]:
+        connection = self._connection()
+        data: Dict[str, List[str]] = {
+            row[0]: [] for row in connection.execute("SELECT name FROM events ORDER BY rowid")
+        }
+        for event, url in connection.execute("SELECT event, url FROM subscriptions ORDER BY id"):
+            data[event].append(url)
+        return data
+
+    def webhook_urls(self, event: str) -> Optional[List[str]]:
+        connection = self._connection()
+        if connection.execute("SELECT 1 FROM events WHERE name = ?", (event,)).fetchone() is None:
+            return None
+        return [row[0] for row in connection.execute("SELECT url FROM subscriptions WHERE event = ? ORDER BY id", (event,))]
+
+    def webhook_subscriptions(self, event: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        connection = self._connection()
+        if connection.execute("SELECT 1 FROM events WHERE name = ?", (event,)).fetchone() is None:
+            return None
+        return {
+            row[0]: json.loads(row[1])
+            for row in connection.execute("SELECT url, options FROM subscriptions WHERE event = ? ORDER BY id", (event,))
+        }
+
+    def all_subscriptions(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        connection = self._connection()
+        data: Dict[str, Dict[str, Dict[str, Any]]] = {
+            row[0]: {} for row in connection.execute("SELECT name FROM events ORDER BY rowid")
+        }
+        for event, url, options in connection.execute("SELECT event, url, options FROM subscriptions ORDER BY id"):
+            data[event][url] = json.loads(options)
+        return data
+
+    def subscriptions_version(self) -> Any:
+        return self._connection().execute("SELECT version FROM subscriptions_version").fetchone()[0]
+
+    def add_event(self, event: str) -> None:
+        try:
+            with self._connection() as connection:
+                connection.execute("INSERT INTO events (name) VALUES (?)", (event,))
+        except sqlite3.IntegrityError:
+            raise WebhookEventAlreadyExistsError(event)
+
+    def add_webhook(self, event: str, url: str, options: Optional[Dict[str, Any]] = None) -> None:
+        with self._connection() as connection:
+            if is_event_pattern(event):
+                connection.execute("INSERT OR IGNORE INTO events (name) VALUES (?)", (event,))
+            if connection.execute("SELECT 1 FROM events WHERE name = ?", (event,)).fetchone() is None:
+                raise WebhookEventNotFoundError(event)
+            try:
+                connection.execute(
+                    "INSERT INTO subscriptions (event, url, options) VALUES (?, ?, ?)",
+                    (event, url, json.dumps(options or {}))
+                )
+            except sqlite3.IntegrityError:
+                raise WebhookUrlAlreadyExistsError(url, event)
+
+    def remove_webhook(self, event: str, url: str) -> None:
+        with self._connection() as connection:
+            if connection.execute("SELECT 1 FROM events WHERE name = ?", (event,)).fetchone() is None:
+                raise WebhookEventNotFoundError(event)
+            cursor = connection.execute("DELETE FROM subscriptions WHERE event = ? AND url = ?", (event, url))
+            if cursor.rowcount == 0:
+                raise WebhookUrlNotFoundError(url, event)
+
+    def add_webhooks(
+        self,
+        subscriptions: List[Tuple[str, str, Optional[Dict[str, Any]]]],
+        atomic: bool = False,
+    ) -> List[Optional[WebhookStorageError]]:
+        errors: List[Optional[WebhookStorageError]] = []
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            existing_events: Dict[str, bool] = {}
+            for event, url, options in subscriptions:
+                if event not in existing_events:
+                    if is_event_pattern(event):
+                        connection.execute("INSERT OR IGNORE INTO events (name) VALUES (?)", (event,))
+                    existing_events[event] = connection.execute(
+                        "SELECT 1 FROM events WHERE name = ?", (event,)
+                    ).fetchone() is not None
+                if not existing_events[event]:
+                    errors.append(WebhookEventNotFoundError(event))
+                    continue
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO subscriptions (event, url, options) VALUES (?, ?, ?)",
+                    (event, url, json.dumps(options or {}))
+                )
+                errors.append(WebhookUrlAlreadyExistsError(url, event) if cursor.rowcount == 0 else None)
+            if atomic and any(errors):
+                connection.rollback()
+        return errors
+
+    def remove_webhooks(
+        self,
+        subscriptions: List[Tuple[str, str]],
+        atomic: bool = False,
+    ) -> List[Optional[WebhookStorageError]]:
+        errors: List[Optional[WebhookStorageError]] = []
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            existing_events: Dict[str, bool] = {}
+            for event, url in subscriptions:
+                if event not in existing_events:
+                    existing_events[event] = connection.execute(
+                        "SELECT 1 FROM events WHERE name = ?", (event,)
+                    ).fetchone() is not None
+                if not existing_events[event]:
+                    errors.append(WebhookEventNotFoundError(event))
+                    continue
+                cursor = connection.execute("DELETE FROM subscriptions WHERE event = ? AND url = ?", (event, url))
+                errors.append(WebhookUrlNotFoundError(url, event) if cursor.rowcount == 0 else None)
+            if atomic and any(errors):
+                connection.rollback()
+        return errors
+
+    def add_user(self, user: UserResponse) -> None:
+        try:
+            with self._connection() as connection:
+                connection.execute(
+                    "INSERT INTO users (username, registered_at, username_key) VALUES (?, ?, ?)",
+                    (user.username, user.registered_at, _username_key(user.username))
+                )
+        except sqlite3.IntegrityError:
+            raise UserAlreadyExistsError(user.username)
+
+    def add_users(self, users: List[UserResponse]) -> List[Optional[UserAlreadyExistsError]]:
+        errors: List[Optional[UserAlreadyExistsError]] = []
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            for user in users:
+                # The unique index checks the username against existing users and earlier users of the list
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO users (username, registered_at, username_key) VALUES (?, ?, ?)",
+                    (user.username, user.registered_at, _username_key(user.username))
+                )
+                errors.append(UserAlreadyExistsError(user.username) if cursor.rowcount == 0 else None)
+        return errors
+
+    def get_user(self, username: str) -> Optional[UserResponse]:
+        row = self._connection().execute(
+            "SELECT username, registered_at FROM users WHERE username_key = ?",
+            (_username_key(username),)
+        ).fetchone()
+        if row is None:
+            return None
+        return UserResponse(username=row[0], registered_at=row[1])
+
+    def get_users(self, usernames: Iterable[str]) -> Dict[str, UserResponse]:
+        # One query for all usernames, passed as a JSON object of usernames to their keys and joined against the key index
+        rows = self._connection().execute(
+            "SELECT requested.key, users.username, users.registered_at FROM json_each(?) AS requested "
+            "JOIN users ON users.username_key = requested.value",
+            (json.dumps({username: _username_key(username) for username in usernames}),)
+        ).fetchall()
+        return {row[0]: UserResponse(username=row[1], registered_at=row[2]) for row in rows}
+
+    def iter_users(self, after: Optional[int] = None, since: Optional[datetime] = None) -> Iterator[Tuple[int, UserResponse]]:
+        for row in self._iter_rows(
+            "SELECT id, username, registered_at FROM users WHERE id > ? AND registered_at >= ?",
+            (),
+            after,
+            since
+        ):
+            yield row[0], UserResponse(username=row[1], registered_at=row[2])
+
+    def add_message(self, message: SendMessageResponse) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO messages (sender, recipient, subject, message, received_at, recipient_key) VALUES (?, ?, ?, ?, ?, ?)",
+                (message.sender, message.recipient, message.subject, message.message, message.received_at, _username_key(message.recipient))
+            )
+
+    def add_messages(self, messages: List[SendMessageResponse]) -> None:
+        with self._connection() as connection:
+            connection.executemany(
+                "INSERT INTO messages (sender, recipient, subject, message, received_at, recipient_key) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (message.sender, message.recipient, message.subject, message.message, message.received_at, _username_key(message.recipient))
+                    for message in messages
+                ]
+            )
+
+    def iter_messages(
+        self,
+        recipient: str,
+        after: Optional[int] = None,
+        since: Optional[datetime] = None,
+    ) -> Iterator[Tuple[int, SendMessageResponse]]:
+        for row in self._iter_rows(
+            "SELECT id, sender, recipient, subject, message, received_at FROM messages "
+            "WHERE recipient_key = ? AND id > ? AND received_at >= ?",
+            (_username_key(recipient),),
+            after,
+            since
+        ):
+            yield row[0], SendMessageResponse(sender=row[1], recipient=row[2], subject=row[3], message=row[4], received_at=row[5])
+
+    def _iter_rows(self, query: str, parameters: tuple, after: Optional[int], since: Optional[datetime]) -> Iterator[tuple]:
+        """
+        Yield the rows of a query in id order, fetching `ITER_PAGE_SIZE` rows per round trip.
+
+        The query must end with `id > ? AND <timestamp> >= ?` conditions. Every page is a separate
+        query on the connection of the calling thread, so the iterator can be resumed from
+        another thread (e.g. while a response is streamed).
+
+        The timestamps are stored as UTC ISO 8601 strings, which sort in time order, so `since`
+        is converted to UTC and formatted the same way before it is compared with them.
+        """
+        last_id = after or 0
+        since_timestamp = to_utc(since).isoformat() if since is not None else ""
+        while True:
+            rows = self._connection().execute(
+                f"{query} ORDER BY id LIMIT ?",
+                parameters + (last_id, since_timestamp, ITER_PAGE_SIZE)
+            ).fetchall()
+            yield from rows
+            if len(rows) < ITER_PAGE_SIZE:
+                return
+            last_id = rows[-1][0]
+
+    def import_webhooks(self, data: Dict[str, Dict[str, Dict[str, Any]]]) -> int:
+        """
+        Import events and subscriptions, skipping the ones that already exist.
+
+        Args:
+            data (Dict[str, Dict[str, Dict[str, Any]]]): A dictionary where keys are event names and values map
+                the subscribed webhook URLs to their subscription options.
+
+        Returns:
+            count (int): The number of subscriptions that were imported.
+        """
+        with self._connection() as connection:
+            connection.executemany("INSERT OR IGNORE INTO events (name) VALUES (?)", [(event,) for event in data])
+            cursor = connection.executemany(
+                "INSERT OR IGNORE INTO subscriptions (event, url, options) VALUES (?, ?, ?)",
+                [
+                    (event, url, json.dumps(options))
+                    for event, subscriptions in data.items()
+                    for url, options in subscriptions.items()
+                ]
+            )
+            return cursor.rowcount
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
@@ -0,0 +1,298 @@
+import os
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic_models import UserResponse, SendMessageResponse
+from .user_errors import UserAlreadyExistsError
+from .webhook_errors import WebhookStorageError
+
+
+
+# Path to the JSON file for storing webhook data (JSON backend)
+STORAGE_FILE = Path(__file__).parent / "webhook_data.json"
+# Path to the SQLite database for storing webhooks, users and messages (SQLite backend)
+SQLITE_STORAGE_FILE = Path(__file__).parent / "webhook_data.db"
+# The storage backend to use, either "json" or "sqlite"
+STORAGE_BACKEND = os.getenv("WEBHOOK_STORAGE_BACKEND", "json")
+
+
+class StorageBackend(ABC):
+    """
+    The interface every storage backend implements.
+
+    A backend stores the webhook subscriptions (event name to subscribed URLs, each with its
+    subscription options), the registered users and the messages sent between them. Events are
+    created through `add_event`; a URL can only be subscribed to an event that already exists,
+    or to a wildcard pattern (e.g. `user_*`), which is created on its first subscription.
+    """
+
+    # --- Webhook subscriptions ---
+
+    @abstractmethod
+    def webhooks(self) -> Dict[str, List[str]]:
+        """
+        Return all events and their subscribed URLs.
+        """
+
+    @abstractmethod
+    def webhook_urls(self, event: str) -> Optional[List[str]]:
+        """
+        Return the URLs subscribed to an event, or None if the event does not exist.
+        """
+
+    @abstractmethod
+    def webhook_subscriptions(self, event: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Return the URLs subscribed to an event mapped to their subscription options, or None if the event does not exist.
+        """
+
+    @abstractmethod
+    def all_subscriptions(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Return all events and patterns with their subscribed URLs mapped to their subscription options.
+        """
+
+    @abstractmethod
+    def subscriptions_version(self) -> Any:
+        """
+        Return a value that changes whenever an event or a subscription is added or removed, also by another process.
+        """
+
+    @abstractmethod
+    def add_event(self, event: str) -> None:
+        """
+        Create an event that URLs can subscribe to.
+
+        Raises:
+            WebhookEventAlreadyExistsError: If the event already exists.
+        """
+
+    @abstractmethod
+    def add_webhook(self, event: str, url: str, options: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Subscribe a URL to an event or a wildcard pattern.
+
+        Args:
+            event (str): The event name, or a wildcard pattern such as `user_*`.
+            url (str): The webhook URL.
+            options (Dict[str, Any] | None): The subscription options, e.g. the content encoding.
+
+        Raises:
+            WebhookEventNotFoundError: If the event does not exist.
+            WebhookUrlAlreadyExistsError: If the URL is already subscribed to the event.
+        """
+
+    @abstractmethod
+    def remove_webhook(self, event: str, url: str) -> None:
+        """
+        Unsubscribe a URL from an event.
+
+        Raises:
+            WebhookEventNotFoundError: If the event does not exist.
+            WebhookUrlNotFoundError: If the URL is not subscribed to the event.
+        """
+
+    @abstractmethod
+    def add_webhooks(
+        self,
+        subscriptions: List[Tuple[str, str, Optional[Dict[str, Any]]]],
+        atomic: bool = False,
+    ) -> List[Optional[WebhookStorageError]]:
+        """
+        Subscribe several URLs in a single transaction.
+
+        Every subscription is checked like in `add_webhook`, in order, so a subscription that is
+        repeated within the list fails as already existing.
+
+        Args:
+            subscriptions (List[Tuple[str, str, Dict[str, Any] | None]]): `(event, url, options)` triples.
+            atomic (bool): If True, nothing is changed unless every subscription can be added.
+
+        Returns:
+            errors (List[WebhookStorageError | None]): For every subscription, None if it was added (or could have
+                been added, if an atomic batch failed), or the WebhookEventNotFoundError or
+                WebhookUrlAlreadyExistsError it failed with.
+        """
+
+    @abstractmethod
+    def remove_webhooks(
+        self,
+        subscriptions: List[Tuple[str, str]],
+        atomic: bool = False,
+    ) -> List[Optional[WebhookStorageError]]:
+        """
+        Unsubscribe several URLs in a single transaction.
+
+        Args:
+            subscriptions (List[Tuple[str, str]]): `(event, url)` pairs.
+            atomic (bool): If True, nothing is changed unless every subscription can be removed.
+
+        Returns:
+            errors (List[WebhookStorageError | None]): For every subscription, None if it was removed (or could have
+                been removed, if an atomic batch failed), or the WebhookEventNotFoundError or
+                WebhookUrlNotFoundError it failed with.
+        """
+
+    # --- Users ---
+
+    @abstractmethod
+    def add_user(self, user: UserResponse) -> None:
+        """
+        Store a new user. Usernames are unique regardless of case.
+
+        Raises:
+            UserAlreadyExistsError: If a user with the same username already exists.
+        """
+
+    def add_users(self, users: List[UserResponse]) -> List[Optional[UserAlreadyExistsError]]:
+        """
+        Store several new users in a single pass.
+
+        Every user is checked like in `add_user`, in order, so a username that is repeated within
+        the list (regardless of case) fails as already existing. The other users are still stored.
+
+        Args:
+            users (List[UserResponse]): The users to store.
+
+        Returns:
+            errors (List[UserAlreadyExistsError | None]): For every user, None if it was stored, or the
+                UserAlreadyExistsError it failed with.
+        """
+        errors: List[Optional[UserAlreadyExistsError]] = []
+        for user in users:
+            try:
+                self.add_user(user)
+                errors.append(None)
+            except UserAlreadyExistsError as e:
+                errors.append(e)
+        return errors
+
+    @abstractmethod
+    def get_user(self, username: str) -> Optional[UserResponse]:
+        """
+        Return the user with the given username (case-insensitive), or None if it does not exist.
+        """
+
+    def get_users(self, usernames: Iterable[str]) -> Dict[str, UserResponse]:
+        """
+        Look up several usernames (case-insensitive) at once.
+
+        Returns:
+            users (Dict[str, UserResponse]): The given usernames that exist, as they were given, mapped to their user.
+        """
+        users: Dict[str, UserResponse] = {}
+        for username in set(usernames):
+            user = self.get_user(username)
+            if user is not None:
+                users[username] = user
+        return users
+
+    @abstractmethod
+    def iter_users(self, after: Optional[int] = None, since: Optional[datetime] = None) -> Iterator[Tuple[int, UserResponse]]:
+        """
+        Lazily yield users in the order they were registered, together with their cursor.
+
+        Args:
+            after (int | None): Only yield users registered after the user with this cursor.
+            since (datetime | None): Only yield users registered at or after this time. A naive time is taken as UTC.
+
+        Yields:
+            (cursor, user) (Tuple[int, UserResponse]): The user and an opaque, increasing cursor.
+        """
+
+    def list_users(self) -> List[UserResponse]:
+        """
+        Return all users in the order they were registered.
+        """
+        return [user for _, user in self.iter_users()]
+
+    # --- Messages ---
+
+    @abstractmethod
+    def add_message(self, message: SendMessageResponse) -> None:
+        """
+        Store a sent message.
+        """
+
+    def add_messages(self, messages: List[SendMessageResponse]) -> None:
+        """
+        Store several sent messages in a single pass.
+        """
+        for message in messages:
+            self.add_message(message)
+
+    @abstractmethod
+    def iter_messages(
+        self,
+        recipient: str,
+        after: Optional[int] = None,
+        since: Optional[datetime] = None,
+    ) -> Iterator[Tuple[int, SendMessageResponse]]:
+        """
+        Lazily yield the messages sent to a recipient (case-insensitive) in the order they were sent,
+        together with their cursor.
+
+        Args:
+            recipient (str): The username of the recipient.
+            after (int | None): Only yield messages sent after the message with this cursor.
+            since (datetime | None): Only yield messages received at or after this time. A naive time is taken as UTC.
+
+        Yields:
+            (cursor, message) (Tuple[int, SendMessageResponse]): The message and an opaque, increasing cursor.
+        """
+
+    def list_messages(self, recipient: str) -> List[SendMessageResponse]:
+        """
+        Return the messages sent to a recipient (case-insensitive) in the order they were sent.
+        """
+        return [message for _, message in self.iter_messages(recipient)]
+
+    def close(self) -> None:
+        """
+        Release any resources held by the backend.
+        """
+
+
+def create_storage_backend(name: str = STORAGE_BACKEND) -> StorageBackend:
+    """
+    Create the storage backend with the given name.
+
+    The backend is wrapped so the duration of every operation is recorded in the storage metrics.
+
+    Args:
+        name (str): The name of the backend, either "json" or "sqlite".
+
+    Returns:
+        backend (StorageBackend): The storage backend.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    from .instrumented_backend import InstrumentedStorageBackend
+    if name == "json":
+        from .json_backend import JsonStorageBackend
+        return InstrumentedStorageBackend(JsonStorageBackend(STORAGE_FILE), name)
+    if name == "sqlite":
+        from .sqlite_backend import SqliteStorageBackend
+        return InstrumentedStorageBackend(SqliteStorageBackend(SQLITE_STORAGE_FILE), name)
+    raise ValueError(f"Unknown storage backend '{name}'. Use 'json' or 'sqlite'.")
+
+
+def to_utc(moment: datetime) -> datetime:
+    """
+    Convert a time to UTC, taking a naive time as UTC.
+
+    Users and messages are timestamped with `datetime.now(timezone.utc).isoformat()`, so a time
+    converted to UTC and formatted the same way compares with the stored timestamps as a string.
+
+    Args:
+        moment (datetime): The time to convert.
+
+    Returns:
+        moment (datetime): The same time in UTC.
+    """
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
@@ -0,0 +1,14 @@
+# Custom Exceptions for User Storage Errors
+class UserStorageError(Exception):
+    """
+    Base class for all user storage-related errors.
+    """
+    pass
+
+
+class UserAlreadyExistsError(UserStorageError):
+    """
+    Raised when a user with the same username (regardless of case) already exists.
+    """
+    def __init__(self, username: str):
+        super().__init__(f"User '{username}' already exists.")
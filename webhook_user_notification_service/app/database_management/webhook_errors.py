@@ -34,4 +34,12 @@ class WebhookEventHasNoURLsError(WebhookStorageError):
     Raised when the event has no registered URLs.
     """
     def __init__(self, event: str):
-        super().__init__(f"Event '{event}' has no registered URLs.")
\ No newline at end of file
+        super().__init__(f"Event '{event}' has no registered URLs.")
+
+
+class WebhookEventAlreadyExistsError(WebhookStorageError):
+    """
+    Raised when the event to create already exists.
+    """
+    def __init__(self, event: str):
+        super().__init__(f"Event '{event}' already exists.")
@@ -0,0 +1,395 @@
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from .file_storage import ChangeJournal, FileLock, atomic_write_json
+
+
+
+# Number of journal records after which the journal is folded into the storage file
+JOURNAL_COMPACTION_THRESHOLD = 1000
+
+
+class WebhookRegistry:
+    """
+    A process-resident index of the webhook subscriptions stored in the storage file.
+
+    The storage file is loaded once and kept in memory as a mapping from event name to the
+    set of subscribed URLs, so looking up the URLs of an event and checking whether a URL is
+    subscribed are O(1) and do not depend on the size of the file. The URL sets are
+    insertion-ordered dicts mapping each URL to its subscription options, so URLs keep the
+    order they were registered in.
+
+    In the storage file, a subscription without options is stored as its URL, and a
+    subscription with options as an object with a `url` key and one key per option.
+
+    Changes are written through to disk as records appended to a change journal next to the
+    storage file, so a single registration costs O(1) I/O. Once the journal holds
+    `compaction_threshold` records it is folded into the storage file, which is replaced
+    atomically (temporary file plus rename). Replaying the journal is idempotent, so a crash
+    at any point leaves the registry in a consistent state.
+
+    All changes are made under a lock that is shared between threads and processes, so
+    concurrent registrations (e.g. from several uvicorn workers) never lose each other's writes.
+    If the files are changed by another process, the registry reloads them on the next access.
+
+    Every change, and every reload, increments the registry's `version`, so derived structures
+    (such as the routing table) know when to rebuild.
+
+    Attributes:
+        path (Path): The path to the storage file.
+        journal (ChangeJournal): The change journal of the storage file.
+        compaction_threshold (int): The number of journal records that triggers a compaction.
+    """
+
+    def __init__(self, path: Path, compaction_threshold: int = JOURNAL_COMPACTION_THRESHOLD):
+        self.path = path
+        self.journal = ChangeJournal(path.with_suffix(".journal"))
+        self.compaction_threshold = compaction_threshold
+        self._file_lock = FileLock(path.with_suffix(".lock"))
+        self._index: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._journal_length = 0
+        self._version = 0
+        # Modification times and sizes of the storage file and journal when they were last loaded or written
+        self._file_signature: Optional[Tuple[Any, Any]] = None
+        self._lock = threading.RLock()
+
+    def _signature(self) -> Tuple[Any, Any]:
+        """
+        Return the modification times and sizes of the storage file and the journal.
+
+        Raises:
+            FileNotFoundError: If the storage file does not exist.
+        """
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"The storage file at path: {self.path} does not exist.")
+        return (stat.st_mtime_ns, stat.st_size), self.journal.signature()
+
+    def _refresh(self) -> None:
+        """
+        Load the storage file and replay the journal if they have not been loaded yet or have changed since.
+
+        Raises:
+            FileNotFoundError: If the storage file does not exist.
+            IOError: If there is an error reading the storage file or if the JSON data is invalid.
+        """
+        if self._signature() == self._file_signature:
+            return
+        with self._file_lock:
+            # Take the signature again under the lock, another process may have been compacting
+            signature = self._signature()
+            try:
+                with self.path.open("r") as file:
+                    data: Dict[str, List[Union[str, Dict[str, Any]]]] = json.load(file)
+                index = {event: dict(_parse_subscription(entry) for entry in entries) for event, entries in data.items()}
+                journal_length = 0
+                for record in self.journal.read():
+                    self._apply(index, record)
+                    journal_length += 1
+            except (json.JSONDecodeError, IOError) as e:
+                raise IOError(f"Error reading storage file at path {self.path}: {e}")
+        self._index = index
+        self._journal_length = journal_length
+        self._file_signature = signature
+        self._version += 1
+
+    @staticmethod
+    def _apply(index: Dict[str, Dict[str, Dict[str, Any]]], record: Dict[str, Any]) -> None:
+        """
+        Apply a journal record to an index. Applying the same record twice has no further effect.
+        """
+        if record["op"] == "add_event":
+            index.setdefault(record["event"], {})
+            return
+        urls = index.get(record["event"])
+        if urls is None:
+            return
+        if record["op"] == "add":
+            urls[record["url"]] = record.get("options", {})
+        elif record["op"] == "remove":
+            urls.pop(record["url"], None)
+
+    def _commit(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Append change records to the journal, compacting it into the storage file when it grows too long.
+
+        Must be called while holding the file lock, after the records have been applied to the index.
+
+        Raises:
+            IOError: If there is an error writing to the journal or the storage file.
+        """
+        try:
+            self.journal.append(records)
+            self._journal_length += len(records)
+            if self._journal_length >= self.compaction_threshold:
+                self.compact()
+        except IOError:
+            # The in-memory index may be ahead of the disk, reload it on the next access
+            self._file_signature = None
+            raise
+        self._file_signature = self._signature()
+
+    def compact(self) -> None:
+        """
+        Fold the journal into the storage file and empty the journal.
+
+        The storage file is replaced atomically before the journal is emptied, so a crash in
+        between only means the (idempotent) journal is replayed once more on the next load.
+
+        Raises:
+            IOError: If there is an error writing the storage file or the journal.
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+            atomic_write_json(self.path, {
+                event: [_format_subscription(url, options) for url, options in urls.items()]
+                for event, urls in self._index.items()
+            })
+            self.journal.truncate()
+            self._journal_length = 0
+            self._file_signature = self._signature()
+
+    def snapshot(self) -> Dict[str, List[str]]:
+        """
+        Return a copy of all events and their subscribed URLs.
+        """
+        with self._lock:
+            self._refresh()
+            return {event: list(urls) for event, urls in self._index.items()}
+
+    def all_subscriptions(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Return a copy of all events and patterns with their subscribed URLs mapped to their subscription options.
+        """
+        with self._lock:
+            self._refresh()
+            return {event: dict(urls) for event, urls in self._index.items()}
+
+    def version(self) -> int:
+        """
+        Return the number of changes made or loaded since the registry was created.
+        """
+        with self._lock:
+            self._refresh()
+            return self._version
+
+    def get(self, event: str) -> Optional[List[str]]:
+        """
+        Return the URLs subscribed to an event, or None if the event does not exist.
+        """
+        with self._lock:
+            self._refresh()
+            urls = self._index.get(event)
+            return list(urls) if urls is not None else None
+
+    def subscriptions(self, event: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Return the URLs subscribed to an event mapped to their subscription options, or None if the event does not exist.
+        """
+        with self._lock:
+            self._refresh()
+            urls = self._index.get(event)
+            return dict(urls) if urls is not None else None
+
+    def urls(self, event: str) -> List[str]:
+        """
+        Return the URLs subscribed to an event, or an empty list if the event does not exist.
+        """
+        with self._lock:
+            self._refresh()
+            return list(self._index.get(event, ()))
+
+    def contains(self, event: str, url: str) -> bool:
+        """
+        Return whether the URL is subscribed to the event.
+        """
+        with self._lock:
+            self._refresh()
+            return url in self._index.get(event, ())
+
+    def add_event(self, event: str) -> bool:
+        """
+        Create an event without subscriptions and write the change through to disk.
+
+        Returns:
+            added (bool): False if the event already exists.
+
+        Raises:
+            IOError: If there is an error writing the change to disk.
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+            if event in self._index:
+                return False
+            self._index[event] = {}
+            self._version += 1
+            self._commit([{"op": "add_event", "event": event}])
+            return True
+
+    def add(self, event: str, url: str, options: Optional[Dict[str, Any]] = None, create: bool = False) -> bool:
+        """
+        Subscribe a URL to an event and write the change through to disk.
+
+        Args:
+            event (str): The event name.
+            url (str): The webhook URL.
+            options (Dict[str, Any] | None): The subscription options, e.g. the content encoding.
+            create (bool): Create the event if it does not exist, instead of raising a KeyError.
+
+        Returns:
+            added (bool): False if the URL was already subscribed to the event.
+
+        Raises:
+            KeyError: If the event does not exist.
+            IOError: If there is an error writing the change to disk.
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+            records: List[Dict[str, Any]] = []
+            if create and event not in self._index:
+                self._index[event] = {}
+                records.append({"op": "add_event", "event": event})
+            urls = self._index[event]
+            if url in urls:
+                return False
+            record: Dict[str, Any] = {"op": "add", "event": event, "url": url}
+            if options:
+                record["options"] = options
+            records.append(record)
+            urls[url] = options or {}
+            self._version += 1
+            self._commit(records)
+            return True
+
+    def add_many(
+        self,
+        subscriptions: List[Tuple[str, str, Optional[Dict[str, Any]], bool]],
+        atomic: bool = False,
+    ) -> List[Optional[bool]]:
+        """
+        Subscribe several URLs and write the changes through to disk with a single journal append.
+
+        Args:
+            subscriptions (List[Tuple[str, str, Dict[str, Any] | None, bool]]): `(event, url, options, create)`
+                tuples, with `create` as in `add`.
+            atomic (bool): If True, nothing is changed unless every URL can be subscribed.
+
+        Returns:
+            added (List[bool | None]): For every subscription, True if it was added (or could have been added, if an
+                atomic batch failed), False if the URL was already subscribed to the event (also earlier in the list),
+                or None if the event does not exist.
+
+        Raises:
+            IOError: If there is an error writing the changes to disk.
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+            results: List[Optional[bool]] = []
+            records: List[Dict[str, Any]] = []
+            created_events = set()
+            added = set()
+            for event, url, options, create in subscriptions:
+                if event not in self._index and event not in created_events:
+                    if not create:
+                        results.append(None)
+                        continue
+                    created_events.add(event)
+                    records.append({"op": "add_event", "event": event})
+                if url in self._index.get(event, ()) or (event, url) in added:
+                    results.append(False)
+                    continue
+                added.add((event, url))
+                record: Dict[str, Any] = {"op": "add", "event": event, "url": url}
+                if options:
+                    record["options"] = options
+                records.append(record)
+                results.append(True)
+
+            if records and not (atomic and not all(results)):
+                for record in records:
+                    self._apply(self._index, record)
+                self._version += 1
+                self._commit(records)
+            return results
+
+    def discard_many(self, subscriptions: List[Tuple[str, str]], atomic: bool = False) -> List[Optional[bool]]:
+        """
+        Unsubscribe several URLs and write the changes through to disk with a single journal append.
+
+        Args:
+            subscriptions (List[Tuple[str, str]]): `(event, url)` pairs.
+            atomic (bool): If True, nothing is changed unless every URL can be unsubscribed.
+
+        Returns:
+            removed (List[bool | None]): For every subscription, True if it was removed (or could have been removed,
+                if an atomic batch failed), False if the URL was not subscribed to the event (or was removed earlier
+                in the list), or None if the event does not exist.
+
+        Raises:
+            IOError: If there is an error writing the changes to disk.
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+            results: List[Optional[bool]] = []
+            records: List[Dict[str, Any]] = []
+            removed = set()
+            for event, url in subscriptions:
+                urls = self._index.get(event)
+                if urls is None:
+                    results.append(None)
+                elif url not in urls or (event, url) in removed:
+                    results.append(False)
+                else:
+                    removed.add((event, url))
+                    records.append({"op": "remove", "event": event, "url": url})
+                    results.append(True)
+
+            if records and not (atomic and not all(results)):
+                for record in records:
+                    self._apply(self._index, record)
+                self._version += 1
+                self._commit(records)
+            return results
+
+    def discard(self, event: str, url: str) -> bool:
+        """
+        Unsubscribe a URL from an existing event and write the change through to disk.
+
+        Returns:
+            removed (bool): False if the URL was not subscribed to the event.
+
+        Raises:
+            KeyError: If the event does not exist.
+            IOError: If there is an error writing the change to disk.
+        """
+        with self._lock, self._file_lock:
+            self._refresh()
+            urls = self._index[event]
+            if url not in urls:
+                return False
+            del urls[url]
+            self._version += 1
+            self._commit([{"op": "remove", "event": event, "url": url}])
+            return True
+
+
+def _parse_subscription(entry: Union[str, Dict[str, Any]]) -> Tuple[str, Dict[str, Any]]:
+    """
+    Split a subscription entry of the storage file into its URL and its options.
+    """
+    if isinstance(entry, str):
+        return entry, {}
+    options = dict(entry)
+    return options.pop("url"), options
+
+
+def _format_subscription(url: str, options: Dict[str, Any]) -> Union[str, Dict[str, Any]]:
+    """
+    Format a subscription as an entry of the storage file, using the bare URL when it has no options.
+    """
+    if not options:
+        return url
+    return {"url": url, **options}
@@ -0,0 +1,183 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+
+# Character ending a wildcard pattern, e.g. "user_*" matches every event whose name starts with "user_"
+WILDCARD = "*"
+# Number of event names whose matching routes are kept resolved
+RESOLVED_EVENTS_CACHE_SIZE = 4096
+
+_MISSING = object()
+
+
+def is_event_pattern(name: str) -> bool:
+    """
+    Return whether a subscription key is a wildcard pattern rather than an event name.
+    """
+    return name.endswith(WILDCARD)
+
+
+def compile_filter(conditions: Dict[str, Any]) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Compile the payload filter of a subscription into a predicate over the event data.
+
+    Args:
+        conditions (Dict[str, Any]): Field of the event data -> the value it must equal, or a list of the
+            values it may take. A field that is missing from the data never matches.
+
+    Returns:
+        predicate (Callable[[Dict[str, Any]], bool]): Whether the event data matches every condition.
+    """
+    checks: List[Callable[[Dict[str, Any]], bool]] = []
+    for field, expected in conditions.items():
+        if isinstance(expected, list):
+            checks.append(lambda data, field=field, allowed=tuple(expected): data.get(field, _MISSING) in allowed)
+        else:
+            checks.append(lambda data, field=field, expected=expected: data.get(field, _MISSING) == expected)
+    if len(checks) == 1:
+        return checks[0]
+    return lambda data: all(check(data) for check in checks)
+
+
+@dataclass(frozen=True)
+class Route:
+    """
+    A subscription compiled for routing.
+
+    Attributes:
+        url (str): The subscribed webhook URL.
+        options (Dict[str, Any]): The subscription options.
+        predicate (Callable[[Dict[str, Any]], bool] | None): The compiled payload filter, or None if every
+            event is delivered.
+    """
+    url: str
+    options: Dict[str, Any]
+    predicate: Optional[Callable[[Dict[str, Any]], bool]] = None
+
+
+class _TrieNode:
+    __slots__ = ("children", "routes")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # The routes of the patterns whose prefix ends at this node
+        self.routes: List[Route] = []
+
+
+class RoutingTable:
+    """
+    The webhook subscriptions compiled into a structure that routes an event in time linear in the
+    number of matching subscriptions.
+
+    Subscriptions to an event name are kept in a dict. Wildcard subscriptions (`user_*`, or `*`
+    for every event) are kept in a character trie of their prefixes, so the patterns matching an
+    event are found by walking its name once, however many patterns are registered. Payload filters
+    are compiled into predicates once, when the table is built.
+
+    The matching routes of an event are resolved on first use and cached, ordered from the most to
+    the least specific subscription: the exact subscriptions first, then the patterns from the
+    longest prefix to the shortest. A URL that matches several subscriptions is delivered to once,
+    through the most specific subscription whose filter accepts the event.
+
+    The table is immutable. It is rebuilt from scratch when the subscriptions change.
+    """
+
+    def __init__(self, subscriptions: Dict[str, Dict[str, Dict[str, Any]]]):
+        """
+        Args:
+            subscriptions (Dict[str, Dict[str, Dict[str, Any]]]): Event name or pattern -> the subscribed URLs
+                mapped to their subscription options.
+        """
+        self._exact: Dict[str, List[Route]] = {}
+        self._patterns = _TrieNode()
+        for key, urls in subscriptions.items():
+            routes = [
+                Route(url, options, compile_filter(options["filter"]) if options.get("filter") else None)
+                for url, options in urls.items()
+            ]
+            if is_event_pattern(key):
+                node = self._patterns
+                for character in key[:-len(WILDCARD)]:
+                    node = node.children.setdefault(character, _TrieNode())
+                node.routes.extend(routes)
+            else:
+                self._exact[key] = routes
+        # Event name -> (matching routes, whether a route needs the filter check or the URL check)
+        self._resolved: Dict[str, Tuple[List[Route], bool]] = {}
+
+    def _resolve(self, event: str) -> Tuple[List[Route], bool]:
+        """
+        Collect the routes matching an event name, most specific first.
+        """
+        pattern_routes: List[List[Route]] = [self._patterns.routes]
+        node = self._patterns
+        for character in event:
+            node = node.children.get(character)
+            if node is None:
+                break
+            pattern_routes.append(node.routes)
+
+        routes = list(self._exact.get(event, ()))
+        for routes_of_prefix in reversed(pattern_routes):
+            routes.extend(routes_of_prefix)
+        needs_checks = (
+            any(route.predicate is not None for route in routes)
+            or len({route.url for route in routes}) < len(routes)
+        )
+        if len(self._resolved) >= RESOLVED_EVENTS_CACHE_SIZE:
+            self._resolved.clear()
+        resolved = self._resolved[event] = (routes, needs_checks)
+        return resolved
+
+    def routes(self, event: str) -> List[Route]:
+        """
+        Return the routes an event may be delivered through, whatever its payload.
+
+        Args:
+            event (str): The name of the event.
+
+        Returns:
+            routes (List[Route]): One route per webhook URL subscribed to the event or to a pattern matching it,
+                through its most specific subscription. Payload filters are not applied.
+        """
+        resolved = self._resolved.get(event)
+        routes, needs_checks = resolved if resolved is not None else self._resolve(event)
+        if not needs_checks:
+            return routes
+        by_url: Dict[str, Route] = {}
+        for route in routes:
+            by_url.setdefault(route.url, route)
+        return list(by_url.values())
+
+    def match(self, event: str, data: Callable[[], Dict[str, Any]]) -> List[Route]:
+        """
+        Return the routes an event is delivered through.
+
+        Args:
+            event (str): The name of the event.
+            data (Callable[[], Dict[str, Any]]): Returns the event data as JSON compatible values. Only called
+                if a matching subscription has a payload filter.
+
+        Returns:
+            routes (List[Route]): One route per webhook URL the event is delivered to.
+        """
+        resolved = self._resolved.get(event)
+        routes, needs_checks = resolved if resolved is not None else self._resolve(event)
+        if not needs_checks:
+            return routes
+
+        event_data: Optional[Dict[str, Any]] = None
+        matched: List[Route] = []
+        urls = set()
+        for route in routes:
+            if route.url in urls:
+                continue
+            if route.predicate is not None:
+                if event_data is None:
+                    event_data = data()
+                if not route.predicate(event_data):
+                    continue
+            urls.add(route.url)
+            matched.append(route)
+        return matched
@@ -1,28 +1,40 @@
-import json
-from pathlib import Path
-from typing import Dict, List, Optional, Union, Any
+import asyncio
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union, Any
 from pydantic import BaseModel
 from pydantic_models import PingedWebhooks
 from .webhook_errors import (
     WebhookEventNotFoundError, 
-    WebhookEventHasNoURLsError, 
-    WebhookUrlAlreadyExistsError, 
-    WebhookUrlNotFoundError
+    WebhookEventHasNoURLsError,
+    WebhookStorageError
+    )
+from .storage_backend import StorageBackend, create_storage_backend
+from .webhook_routing import Route, RoutingTable, is_event_pattern
+from webhook_delivery import (
+    delivery_outbox,
+    delivery_workers,
+    ping_webhooks,
+    encode_event_payload,
+    encode_payload_variants
     )
-import requests
 
 
 
-# Path to the JSON file for storing webhook data
-STORAGE_FILE = Path(__file__).parent / "webhook_data.json"
+# The configured storage backend, shared by all storage functions and the routers
+storage: StorageBackend = create_storage_backend()
+# The routing table compiled from the subscriptions, with the backend and subscriptions version it was compiled from
+_routing: Optional[Tuple[StorageBackend, Any, RoutingTable]] = None
 
 
 def read(event: Optional[str] = None) -> Dict[str, List[str]]:
     """
-    Read the storage file and return the webhooks for a specific event or all events.
+    Return the webhooks a specific event or every event is delivered to.
+
+    The webhooks of an event are resolved through the routing table: the URLs subscribed to the event
+    and to the wildcard patterns matching it, whatever their payload filters. The patterns themselves
+    are not events and are returned by `patterns`.
 
     Args:
-        event (str | None): The event name to filter webhooks. If None, return all webhooks.
+        event (str | None): The event name to filter webhooks. If None, return the webhooks of all events.
 
     Returns:
         data (Dict[str, List[str]]): 
@@ -31,191 +43,364 @@ def read(event: Optional[str] = None) -> Dict[str, List[str]]:
     Raises:
         WebhookEventNotFoundError: If the specified event does not exist.
         WebhookEventHasNoURLsError: If the specified event has no registered URLs.
-        FileNotFoundError: If the storage file does not exist.
-        IOError: If there is an error reading the storage file or if the JSON data is invalid.
-    """
-    try:
-        if STORAGE_FILE.exists():
-            with STORAGE_FILE.open("r") as file:
-                data: Dict[str, List[str]] = json.load(file)
-                if event is not None and isinstance(event, str):
-                    if event in data:
-                        # Return only the specified event and its list of URLs
-                        webhook_urls = data[event]
-                        
-                        if len(webhook_urls) <= 0:
-                            raise WebhookEventHasNoURLsError(event)
-                        filtered_data = {event: webhook_urls}
-                        return filtered_data
-                    else:
-                        # Raise an error if the event does not exist
-                        raise WebhookEventNotFoundError(event)
-                return data  # Return all webhooks if no event is specified
-        else:
-            raise FileNotFoundError(f"The storage file at path: {STORAGE_FILE} does not exist.")
-    except (json.JSONDecodeError, IOError) as e:
-        raise IOError(f"Error reading storage file at path {STORAGE_FILE}: {e}")
+        FileNotFoundError: If the storage file does not exist (JSON backend).
+        IOError: If there is an error reading the storage file or if the JSON data is invalid (JSON backend).
+    """
+    table = routing_table()
+    if event is not None and isinstance(event, str):
+        # Return only the specified event and the URLs it is delivered to
+        if is_event_pattern(event) or storage.webhook_urls(event) is None:
+            # Raise an error if the event does not exist
+            raise WebhookEventNotFoundError(event)
+        webhook_urls = [route.url for route in table.routes(event)]
+        if len(webhook_urls) <= 0:
+            raise WebhookEventHasNoURLsError(event)
+        return {event: webhook_urls}
+    # Return the webhooks of all events if no event is specified
+    return {name: [route.url for route in table.routes(name)] for name in events()}
+
+
+def patterns() -> Dict[str, List[str]]:
+    """
+    Return the wildcard patterns (e.g. `user_*`) and the URLs subscribed to them.
+    """
+    return {pattern: urls for pattern, urls in storage.webhooks().items() if is_event_pattern(pattern)}
+
+
+def events() -> List[str]:
+    """
+    Return the names of all events, without the wildcard patterns.
+    """
+    return [event for event in storage.webhooks() if not is_event_pattern(event)]
+
+
+def create_event(event: str) -> None:
+    """
+    Create an event that webhooks can subscribe to and that can be triggered.
+
+    Args:
+        event (str): The event name.
+
+    Raises:
+        WebhookEventAlreadyExistsError: If the event already exists.
+    """
+    storage.add_event(event)
 
 
-def update(event: str, url: str) -> None:
+def update(event: str, url: str, options: Optional[Dict[str, Any]] = None) -> None:
     """
-    Add a URL to a specific event in the storage file.
+    Add a URL to a specific event, or to a wildcard pattern such as `user_*`, in the storage backend.
 
     Args:
-        event (str): The event name to add the URL to.
+        event (str): The event name or wildcard pattern to add the URL to.
         url (str): The webhook URL to add.
+        options (Dict[str, Any] | None): The subscription options, e.g. `{"content_encoding": "gzip"}`,
+            `{"batch": {"max_events": 100, "max_bytes": 1000000, "max_linger_seconds": 1.0}}`,
+            `{"signing_secret": "..."}`, `{"filter": {"recipient": "alice"}}` or
+            `{"rate_limit": {"requests_per_second": 10, "burst": 20}}`.
 
     Raises:
-        WebhookEventNotFoundError: If the event does not exist in the storage file.
+        WebhookEventNotFoundError: If the event does not exist in the storage backend.
         WebhookUrlAlreadyExistsError: If the URL already exists for the event.
     """
-    data: Dict[str, List[str]] = read()
-    if event not in data:
-        raise WebhookEventNotFoundError(event)
-    if url in data[event]:
-        raise WebhookUrlAlreadyExistsError(url, event)
-    data[event].append(url)
-    _write(data)
+    storage.add_webhook(event, url, options)
 
 
 def remove(event: str, url: str) -> None:
     """
-    Remove a URL from a specific event in the storage file.
+    Remove a URL from a specific event in the storage backend.
 
     Args:
         event (str): The event name to remove the URL from.
         url (str): The webhook URL to remove.
 
     Raises:
-        WebhookEventNotFoundError: If the event does not exist in the storage file.
+        WebhookEventNotFoundError: If the event does not exist in the storage backend.
         WebhookUrlNotFoundError: If the URL does not exist for the event.
     """
-    data: Dict[str, List[str]] = read()
-    if event not in data:
-        raise WebhookEventNotFoundError(event)
-    if url not in data[event]:
-        raise WebhookUrlNotFoundError(url, event)
-    data[event].remove(url)
-    _write(data)
+    storage.remove_webhook(event, url)
 
 
-def send(data: Dict[str, List[str]], payload: Dict[str, Any]) -> PingedWebhooks:
+def update_many(
+    subscriptions: List[Tuple[str, str, Optional[Dict[str, Any]]]],
+    atomic: bool = False,
+) -> List[Optional[WebhookStorageError]]:
+    """
+    Add several URLs to events or wildcard patterns in a single storage transaction.
+
+    Args:
+        subscriptions (List[Tuple[str, str, Dict[str, Any] | None]]): `(event, url, options)` triples, with the
+            options as in `update`.
+        atomic (bool): If True, nothing is changed unless every URL can be added.
+
+    Returns:
+        errors (List[WebhookStorageError | None]): For every subscription, None if it was added (or could have been
+            added, if an atomic batch failed), or the WebhookEventNotFoundError or WebhookUrlAlreadyExistsError
+            it failed with.
+    """
+    return storage.add_webhooks(subscriptions, atomic)
+
+
+def remove_many(subscriptions: List[Tuple[str, str]], atomic: bool = False) -> List[Optional[WebhookStorageError]]:
+    """
+    Remove several URLs from their events in a single storage transaction.
+
+    Args:
+        subscriptions (List[Tuple[str, str]]): `(event, url)` pairs.
+        atomic (bool): If True, nothing is changed unless every URL can be removed.
+
+    Returns:
+        errors (List[WebhookStorageError | None]): For every subscription, None if it was removed (or could have been
+            removed, if an atomic batch failed), or the WebhookEventNotFoundError or WebhookUrlNotFoundError
+            it failed with.
+    """
+    return storage.remove_webhooks(subscriptions, atomic)
+
+
+def export_subscriptions() -> Iterator[Tuple[str, Optional[str], Optional[Dict[str, Any]]]]:
+    """
+    Yield every event and subscription of the storage backend, taken from a single snapshot.
+
+    The events are yielded first, as `(event, None, None)`, so importing the records in order creates every
+    event before its subscriptions. Wildcard patterns are not yielded as events, they are created by their
+    first subscription.
+
+    Yields:
+        (event, url, options) (Tuple[str, str | None, Dict[str, Any] | None]): An event, or a subscription with
+            its options.
+    """
+    subscriptions = storage.all_subscriptions()
+    for event in subscriptions:
+        if not is_event_pattern(event):
+            yield event, None, None
+    for event, urls in subscriptions.items():
+        for url, options in urls.items():
+            yield event, url, options
+
+
+async def send(
+    data: Dict[str, List[str]],
+    payload: Dict[str, Any],
+    signing_secrets: Dict[Tuple[str, str], str],
+) -> PingedWebhooks:
     """
     Send a test payload to all registered webhooks for the given events.
 
+    The webhooks are pinged concurrently with a bounded number of requests in flight, and
+    every request has a connect and a read timeout, so one hung subscriber cannot block the ping.
+
     Args:
         data (Dict[str, List[str]]): A dictionary where keys are event names and values are lists of webhook URLs.
         payload (Dict[str, Any]): The payload to send to the webhooks.
+        signing_secrets (Dict[Tuple[str, str], str]): The signing secret of every `(event, url)` pair that has one,
+            as returned by `signing_secrets`.
 
     Returns:
         PingedWebhooks: A summary of successful and failed webhook calls.
     """
     pinged_webhooks = PingedWebhooks()
 
+    async for successful, entry in iter_send(data, payload, signing_secrets):
+        if successful:
+            pinged_webhooks.successful_webhooks_count += 1
+            pinged_webhooks.successful_webhooks.append(entry)
+        else:
+            pinged_webhooks.failed_webhooks_count += 1
+            pinged_webhooks.failed_webhooks.append(entry)
+
+    return pinged_webhooks
+
+
+def iter_send(
+    data: Dict[str, List[str]],
+    payload: Dict[str, Any],
+    signing_secrets: Dict[Tuple[str, str], str],
+) -> AsyncIterator[Tuple[bool, Dict[str, Any]]]:
+    """
+    Send a test payload to all registered webhooks for the given events and yield each result as it completes.
+
+    Pings to subscriptions with a signing secret are signed like deliveries. The secrets are resolved
+    beforehand with `signing_secrets`, so no storage is read on the event loop.
+
+    Args:
+        data (Dict[str, List[str]]): A dictionary where keys are event names and values are lists of webhook URLs.
+        payload (Dict[str, Any]): The payload to send to the webhooks.
+        signing_secrets (Dict[Tuple[str, str], str]): The signing secret of every `(event, url)` pair that has one,
+            as returned by `signing_secrets`.
+
+    Returns:
+        results (AsyncIterator[Tuple[bool, Dict[str, Any]]]): Whether each webhook call was successful, together with
+            the entry for `PingedWebhooks.successful_webhooks` or `PingedWebhooks.failed_webhooks`.
+    """
+    return ping_webhooks(data, payload, signing_secrets)
+
+
+def signing_secrets(data: Dict[str, List[str]]) -> Dict[Tuple[str, str], str]:
+    """
+    Resolve the signing secrets used to ping the given webhooks.
+
+    The secret of a URL is the one of its most specific subscription to the event (the event itself
+    or the longest matching pattern). This reads the routing table, so it should not run on the event loop.
+
+    Args:
+        data (Dict[str, List[str]]): A dictionary where keys are event names and values are lists of webhook URLs.
+
+    Returns:
+        secrets (Dict[Tuple[str, str], str]): The signing secret of every `(event, url)` pair that has one.
+    """
+    table = routing_table()
+    secrets: Dict[Tuple[str, str], str] = {}
     for event, urls in data.items():
-        # Add the event name to the payload
-        payload_with_event = {"event": event, "data": payload}
+        options = {route.url: route.options for route in table.routes(event)}
         for url in urls:
-            try:
-                # Send the POST request
-                response = requests.post(url, json=payload_with_event, headers={"Content-Type": "application/json"})
-
-                if response.ok:
-                    # Parse the JSON response or use an empty dictionary if parsing fails
-                    try:
-                        received_payload = response.json()
-                    except json.JSONDecodeError:
-                        received_payload = {}
-
-                    # Add to successful webhooks
-                    pinged_webhooks.successful_webhooks_count += 1
-                    pinged_webhooks.successful_webhooks.append({
-                        "event": event,
-                        "url": url,
-                        "payload": received_payload,
-                        "status_code": response.status_code
-                    })
-                else:
-                    # Add to failed webhooks for non-2xx status codes
-                    pinged_webhooks.failed_webhooks_count += 1
-                    pinged_webhooks.failed_webhooks.append({
-                        "event": event,
-                        "url": url,
-                        "error": f"HTTP error: {response.reason}",
-                        "status_code": response.status_code
-                    })
-            except requests.RequestException as e:
-                # Handle network-related exceptions
-                pinged_webhooks.failed_webhooks_count += 1
-                pinged_webhooks.failed_webhooks.append({
-                    "event": event,
-                    "url": url,
-                    "error": str(e),
-                    "status_code": None  # No status code available for exceptions
-                })
+            signing_secret = options.get(url, {}).get("signing_secret")
+            if signing_secret:
+                secrets[(event, url)] = signing_secret
+    return secrets
 
-    return pinged_webhooks
+
+def routing_table() -> RoutingTable:
+    """
+    Return the routing table of the current subscriptions, compiling it again only if they changed.
+    """
+    global _routing
+    version = storage.subscriptions_version()
+    if _routing is None or _routing[0] is not storage or _routing[1] != version:
+        # The version is read before the subscriptions, so a change in between triggers another rebuild
+        _routing = (storage, version, RoutingTable(storage.all_subscriptions()))
+    return _routing[2]
 
 
-def trigger_webhooks(event: str, payload: Union[dict, BaseModel]):
+def route(event: str, payload: Union[dict, BaseModel], table: Optional[RoutingTable] = None) -> List[Route]:
+    """
+    Return the subscriptions an event is delivered to: the subscriptions to the event, to the wildcard
+    patterns matching it, and only those whose payload filter accepts the payload.
+
+    Args:
+        event (str): The name of the event.
+        payload (dict | BaseModel): The data of the event.
+        table (RoutingTable | None): The routing table to use, e.g. to route many events through the same
+            table. If None, the current routing table is used.
+
+    Returns:
+        routes (List[Route]): One route per webhook URL, with its subscription options.
+    """
+    table = table or routing_table()
+    if isinstance(payload, BaseModel):
+        return table.match(event, lambda: payload.model_dump(mode="json"))
+    return table.match(event, lambda: payload)
+
+
+async def trigger_webhooks(event: str, payload: Union[dict, BaseModel]) -> int:
     """
     Trigger all webhooks subscribed to a specific event.
 
-    This function sends a payload to all registered webhook URLs for a given event. 
-    It reads the registered webhooks from the storage file and sends an HTTP POST request 
-    to each URL associated with the specified event.
+    This function appends a delivery for every registered webhook URL of the given event to the
+    durable delivery outbox. The background delivery workers drain the outbox and send the
+    HTTP POST requests concurrently, so deliveries survive a restart of the service.
 
     Args:
         event (str): The name of the event for which webhooks should be triggered.
         payload (dict | BaseModel): The data to send to the webhooks. 
             If a Pydantic model is provided, it will be converted to a dictionary.
 
+    Returns:
+        delivery_count (int): The number of webhooks the event is delivered to.
+
     Behavior:
-        - The function reads the registered webhooks from the storage file.
-        - It filters the webhooks for the specified event.
-        - For each URL associated with the event, it sends an HTTP POST request with the payload.
-        - The payload includes the event name and the provided data.
+        - The function routes the event through the routing table compiled from the subscriptions: the
+          webhooks subscribed to the event and to the wildcard patterns matching it, whose payload
+          filters accept the payload. The table is only rebuilt when the subscriptions change.
+        - The payload is serialized once, and compressed once per content encoding requested by
+          the subscribers. The outbox stores every variant once and the deliveries reference it.
+        - Deliveries to subscribers that opted into batched delivery are coalesced by the workers
+          and sent as one JSON array per batch.
+        - One delivery per URL is appended to the outbox and the workers are woken up. The workers
+          lease the deliveries fairly between event types and subscribers, so a flood of one event
+          does not hold up the deliveries of the others.
+        - Deliveries to subscriptions with a rate limit are sent no faster than the limit allows, and
+          no delivery is sent to a subscriber before the time it asked for with `Retry-After`.
+        - Deliveries to subscriptions with a signing secret carry an HMAC-SHA256 signature of the
+          body in the `Webhook-Signature` header. It is computed when the body is sent, over the
+          shared serialized (and compressed) payload.
+        - The routing, encoding and outbox append run in a worker thread, so the event loop never waits
+          on the outbox database, and the caller never waits on subscriber latency.
+        - The payload includes a unique delivery ID, the time the event was triggered, the event
+          name and the provided data. Retries carry the same delivery ID, so receivers can drop duplicates.
 
     Notes:
-        - If the payload is a Pydantic model, it is converted to a dictionary using `model_dump()`.
-        - The function logs the status code of each successful request and any errors encountered.
+        - If the payload is a Pydantic model, it is serialized directly using `model_dump_json()`.
+        - Must be awaited from code running on the event loop (e.g. an `async def` request handler).
 
     Logs:
-        - Logs a success message for each webhook triggered, including the URL, payload, and response status code.
-        - Logs an error message for each failed webhook, including the URL and the error details.
+        - The delivery engine logs the response status code of each delivered webhook.
+        - The delivery engine logs an error message for each failed webhook, including the URL and the error details.
     """
-    # Convert payload to dict if it's a Pydantic model
-    if isinstance(payload, BaseModel):
-        payload = payload.model_dump()
-    
-    # Add the event type to the payload
-    payload_with_event = {"event": event, "data": payload}
-    
-    data = read()
-    
-    for stored_event, urls in data.items():
-        if stored_event == event:
-                for url in urls:
-                    try:
-                        response = requests.post(url, json=payload_with_event, headers={"Content-Type": "application/json"})
-                        print(f"Webhook triggered: {url} with payload {payload}. Response: {response.status_code}")
-                    except Exception as e:
-                        print(f"Failed to trigger webhook {url}: {e}")
-
-    
-
-def _write(data: Dict[str, List[str]]) -> None:
-    """
-    Write the updated data back to the storage file.
+    # Persist the deliveries and let the workers send them in the background
+    return await trigger_webhooks_many(event, [payload])
+
+
+async def trigger_webhooks_many(event: str, payloads: List[Union[dict, BaseModel]]) -> int:
+    """
+    Trigger all webhooks subscribed to an event once for each of several payloads, e.g. for a bulk registration.
+
+    Every payload is routed and encoded like in `trigger_webhooks`, through the same routing table,
+    and becomes its own event with its own delivery ID. The deliveries of all payloads are appended to the outbox in a single
+    transaction, which runs in a worker thread, so the event loop is not blocked however many
+    payloads there are. The workers are woken up once.
 
     Args:
-        data (Dict[str, List[str]]): A dictionary where keys are event names and values are lists of webhook URLs.
+        event (str): The name of the event for which webhooks should be triggered.
+        payloads (List[dict | BaseModel]): The data of every event to send to the webhooks.
 
-    Raises:
-        IOError: If there is an error writing to the storage file.
+    Returns:
+        delivery_count (int): The number of deliveries appended for all payloads.
+    """
+    def append() -> int:
+        table = routing_table()
+        triggers = [trigger for trigger in (_encode_trigger(event, payload, table) for payload in payloads) if trigger is not None]
+        delivery_outbox.append_many(event, triggers)
+        return sum(len(deliveries) for deliveries, _ in triggers)
+
+    if not payloads:
+        return 0
+    delivery_count = await asyncio.to_thread(append)
+    if delivery_count:
+        delivery_workers.notify()
+    return delivery_count
+
+
+def _encode_trigger(
+    event: str,
+    payload: Union[dict, BaseModel],
+    table: RoutingTable,
+) -> Optional[Tuple[
+    List[Tuple[str, Optional[str], Optional[Dict[str, Any]], Optional[str], Optional[Dict[str, Any]]]],
+    Dict[Optional[str], bytes],
+]]:
     """
-    try:
-        with STORAGE_FILE.open("w") as file:
-            json.dump(data, file, indent=4)
-    except IOError as e:
-        print(f"Error writing to storage file: {e}")
\ No newline at end of file
+    Route an event and encode its payload for the outbox.
+
+    Returns:
+        trigger (Tuple[List[Tuple[...]], Dict[str | None, bytes]] | None): The deliveries and payload variants
+            to pass to `DeliveryOutbox.append`, or None if no webhook receives the event.
+    """
+    deliveries: List[Tuple[str, Optional[str], Optional[Dict[str, Any]], Optional[str], Optional[Dict[str, Any]]]] = []
+    for subscription in route(event, payload, table):
+        url, options = subscription.url, subscription.options
+        content_encoding = options.get("content_encoding")
+        signing_secret = options.get("signing_secret")
+        rate_limit = options.get("rate_limit")
+        if options.get("batch") is not None:
+            # Batches are compressed as a whole when they are sent
+            batch_options = {**options["batch"], "content_encoding": content_encoding}
+            deliveries.append((url, None, batch_options, signing_secret, rate_limit))
+        else:
+            deliveries.append((url, content_encoding, None, signing_secret, rate_limit))
+
+    if not deliveries:
+        return None
+
+    # Serialize the event payload once and compress it once per requested encoding
+    body = encode_event_payload(event, payload)
+    return deliveries, encode_payload_variants(body, {content_encoding for _, content_encoding, _, _, _ in deliveries})
@@ -1,8 +1,39 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
-from routers import webhook_router, user_router
+from observability import RequestMetricsMiddleware, configure_logging
+from routers import webhook_router, user_router, metrics_router
+from database_management import storage
+from webhook_delivery import delivery_engine, delivery_outbox, delivery_workers
 
-app = FastAPI()
+
+# Write log records as JSON from a background thread, so logging never blocks the event loop
+configure_logging()
+
+# Address the service listens on
+HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+PORT = int(os.getenv("WEBHOOK_PORT", "8000"))
+# Number of uvicorn worker processes; with more than one, all state is shared through the SQLite storage backend
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "1"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Start the webhook delivery engine and its worker pool on startup, and stop them and
+    close the storage on shutdown.
+    """
+    await delivery_engine.start()
+    await delivery_workers.start()
+    yield
+    await delivery_workers.stop()
+    await delivery_engine.stop()
+    delivery_outbox.close()
+    storage.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 CORS_SETTINGS = {
     "allow_origins": ["*"],  # Allow all origins
@@ -13,11 +44,20 @@ CORS_SETTINGS = {
 
 # Add CORS middleware to the application
 app.add_middleware(CORSMiddleware, **CORS_SETTINGS)
+# Record the duration of every request by route
+app.add_middleware(RequestMetricsMiddleware)
 
 app.include_router(webhook_router, tags=["webhook"])
 app.include_router(user_router, tags=["user"])
+app.include_router(metrics_router, tags=["metrics"])
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
+    if WEBHOOK_WORKERS > 1:
+        # Users and messages of the JSON backend live in the memory of one process, the workers must share SQLite
+        if os.environ.setdefault("WEBHOOK_STORAGE_BACKEND", "sqlite") != "sqlite":
+            raise SystemExit("WEBHOOK_WORKERS > 1 requires WEBHOOK_STORAGE_BACKEND=sqlite.")
+        uvicorn.run("main:app", host=HOST, port=PORT, workers=WEBHOOK_WORKERS)
+    else:
+        uvicorn.run("main:app", host=HOST, port=PORT, reload=True)
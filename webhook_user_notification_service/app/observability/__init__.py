@@ -0,0 +1,27 @@
+from .metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    MetricsRegistry,
+    PROMETHEUS_CONTENT_TYPE,
+    metrics_registry,
+    delivery_attempts,
+    delivery_duration,
+    delivery_retries,
+    delivery_dead_letters,
+    delivery_deferrals,
+    outbox_pending,
+    open_circuits,
+    storage_duration,
+    http_request_duration,
+    http_requests_in_progress,
+)
+
+from .logging_config import (
+    JsonFormatter,
+    configure_logging,
+)
+
+from .request_metrics import (
+    RequestMetricsMiddleware,
+)
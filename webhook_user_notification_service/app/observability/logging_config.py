@@ -0,0 +1,72 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+
+
+# Minimum level of the log records that are written, e.g. "DEBUG", "INFO" or "WARNING"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Attributes every log record has, everything else was passed through `extra` and is written as a field
+_STANDARD_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format log records as one JSON object per line.
+
+    The object holds the timestamp, level, logger name and message of the record, plus every
+    field passed through `extra`, e.g. `logger.info("Webhook delivered", extra={"url": url})`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: str = LOG_LEVEL) -> None:
+    """
+    Route all log records through a queue to a background thread that writes them to stdout as JSON.
+
+    Logging calls on the event loop only put the record on an in-memory queue, so a slow or
+    blocked stdout never stalls request handling or webhook delivery. The background thread is
+    stopped, after writing the remaining records, when the process exits. Calling the function
+    again has no effect.
+
+    Args:
+        level (str): The minimum level of the log records that are written.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root_logger = logging.getLogger()
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(level)
+    # httpx logs every request at INFO, the delivery engine already logs the outcome of each delivery
+    logging.getLogger("httpx").setLevel(logging.WARNING)
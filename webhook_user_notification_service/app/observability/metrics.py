@@ -0,0 +1,308 @@
+import bisect
+import math
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+
+# Upper bounds (in seconds) of the histogram buckets used for network latencies
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds (in seconds) of the histogram buckets used for in-process and disk operations
+FAST_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# Content type of the Prometheus text exposition format
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric(ABC):
+    """
+    Base class of a metric family with a fixed set of label names.
+
+    A metric without label names is updated directly. A metric with label names is updated through
+    the child returned by `labels`, one per combination of label values. Children are created on
+    first use and kept for the lifetime of the process, so label values must have a bounded number
+    of distinct values (e.g. event names or hosts, not user names).
+
+    Attributes:
+        name (str): The metric name.
+        documentation (str): The help text shown in the exposition format.
+        labelnames (Tuple[str, ...]): The label names.
+    """
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "Metric"] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *labelvalues: str) -> "Metric":
+        """
+        Return the child of the metric for the given label values, in the order of `labelnames`.
+
+        Raises:
+            ValueError: If the number of label values does not match the number of label names.
+        """
+        child = self._children.get(labelvalues)
+        if child is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"Metric '{self.name}' expects labels {self.labelnames}, got {labelvalues}.")
+            with self._lock:
+                child = self._children.get(labelvalues)
+                if child is None:
+                    child = self._children[labelvalues] = self._new_child()
+        return child
+
+    def _new_child(self) -> "Metric":
+        return type(self)(self.name, self.documentation)
+
+    @abstractmethod
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        """
+        Yield `(suffix, extra label, value)` triples of the samples of a child (or an unlabelled metric).
+        """
+
+    def render(self) -> List[str]:
+        """
+        Return the lines of the metric family in the Prometheus text exposition format.
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        if self.labelnames:
+            with self._lock:
+                children = sorted(self._children.items())
+        else:
+            children = [((), self)]
+        for labelvalues, child in children:
+            for suffix, extra, value in child._samples():
+                labels = _format_labels(self.labelnames, labelvalues, extra)
+                lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """
+    A value that only goes up, e.g. the number of delivered webhooks.
+    """
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        """
+        Increase the counter by a non-negative amount.
+        """
+        with self._lock:
+            self._value += amount
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        yield "_total" if not self.name.endswith("_total") else "", "", self._value
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down, e.g. the number of pending deliveries.
+
+    Instead of being set, a gauge can read its value from a function when the metrics are rendered.
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._value = 0.0
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """
+        Read the value of the gauge from a function every time the metrics are rendered.
+        """
+        self._function = function
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        yield "", "", self._function() if self._function is not None else self._value
+
+
+class Histogram(Metric):
+    """
+    Count observed values in cumulative buckets, e.g. request latencies.
+
+    Attributes:
+        buckets (Tuple[float, ...]): The upper bounds of the buckets, in ascending order.
+    """
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # One count per bucket plus one for the values above the largest bound
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+
+    def _new_child(self) -> "Histogram":
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        """
+        Record an observed value.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            yield "_bucket", f'le="{_format_value(bound)}"', cumulative
+        cumulative += counts[-1]
+        yield "_bucket", 'le="+Inf"', cumulative
+        yield "_sum", "", total
+        yield "_count", "", cumulative
+
+
+class MetricsRegistry:
+    """
+    The collection of all metric families exposed at `/metrics`.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Add a metric family to the registry and return it.
+
+        Raises:
+            ValueError: If a metric with the same name is already registered.
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered.")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Render all metric families in the Prometheus text exposition format.
+        """
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# The registry of all metrics of the service
+metrics_registry = MetricsRegistry()
+
+# Delivery metrics, recorded by the delivery workers when they settle a batch of deliveries
+delivery_attempts = metrics_registry.counter(
+    "webhook_delivery_attempts_total",
+    "Webhook delivery attempts by event and response status code ('error' if no response was received).",
+    ("event", "status_code")
+)
+delivery_duration = metrics_registry.histogram(
+    "webhook_delivery_duration_seconds",
+    "Time until the subscriber responded to a webhook delivery, by event and subscriber host.",
+    ("event", "host")
+)
+delivery_retries = metrics_registry.counter(
+    "webhook_delivery_retries_total",
+    "Failed webhook deliveries that were scheduled for another attempt, by event.",
+    ("event",)
+)
+delivery_dead_letters = metrics_registry.counter(
+    "webhook_delivery_dead_letters_total",
+    "Webhook deliveries that were moved to the dead-letter store, by event.",
+    ("event",)
+)
+delivery_deferrals = metrics_registry.counter(
+    "webhook_delivery_deferrals_total",
+    "Webhook deliveries that were deferred without being sent because the endpoint was unavailable or rate limited, by event.",
+    ("event",)
+)
+outbox_pending = metrics_registry.gauge(
+    "webhook_outbox_pending",
+    "Deliveries in the outbox, including the ones currently in flight or waiting for a retry."
+)
+open_circuits = metrics_registry.gauge(
+    "webhook_open_circuits",
+    "Webhook URLs whose circuit breaker is currently open."
+)
+
+# Storage metrics, recorded by the instrumented storage backend
+storage_duration = metrics_registry.histogram(
+    "storage_operation_duration_seconds",
+    "Duration of storage backend operations, by backend and operation.",
+    ("backend", "operation"),
+    FAST_LATENCY_BUCKETS
+)
+
+# HTTP metrics, recorded by the request metrics middleware
+http_request_duration = metrics_registry.histogram(
+    "http_request_duration_seconds",
+    "Duration of HTTP requests until the response was fully sent, by method, route and status code.",
+    ("method", "route", "status_code")
+)
+http_requests_in_progress = metrics_registry.gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being handled."
+)
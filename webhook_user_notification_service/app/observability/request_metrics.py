@@ -0,0 +1,46 @@
+import time
+from typing import Any, Callable, Dict
+
+from .metrics import http_request_duration, http_requests_in_progress
+
+
+class RequestMetricsMiddleware:
+    """
+    Record the duration of every HTTP request, by method, route and status code.
+
+    The route is the path template of the matched endpoint (e.g. `/users/messages`), not the
+    requested path, so the number of label values stays bounded. Requests that matched no
+    route are recorded as "unmatched". The duration covers the whole response, including the
+    body of streaming responses.
+
+    Implemented as a plain ASGI middleware, so it adds no buffering to streaming responses.
+    """
+
+    def __init__(self, app: Callable):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_progress.dec()
+            route = scope.get("route")
+            http_request_duration.labels(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status_code)
+            ).observe(time.perf_counter() - started_at)
@@ -1,15 +1,34 @@
 from .webhook_models import (
+    WebhookBatchOptions,
+    WebhookRateLimit,
     WebhookRequest,
     WebhookResponse,
     Webhook,
     RegisteredWebhooksResponse,
     PingedWebhooks,
-    PingResponse
+    PingResponse,
+    DeadLetterResponse,
+    DeadLettersResponse,
+    ReplayDeadLettersRequest,
+    ReplayDeadLettersResponse,
+    WebhookHealthResponse,
+    WebhooksHealthResponse,
+    EventRequest,
+    EventResponse,
+    EventsResponse,
+    TriggerEventResponse,
+    BulkWebhooksRequest,
+    BulkWebhookResult,
+    BulkWebhooksResponse
 )
 
 from .user_models import (
     UserRequest,
     UserResponse,
     SendMessageRequest,
-    SendMessageResponse
+    SendMessageResponse,
+    BulkUserResult,
+    BulkUsersResponse,
+    BulkMessageResult,
+    BulkMessagesResponse
 )
\ No newline at end of file
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime, timezone
+from typing import List, Optional
 
 class SendMessageRequest(BaseModel):
     """
@@ -72,4 +73,72 @@ class UserResponse(UserRequest):
         default_factory=lambda: datetime.now(timezone.utc).isoformat(),
         description="The timestamp when the user was registered.",
         example="2025-05-07T04:03:10.779082+00:00"
-    )
\ No newline at end of file
+    )
+
+
+class BulkUserResult(BaseModel):
+    """
+    Represents the result of one user of a bulk registration.
+
+    Attributes:
+        index (int): The position of the user in the request.
+        status_code (int): The status code `POST /users` would have responded with for the user.
+        detail (str | None): Why the user was not registered.
+        user (UserResponse | None): The registered user.
+    """
+    index: int = Field(..., description="The position of the user in the request, starting at 0.", example=0)
+    status_code: int = Field(
+        ...,
+        description="200 if the user was registered, 400 if the username already exists and 422 if the record is invalid.",
+        example=200
+    )
+    detail: Optional[str] = Field(default=None, description="Why the user was not registered.", example=None)
+    user: Optional[UserResponse] = Field(default=None, description="The registered user.")
+
+
+class BulkUsersResponse(BaseModel):
+    """
+    Represents the response after a bulk registration of users.
+
+    Attributes:
+        succeeded_count (int): The number of users that were registered.
+        failed_count (int): The number of users that were not registered.
+        results (List[BulkUserResult]): The result of every user, in the order of the request.
+    """
+    succeeded_count: int = Field(..., description="The number of users that were registered.", example=2)
+    failed_count: int = Field(..., description="The number of users that were not registered.", example=0)
+    results: List[BulkUserResult] = Field(..., description="The result of every user, in the order of the request.")
+
+
+class BulkMessageResult(BaseModel):
+    """
+    Represents the result of one message of a bulk send.
+
+    Attributes:
+        index (int): The position of the message in the request.
+        status_code (int): The status code `POST /users/messages` would have responded with for the message.
+        detail (str | None): Why the message was not sent.
+        message (SendMessageResponse | None): The sent message.
+    """
+    index: int = Field(..., description="The position of the message in the request, starting at 0.", example=0)
+    status_code: int = Field(
+        ...,
+        description="200 if the message was sent, 400 if the sender or recipient is invalid and 422 if the record is invalid.",
+        example=200
+    )
+    detail: Optional[str] = Field(default=None, description="Why the message was not sent.", example=None)
+    message: Optional[SendMessageResponse] = Field(default=None, description="The sent message.")
+
+
+class BulkMessagesResponse(BaseModel):
+    """
+    Represents the response after a bulk send of messages.
+
+    Attributes:
+        succeeded_count (int): The number of messages that were sent.
+        failed_count (int): The number of messages that were not sent.
+        results (List[BulkMessageResult]): The result of every message, in the order of the request.
+    """
+    succeeded_count: int = Field(..., description="The number of messages that were sent.", example=2)
+    failed_count: int = Field(..., description="The number of messages that were not sent.", example=0)
+    results: List[BulkMessageResult] = Field(..., description="The result of every message, in the order of the request.")
@@ -1,10 +1,57 @@
 from pydantic import BaseModel, HttpUrl, Field, field_validator
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Literal, Union
+
+class WebhookBatchOptions(BaseModel):
+    max_events: int = Field(
+        default=100,
+        ge=1,
+        le=1000,
+        description="Send the batch once it holds this many events.",
+        example=100
+    )
+    max_bytes: int = Field(
+        default=1_000_000,
+        ge=1024,
+        le=10_000_000,
+        description="Send the batch before its uncompressed JSON array would exceed this many bytes.",
+        example=1_000_000
+    )
+    max_linger_seconds: float = Field(
+        default=1.0,
+        gt=0,
+        le=10.0,
+        description="Send the batch at the latest this many seconds after its first event occurred.",
+        example=1.0
+    )
+
+
+class WebhookRateLimit(BaseModel):
+    requests_per_second: float = Field(
+        default=...,
+        gt=0,
+        le=10_000,
+        description="The sustained number of requests per second sent to the webhook URL.",
+        example=10
+    )
+    burst: int = Field(
+        default=1,
+        ge=1,
+        le=10_000,
+        description="The number of requests that may be sent at once after the webhook URL was idle.",
+        example=20
+    )
+
+
+# A value of an event data field that a payload filter compares against
+FilterValue = Union[str, int, float, bool, None]
+
 
 class WebhookRequest(BaseModel):
     event: str = Field(
         default=..., 
-        description="The event name for the webhook. Must be a valid identifier (e.g., 'user_registered').",
+        description="The event name for the webhook. Must be a valid identifier (e.g., 'user_registered'), "
+                    "or a wildcard pattern ending in '*' to subscribe to every event starting with the prefix "
+                    "(e.g., 'user_*', or '*' for all events).",
         example="user_registered"
     )
     url: HttpUrl = Field(
@@ -12,6 +59,31 @@ class WebhookRequest(BaseModel):
         description="The URL to send the webhook to. Must be a valid HTTP or HTTPS URL.",
         example="http://example.com/webhook1"
     )
+    content_encoding: Optional[Literal["gzip", "zstd"]] = Field(
+        default=None,
+        description="Compress the deliveries to this webhook with the given content encoding. "
+                    "Deliveries are sent uncompressed if not provided.",
+        example="gzip"
+    )
+    batch: Optional[WebhookBatchOptions] = Field(
+        default=None,
+        description="Coalesce events into batches, sent as one JSON array per request. "
+                    "Every event is sent in its own request if not provided.",
+        example={"max_events": 100, "max_bytes": 1000000, "max_linger_seconds": 1.0}
+    )
+    filter: Optional[Dict[str, Union[FilterValue, List[FilterValue]]]] = Field(
+        default=None,
+        description="Only deliver events whose data matches the filter. Every key is a field of the event data, "
+                    "and its value is the value the field must equal, or a list of the values it may take. "
+                    "Every event is delivered if not provided.",
+        example={"recipient": "alice"}
+    )
+    rate_limit: Optional[WebhookRateLimit] = Field(
+        default=None,
+        description="Send at most this many requests per second to the webhook URL, across all events it subscribes to. "
+                    "Deliveries above the limit are deferred, not dropped. Deliveries are not rate limited if not provided.",
+        example={"requests_per_second": 10, "burst": 20}
+    )
     
     @field_validator("event")
     def validate_event(cls, value: str) -> str:
@@ -22,6 +94,13 @@ class WebhookRequest(BaseModel):
         # Convert to lowercase
         value = value.lower()
 
+        # A wildcard pattern is a (possibly empty) prefix followed by a single '*'
+        if value.endswith("*"):
+            prefix = value[:-1]
+            if prefix and not prefix.isidentifier():
+                raise ValueError("The prefix of a wildcard pattern must be the start of a valid identifier.")
+            return value
+
         # Ensure the event name contains only alphanumeric characters and underscores
         if not value.isidentifier():
             raise ValueError("Event name must be a valid identifier (alphanumeric and underscores only).")
@@ -32,6 +111,11 @@ class WebhookResponse(BaseModel):
     message: str = Field(..., example="Webhook registered successfully")
     url: HttpUrl = Field(..., example="http://example.com/webhook1")
     event: str = Field(..., example="user_registered")
+    signing_secret: Optional[str] = Field(
+        default=None,
+        description="The secret the deliveries to the webhook are signed with (HMAC-SHA256 in the `Webhook-Signature` header).",
+        example="5f2b...e91c"
+    )
 
 
 class Webhook(BaseModel):
@@ -40,6 +124,10 @@ class Webhook(BaseModel):
 
 class RegisteredWebhooksResponse(BaseModel):
     webhooks: List[Webhook]
+    patterns: List[Webhook] = Field(
+        default_factory=list,
+        description="The wildcard patterns (e.g., 'user_*') and the URLs subscribed to them. Their URLs are also listed under every event they match."
+    )
 
 
 class PingedWebhooks(BaseModel):
@@ -103,4 +191,156 @@ class PingedWebhooks(BaseModel):
 
 class PingResponse(PingedWebhooks):
     message: str = Field(..., example="Ping completed for all events")
-    
+
+
+class DeadLetterResponse(BaseModel):
+    id: int = Field(..., description="The id of the dead-lettered delivery.", example=42)
+    event: str = Field(..., example="user_registered")
+    url: str = Field(..., example="http://example.com/webhook1")
+    payload: Dict[str, Any] = Field(
+        ...,
+        description="The payload that could not be delivered, including the event name.",
+        example={"event": "user_registered", "data": {"username": "alice", "registered_at": "2025-05-07T04:03:10.779082+00:00"}}
+    )
+    attempts: int = Field(..., description="How many times the delivery was attempted.", example=8)
+    last_error: str = Field(..., description="The error of the last attempt.", example="HTTP error: Service Unavailable")
+    last_status_code: Optional[int] = Field(
+        default=None,
+        description="The HTTP status code of the last attempt. None if no response was received.",
+        example=503
+    )
+    failed_at: str = Field(..., description="The timestamp when the delivery was dead-lettered.", example="2025-05-07T04:03:10.779082+00:00")
+
+
+class DeadLettersResponse(BaseModel):
+    dead_letters: List[DeadLetterResponse]
+
+
+class ReplayDeadLettersRequest(BaseModel):
+    ids: Optional[List[int]] = Field(
+        default=None,
+        description="The ids of the dead letters to replay. If not provided, all dead letters are replayed.",
+        example=[42, 43]
+    )
+
+
+class ReplayDeadLettersResponse(BaseModel):
+    message: str = Field(..., example="Dead letters replayed successfully")
+    replayed_count: int = Field(..., description="The number of deliveries that were queued again.", example=2)
+
+
+class WebhookHealthResponse(BaseModel):
+    url: str = Field(..., example="http://example.com/webhook1")
+    state: Literal["closed", "open", "half_open"] = Field(
+        ...,
+        description="The circuit breaker state. Deliveries to a URL with an open circuit are deferred without being sent.",
+        example="closed"
+    )
+    request_count: int = Field(..., description="The number of requests in the rolling window.", example=20)
+    failure_rate: float = Field(..., description="The share of failed requests in the rolling window.", example=0.05)
+    latency_p50_ms: Optional[float] = Field(
+        default=None,
+        description="The median latency in milliseconds of the requests in the rolling window.",
+        example=42.0
+    )
+    latency_p95_ms: Optional[float] = Field(
+        default=None,
+        description="The 95th percentile latency in milliseconds of the requests in the rolling window.",
+        example=180.0
+    )
+    opened_at: Optional[str] = Field(
+        default=None,
+        description="The timestamp when the circuit last opened. None if it never opened.",
+        example="2025-05-07T04:03:10.779082+00:00"
+    )
+    host_concurrency_limit: int = Field(
+        ...,
+        description="The current adaptive limit of concurrent requests to the URL's host.",
+        example=8
+    )
+    host_in_flight: int = Field(..., description="The number of requests currently in flight to the URL's host.", example=3)
+
+
+class WebhooksHealthResponse(BaseModel):
+    webhooks: List[WebhookHealthResponse]
+
+
+class EventRequest(BaseModel):
+    event: str = Field(
+        default=...,
+        description="The name of the event to create. Must be a valid identifier (e.g., 'invoice_paid').",
+        example="invoice_paid"
+    )
+
+    @field_validator("event")
+    def validate_event(cls, value: str) -> str:
+        """
+        Validate the event name to ensure it is lowercase and contains only valid characters.
+        Converts any uppercase letters to lowercase.
+        """
+        value = value.lower()
+        if not value.isidentifier():
+            raise ValueError("Event name must be a valid identifier (alphanumeric and underscores only).")
+        return value
+
+
+class EventResponse(BaseModel):
+    message: str = Field(..., example="Event created successfully")
+    event: str = Field(..., example="invoice_paid")
+
+
+class EventsResponse(BaseModel):
+    events: List[str] = Field(..., example=["user_registered", "user_send_message", "invoice_paid"])
+
+
+class TriggerEventResponse(BaseModel):
+    message: str = Field(..., example="Event triggered successfully")
+    event: str = Field(..., example="invoice_paid")
+    delivery_count: int = Field(
+        ...,
+        description="The number of webhooks the event is delivered to, after wildcard patterns and payload filters.",
+        example=3
+    )
+
+
+class BulkWebhooksRequest(BaseModel):
+    webhooks: List[WebhookRequest] = Field(
+        default=...,
+        min_length=1,
+        max_length=1000,
+        description="The webhooks to register or unregister, applied in order in a single storage transaction.",
+        example=[
+            {"event": "user_registered", "url": "http://example.com/webhook1"},
+            {"event": "user_send_message", "url": "http://example.com/webhook1"}
+        ]
+    )
+    atomic: bool = Field(
+        default=False,
+        description="Apply no change at all unless every webhook can be applied. "
+                    "Otherwise, the webhooks that can be applied are, and the others are reported as failed.",
+        example=False
+    )
+
+
+class BulkWebhookResult(BaseModel):
+    event: str = Field(..., example="user_registered")
+    url: str = Field(..., example="http://example.com/webhook1")
+    status_code: int = Field(
+        ...,
+        description="The status code of the single webhook endpoint for this webhook: 200 if it was registered, "
+                    "204 if it was unregistered, 400 or 404 if it failed, and 409 if it was not applied "
+                    "because another webhook of an atomic batch failed.",
+        example=200
+    )
+    detail: Optional[str] = Field(default=None, description="Why the webhook failed.", example=None)
+    signing_secret: Optional[str] = Field(
+        default=None,
+        description="The signing secret of a registered webhook.",
+        example="5f2b...e91c"
+    )
+
+
+class BulkWebhooksResponse(BaseModel):
+    succeeded_count: int = Field(..., description="The number of webhooks that were applied.", example=2)
+    failed_count: int = Field(..., description="The number of webhooks that were not applied.", example=0)
+    results: List[BulkWebhookResult] = Field(..., description="The result of every webhook, in the order of the request.")
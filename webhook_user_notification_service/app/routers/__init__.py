@@ -1,2 +1,3 @@
 from .webhook_controller import router as webhook_router
-from .user_controller import router as user_router
\ No newline at end of file
+from .user_controller import router as user_router
+from .metrics_controller import router as metrics_router
\ No newline at end of file
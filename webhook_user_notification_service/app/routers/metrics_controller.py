@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Response
+
+from observability import PROMETHEUS_CONTENT_TYPE, metrics_registry
+
+router: APIRouter = APIRouter()
+
+
+@router.get("/metrics", response_class=Response)
+def get_metrics():
+    """
+    Expose the metrics of the service in the Prometheus text exposition format.
+
+    The metrics cover webhook deliveries (attempts by status code, latency by event and host,
+    retries, dead letters and deferrals), the number of pending deliveries in the outbox,
+    open circuit breakers, storage operation durations and HTTP request durations by route.
+
+    Returns:
+        response (Response): The metrics as `text/plain` in the Prometheus text exposition format.
+    """
+    return Response(content=metrics_registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
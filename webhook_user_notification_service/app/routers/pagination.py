@@ -0,0 +1,137 @@
+from itertools import islice
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+
+
+# Number of records returned per page when no limit is given
+DEFAULT_PAGE_SIZE = 100
+# Upper bound on the number of records returned per page
+MAX_PAGE_SIZE = 1000
+# Response header carrying the cursor of the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Upper bound (in bytes) on a single line of a newline-delimited JSON request body
+MAX_NDJSON_LINE_BYTES = 1024 * 1024
+
+
+def paginate(records: Iterator[Tuple[int, BaseModel]], limit: int, response: Response) -> List[BaseModel]:
+    """
+    Take one page of records and set the cursor of the next page on the response.
+
+    Only `limit + 1` records are consumed from the iterator. If there are more records than fit
+    on the page, the cursor of the last record on the page is returned in the `X-Next-Cursor`
+    header; pass it as `after` to fetch the next page.
+
+    Args:
+        records (Iterator[Tuple[int, BaseModel]]): `(cursor, record)` pairs in cursor order.
+        limit (int): The maximum number of records on the page.
+        response (Response): The response to set the next cursor header on.
+
+    Returns:
+        page (List[BaseModel]): The records on the page.
+    """
+    page = list(islice(records, limit + 1))
+    if len(page) > limit:
+        page = page[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(page[-1][0])
+    return [record for _, record in page]
+
+
+def stream_ndjson(records: Iterator[Tuple[int, BaseModel]], limit: Optional[int] = None) -> StreamingResponse:
+    """
+    Stream records as newline-delimited JSON, encoding each record as it is sent.
+
+    Args:
+        records (Iterator[Tuple[int, BaseModel]]): `(cursor, record)` pairs in cursor order.
+        limit (int | None): The maximum number of records to stream. If None, stream all records.
+
+    Returns:
+        response (StreamingResponse): An `application/x-ndjson` response with one record per line.
+    """
+    def encode() -> Iterator[str]:
+        for _, record in islice(records, limit):
+            yield record.model_dump_json() + "\n"
+
+    return StreamingResponse(encode(), media_type=NDJSON_MEDIA_TYPE)
+
+
+async def read_body(request: Request, max_size: int) -> bytes:
+    """
+    Read a request body that must not be larger than `max_size` bytes.
+
+    A body announced as larger by its `Content-Length` is rejected before it is read, and the
+    bytes are counted while it is streamed, so an oversized body is never held in memory as a whole.
+
+    Args:
+        request (Request): The request to read the body of.
+        max_size (int): The maximum size of the body in bytes.
+
+    Returns:
+        body (bytes): The request body.
+
+    Raises:
+        HTTPException:
+            - 413: If the body is larger than `max_size` bytes.
+    """
+    too_large = HTTPException(status_code=413, detail=f"The body must be at most {max_size} bytes")
+    content_length = request.headers.get("content-length", "")
+    if content_length.isdigit() and int(content_length) > max_size:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_size:
+            raise too_large
+    return bytes(body)
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes],
+    max_line_length: int = MAX_NDJSON_LINE_BYTES,
+) -> AsyncIterator[Tuple[int, bytes]]:
+    """
+    Split a streamed request body into its newline-delimited JSON lines as the chunks arrive.
+
+    Only the unfinished last line is buffered, so the body is never held in memory as a whole,
+    and a line longer than `max_line_length` is rejected instead of being buffered without bound.
+    Blank lines are skipped.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The body chunks, e.g. `request.stream()`.
+        max_line_length (int): The maximum length of a line in bytes, without its newline.
+
+    Yields:
+        (line_number, line) (Tuple[int, bytes]): The 1-based line number and the line without its newline.
+
+    Raises:
+        HTTPException:
+            - 413: If a line is longer than `max_line_length` bytes. The lines before it were already yielded.
+    """
+    buffer = bytearray()
+    line_number = 0
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            line_number += 1
+            _check_line_length(line_number, end - start, max_line_length)
+            line = bytes(buffer[start:end])
+            start = end + 1
+            if line.strip():
+                yield line_number, line
+        del buffer[:start]
+        _check_line_length(line_number + 1, len(buffer), max_line_length)
+    if buffer.strip():
+        yield line_number + 1, bytes(buffer)
+
+
+def _check_line_length(line_number: int, length: int, max_line_length: int) -> None:
+    """
+    Reject an NDJSON line longer than `max_line_length` bytes with a 413.
+    """
+    if length > max_line_length:
+        raise HTTPException(status_code=413, detail=f"Line {line_number} is longer than {max_line_length} bytes")
@@ -1,20 +1,39 @@
-from fastapi import APIRouter, HTTPException, Query
-from typing import List
+import asyncio
+import json
+import logging
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import BaseModel, ValidationError
+from typing import Any, AsyncIterator, Callable, List, Literal, Optional, Tuple
 
-from database_management import trigger_webhooks
+from database_management import trigger_webhooks, trigger_webhooks_many, storage, UserAlreadyExistsError
 
 from pydantic_models import (
     UserRequest,
     UserResponse,
     SendMessageRequest,
-    SendMessageResponse
+    SendMessageResponse,
+    BulkUserResult,
+    BulkUsersResponse,
+    BulkMessageResult,
+    BulkMessagesResponse
 )
 
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NDJSON_MEDIA_TYPE, iter_ndjson_lines, paginate, read_body, stream_ndjson
+
 router: APIRouter = APIRouter()
 
-# In-memory databases
-send_message_store: List[SendMessageResponse] = []  # To store send messages
-user_store: List[UserResponse] = []   # To store registered users
+logger = logging.getLogger(__name__)
+
+# Number of records of a bulk request that are validated, stored and fanned out to the webhooks together
+BULK_CHUNK_SIZE = 1000
+# Maximum number of records in a bulk request sent as a JSON array, larger batches are streamed as NDJSON
+MAX_BULK_ARRAY_SIZE = 10000
+# Maximum size (in bytes) of a bulk request body sent as a JSON array, which is parsed as a whole
+MAX_BULK_ARRAY_BYTES = 8 * 1024 * 1024
+
+# The result of one record of a bulk request: its position, status code, error detail and the created record
+BulkResult = Tuple[int, int, Optional[str], Optional[BaseModel]]
 
 
 @router.post("/users", response_model=UserResponse)
@@ -35,19 +54,18 @@ async def register_user(user: UserRequest):
         HTTPException:
             - 400: If the username already exists.
     """
-    # Check if the username is unique
-    if any(existing_user.username.lower() == user.username.lower() for existing_user in user_store):
-        raise HTTPException(status_code=400, detail="Username already exists")
-    
-    # Register the user
+    # Register the user, the storage backend ensures the username is unique
     new_user = UserResponse(
         username=user.username.lower()
     )
-    user_store.append(new_user)
-    print(f"User registered: {new_user}")
+    try:
+        await asyncio.to_thread(storage.add_user, new_user)
+    except UserAlreadyExistsError:
+        raise HTTPException(status_code=400, detail="Username already exists")
+    logger.info("User registered", extra={"username": new_user.username})
     
     # Trigger webhooks for 'user_registered'
-    trigger_webhooks("user_registered", new_user)
+    await trigger_webhooks("user_registered", new_user)
     
     return new_user
 
@@ -74,13 +92,15 @@ async def send_message(send_message: SendMessageRequest):
             - 400: If the sender and recipient are the same.
     """
     # Check if the sender exists
-    if not any(user.username.lower() == send_message.sender.lower() for user in user_store):
+    sender = await asyncio.to_thread(storage.get_user, send_message.sender)
+    if sender is None:
         raise HTTPException(status_code=400, detail="Sender does not exist")
     # Check if the recipient exists
-    if not any(user.username.lower() == send_message.recipient.lower() for user in user_store):
+    recipient = await asyncio.to_thread(storage.get_user, send_message.recipient)
+    if recipient is None:
         raise HTTPException(status_code=400, detail="Recipient does not exist")
     # Check if the sender and recipient are different
-    if send_message.sender.lower() == send_message.recipient.lower():
+    if sender.username == recipient.username:
         raise HTTPException(status_code=400, detail="Sender and recipient cannot be the same")
     
     # Add metadata to the send message
@@ -90,52 +110,327 @@ async def send_message(send_message: SendMessageRequest):
         subject=send_message.subject,
         message=send_message.message
     )
-    send_message_store.append(new_send_message)
-    print(f"Message sent: {new_send_message}")
+    await asyncio.to_thread(storage.add_message, new_send_message)
+    logger.info("Message sent", extra={"sender": new_send_message.sender, "recipient": new_send_message.recipient})
     
     # Trigger webhooks for 'user_send_message'
-    trigger_webhooks("user_send_message", new_send_message)
+    await trigger_webhooks("user_send_message", new_send_message)
     
     return new_send_message
 
+@router.post("/users/bulk", response_model=BulkUsersResponse)
+async def register_users_bulk(request: Request):
+    """
+    Register many users at once and trigger webhooks for the 'user_registered' event of each of them.
+
+    The body is either a JSON array of users in the format of `POST /users` (at most `MAX_BULK_ARRAY_SIZE`),
+    or, with the content type `application/x-ndjson`, one user per line, which is read as it is
+    uploaded and suits backfills of any size. The users are processed in chunks of `BULK_CHUNK_SIZE`:
+    a chunk is validated, its usernames are checked against the user index and each other and the
+    new users are stored in one pass, then their 'user_registered' events are appended to the
+    delivery outbox in one transaction. Invalid or duplicate users are skipped, the others are registered.
+
+    Args:
+        request (Request): The request, whose body holds the users to register.
+
+    Returns:
+        response (BulkUsersResponse): For a JSON array, the result of every user. For NDJSON, an
+            `application/x-ndjson` response with a `{"type": "result", ...}` line for every user that
+            was not registered, followed by a `{"type": "summary", ...}` line with the counts.
+
+    Raises:
+        HTTPException:
+            - 413: If a JSON array holds more than `MAX_BULK_ARRAY_SIZE` users or `MAX_BULK_ARRAY_BYTES` bytes,
+              or an NDJSON line is longer than `MAX_NDJSON_LINE_BYTES` bytes.
+            - 422: If the body is neither a JSON array nor NDJSON.
+    """
+    ndjson, results, succeeded_count, failed_count = await _process_bulk(request, _register_users, "user_registered")
+    logger.info("Users registered", extra={"succeeded_count": succeeded_count, "failed_count": failed_count})
+    if ndjson:
+        return _ndjson_failures(results, succeeded_count, failed_count)
+    return BulkUsersResponse(
+        succeeded_count=succeeded_count,
+        failed_count=failed_count,
+        results=[
+            BulkUserResult(index=index, status_code=status_code, detail=detail, user=user)
+            for index, status_code, detail, user in results
+        ]
+    )
+
+
+@router.post("/users/messages/bulk", response_model=BulkMessagesResponse)
+async def send_messages_bulk(request: Request):
+    """
+    Send many messages at once and trigger webhooks for the 'user_send_message' event of each of them.
+
+    The body is either a JSON array of messages in the format of `POST /users/messages` (at most
+    `MAX_BULK_ARRAY_SIZE`), or, with the content type `application/x-ndjson`, one message per line.
+    The messages are processed in chunks of `BULK_CHUNK_SIZE`: the senders and recipients of a chunk
+    are looked up with one query, the valid messages are stored in one pass and their
+    'user_send_message' events are appended to the delivery outbox in one transaction.
+
+    Args:
+        request (Request): The request, whose body holds the messages to send.
+
+    Returns:
+        response (BulkMessagesResponse): For a JSON array, the result of every message. For NDJSON, an
+            `application/x-ndjson` response with a `{"type": "result", ...}` line for every message that
+            was not sent, followed by a `{"type": "summary", ...}` line with the counts.
+
+    Raises:
+        HTTPException:
+            - 413: If a JSON array holds more than `MAX_BULK_ARRAY_SIZE` messages or `MAX_BULK_ARRAY_BYTES` bytes,
+              or an NDJSON line is longer than `MAX_NDJSON_LINE_BYTES` bytes.
+            - 422: If the body is neither a JSON array nor NDJSON.
+    """
+    ndjson, results, succeeded_count, failed_count = await _process_bulk(request, _send_messages, "user_send_message")
+    logger.info("Messages sent", extra={"succeeded_count": succeeded_count, "failed_count": failed_count})
+    if ndjson:
+        return _ndjson_failures(results, succeeded_count, failed_count)
+    return BulkMessagesResponse(
+        succeeded_count=succeeded_count,
+        failed_count=failed_count,
+        results=[
+            BulkMessageResult(index=index, status_code=status_code, detail=detail, message=message)
+            for index, status_code, detail, message in results
+        ]
+    )
+
+
+async def _process_bulk(
+    request: Request,
+    process_chunk: Callable[[List[Tuple[int, Any]]], List[BulkResult]],
+    event: str,
+) -> Tuple[bool, List[BulkResult], int, int]:
+    """
+    Process the records of a bulk request chunk by chunk and trigger the webhooks of the created records.
+
+    Every chunk is processed in a worker thread, so the event loop keeps serving other requests.
+
+    Returns:
+        (ndjson, results, succeeded_count, failed_count) (Tuple[bool, List[BulkResult], int, int]): Whether the
+            body is NDJSON, the results to respond with (for NDJSON, only the failed ones) and the counts.
+    """
+    ndjson = request.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE)
+    results: List[BulkResult] = []
+    succeeded_count = failed_count = 0
+    async for chunk in _iter_record_chunks(request, ndjson):
+        chunk_results = await asyncio.to_thread(process_chunk, chunk)
+        await trigger_webhooks_many(event, [record for _, _, _, record in chunk_results if record is not None])
+        for result in chunk_results:
+            if result[3] is not None:
+                succeeded_count += 1
+            else:
+                failed_count += 1
+            if not ndjson or result[3] is None:
+                results.append(result)
+    return ndjson, results, succeeded_count, failed_count
+
+
+async def _iter_record_chunks(request: Request, ndjson: bool) -> AsyncIterator[List[Tuple[int, Any]]]:
+    """
+    Yield the records of a bulk request body in chunks of `BULK_CHUNK_SIZE`, as `(position, record)` pairs.
+
+    The position is the index in a JSON array, or the line number in NDJSON. A line that is not valid
+    JSON is yielded as the error it failed with. A JSON array is bounded in bytes before it is parsed,
+    and parsed in a worker thread.
+    """
+    if ndjson:
+        chunk: List[Tuple[int, Any]] = []
+        async for line_number, line in iter_ndjson_lines(request.stream()):
+            try:
+                chunk.append((line_number, json.loads(line)))
+            except ValueError as e:
+                chunk.append((line_number, e))
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+        return
+
+    body = await read_body(request, MAX_BULK_ARRAY_BYTES)
+    try:
+        records = await asyncio.to_thread(json.loads, body)
+    except ValueError:
+        records = None
+    if not isinstance(records, list):
+        raise HTTPException(status_code=422, detail="The body must be a JSON array, or NDJSON with the content type 'application/x-ndjson'")
+    if len(records) > MAX_BULK_ARRAY_SIZE:
+        raise HTTPException(status_code=413, detail=f"A JSON array holds at most {MAX_BULK_ARRAY_SIZE} records, send larger batches as NDJSON")
+    for start in range(0, len(records), BULK_CHUNK_SIZE):
+        yield list(enumerate(records[start:start + BULK_CHUNK_SIZE], start))
+
+
+def _validate(records: List[Tuple[int, Any]], model: type) -> Tuple[List[Tuple[int, Any]], List[BulkResult]]:
+    """
+    Validate the records of a chunk against a request model.
+
+    Returns:
+        (valid, invalid) (Tuple[List[Tuple[int, BaseModel]], List[BulkResult]]): The validated records with their
+            position, and a 422 result for every other record.
+    """
+    valid: List[Tuple[int, Any]] = []
+    invalid: List[BulkResult] = []
+    for position, record in records:
+        if isinstance(record, Exception):
+            invalid.append((position, 422, str(record), None))
+            continue
+        try:
+            valid.append((position, model.model_validate(record)))
+        except ValidationError as e:
+            invalid.append((position, 422, "; ".join(error["msg"] for error in e.errors()), None))
+    return valid, invalid
+
+
+def _register_users(records: List[Tuple[int, Any]]) -> List[BulkResult]:
+    """
+    Validate and register a chunk of users in one pass, like `POST /users` would one by one.
+    """
+    valid, results = _validate(records, UserRequest)
+    new_users = [UserResponse(username=user.username.lower()) for _, user in valid]
+    for (position, _), new_user, error in zip(valid, new_users, storage.add_users(new_users)):
+        if error is not None:
+            results.append((position, 400, "Username already exists", None))
+        else:
+            results.append((position, 200, None, new_user))
+    return sorted(results, key=lambda result: result[0])
+
+
+def _send_messages(records: List[Tuple[int, Any]]) -> List[BulkResult]:
+    """
+    Validate and send a chunk of messages in one pass, like `POST /users/messages` would one by one.
+    """
+    valid, results = _validate(records, SendMessageRequest)
+    # Look up all senders and recipients of the chunk at once
+    users = storage.get_users(
+        username for _, send_message in valid for username in (send_message.sender, send_message.recipient)
+    )
+    new_send_messages: List[SendMessageResponse] = []
+    for position, send_message in valid:
+        sender, recipient = users.get(send_message.sender), users.get(send_message.recipient)
+        if sender is None:
+            results.append((position, 400, "Sender does not exist", None))
+        elif recipient is None:
+            results.append((position, 400, "Recipient does not exist", None))
+        elif sender.username == recipient.username:
+            results.append((position, 400, "Sender and recipient cannot be the same", None))
+        else:
+            new_send_message = SendMessageResponse(
+                sender=send_message.sender.lower(),
+                recipient=send_message.recipient,
+                subject=send_message.subject,
+                message=send_message.message
+            )
+            new_send_messages.append(new_send_message)
+            results.append((position, 200, None, new_send_message))
+    storage.add_messages(new_send_messages)
+    return sorted(results, key=lambda result: result[0])
+
+
+def _ndjson_failures(results: List[BulkResult], succeeded_count: int, failed_count: int) -> Response:
+    """
+    Encode the failed records of an NDJSON bulk request, one per line, followed by a summary line.
+    """
+    lines = [
+        json.dumps({"type": "result", "line": line_number, "status_code": status_code, "detail": detail}) + "\n"
+        for line_number, status_code, detail, _ in results
+    ]
+    lines.append(json.dumps({"type": "summary", "succeeded_count": succeeded_count, "failed_count": failed_count}) + "\n")
+    return Response("".join(lines), media_type=NDJSON_MEDIA_TYPE)
+
+
 @router.get("/users/messages", response_model=List[SendMessageResponse])
-async def get_send_messages(
+def get_send_messages(
+    response: Response,
     recipient: str = Query(
         default=...,
-        description="The username of the recipient.",)
+        description="The username of the recipient.",),
+    limit: Optional[int] = Query(
+        default=None,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description=f"The maximum number of messages to return. Defaults to {DEFAULT_PAGE_SIZE} when 'after' or 'since' is given, otherwise all messages are returned.",),
+    after: Optional[int] = Query(
+        default=None,
+        description="Only return messages after this cursor. Use the value of the 'X-Next-Cursor' header of the previous page.",),
+    since: Optional[datetime] = Query(
+        default=None,
+        description="Only return messages received at or after this ISO 8601 timestamp (e.g., '2025-05-07T04:03:10+00:00'). A timestamp without an offset is taken as UTC.",),
+    format: Literal["json", "ndjson"] = Query(
+        default="json",
+        description="'json' returns one page as a JSON list, 'ndjson' streams the messages as newline-delimited JSON.",)
     ):
     """
     Retrieve sent messages for a specific user.
 
-    This endpoint retrieves all messages sent to a specific user.
+    This endpoint retrieves the messages sent to a specific user, oldest first. Without `limit`, `after`
+    and `since` all messages are returned, otherwise one page at a time. If there are more messages,
+    the cursor of the next page is returned in the 'X-Next-Cursor' header.
+    With `format=ndjson` the messages are streamed one per line as they are encoded instead.
 
     Args:
         recipient (str): The username of the recipient.
+        limit (int | None): The maximum number of messages to return.
+        after (int | None): Only return messages after this cursor.
+        since (datetime | None): Only return messages received at or after this time.
+        format (str): The response format, either 'json' or 'ndjson'.
 
     Returns:
-        response (List[SendMessageResponse]): A list of messages sent to the specified recipient.
+        response (List[SendMessageResponse]): A page of messages sent to the specified recipient.
 
     Raises:
         HTTPException:
             - 400: If the recipient does not exist.
     """
-    if not any(user.username == recipient.lower() for user in user_store):
+    if storage.get_user(recipient) is None:
             raise HTTPException(status_code=400, detail="Recipient does not exist")
     
-    user_messages: List[SendMessageResponse] = []
-    for message in send_message_store:
-        if message.recipient.lower() == recipient.lower():
-            user_messages.append(message)
-    return user_messages
+    messages = storage.iter_messages(recipient, after=after, since=since)
+    if format == "ndjson":
+        return stream_ndjson(messages, limit)
+    if limit is None and after is None and since is None:
+        return [message for _, message in messages]
+    return paginate(messages, limit or DEFAULT_PAGE_SIZE, response)
 
 @router.get("/users", response_model=List[UserResponse])
-async def get_users():
+def get_users(
+    response: Response,
+    limit: Optional[int] = Query(
+        default=None,
+        ge=1,
+        le=MAX_PAGE_SIZE,
+        description=f"The maximum number of users to return. Defaults to {DEFAULT_PAGE_SIZE} when 'after' or 'since' is given, otherwise all users are returned.",),
+    after: Optional[int] = Query(
+        default=None,
+        description="Only return users after this cursor. Use the value of the 'X-Next-Cursor' header of the previous page.",),
+    since: Optional[datetime] = Query(
+        default=None,
+        description="Only return users registered at or after this ISO 8601 timestamp (e.g., '2025-05-07T04:03:10+00:00'). A timestamp without an offset is taken as UTC.",),
+    format: Literal["json", "ndjson"] = Query(
+        default="json",
+        description="'json' returns one page as a JSON list, 'ndjson' streams the users as newline-delimited JSON.",)
+    ):
     """
-    Retrieve all registered users.
+    Retrieve registered users.
 
-    This endpoint retrieves a list of all users currently registered in the system.
+    This endpoint retrieves the users registered in the system, oldest first. Without `limit`, `after`
+    and `since` all users are returned, otherwise one page at a time. If there are more users,
+    the cursor of the next page is returned in the 'X-Next-Cursor' header.
+    With `format=ndjson` the users are streamed one per line as they are encoded instead.
+
+    Args:
+        limit (int | None): The maximum number of users to return.
+        after (int | None): Only return users after this cursor.
+        since (datetime | None): Only return users registered at or after this time.
+        format (str): The response format, either 'json' or 'ndjson'.
 
     Returns:
-        response (List[UserResponse]): A list of all registered users.
+        response (List[UserResponse]): A page of registered users.
     """
-    return user_store
\ No newline at end of file
+    users = storage.iter_users(after=after, since=since)
+    if format == "ndjson":
+        return stream_ndjson(users, limit)
+    if limit is None and after is None and since is None:
+        return [user for _, user in users]
+    return paginate(users, limit or DEFAULT_PAGE_SIZE, response)
@@ -1,27 +1,75 @@
-from fastapi import APIRouter, HTTPException, Query, Body, status
-from typing import Optional, List, Dict, Any
+import asyncio
+import json
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Query, Body, Request, status
+from fastapi.responses import Response, StreamingResponse
+from pydantic import ValidationError
+from typing import Optional, List, Dict, Any, AsyncIterator, Literal, Tuple
 
 from database_management import (
     update, 
     remove, 
+    update_many,
+    remove_many,
+    export_subscriptions,
     read,
+    patterns,
     send,
+    iter_send,
+    signing_secrets,
+    events,
+    create_event,
+    trigger_webhooks,
+    is_event_pattern,
+    storage,
+    WebhookStorageError,
+    WebhookEventAlreadyExistsError,
     WebhookEventNotFoundError,
     WebhookEventHasNoURLsError,
     WebhookUrlNotFoundError,
     WebhookUrlAlreadyExistsError
     )
 
+from webhook_delivery import (
+    delivery_outbox,
+    delivery_workers,
+    decompress_payload,
+    endpoint_health,
+    generate_signing_secret,
+    is_supported_encoding,
+    UnsupportedContentEncodingError
+)
+
 from pydantic_models import (
     WebhookResponse, 
     WebhookRequest,
     Webhook,
     RegisteredWebhooksResponse,
-    PingResponse
+    PingResponse,
+    DeadLetterResponse,
+    DeadLettersResponse,
+    ReplayDeadLettersRequest,
+    ReplayDeadLettersResponse,
+    WebhookHealthResponse,
+    WebhooksHealthResponse,
+    EventRequest,
+    EventResponse,
+    EventsResponse,
+    TriggerEventResponse,
+    BulkWebhooksRequest,
+    BulkWebhookResult,
+    BulkWebhooksResponse
 )
 
+from .pagination import NDJSON_MEDIA_TYPE, iter_ndjson_lines
+
 router: APIRouter = APIRouter()
 
+# Number of NDJSON lines of an import that are committed in one storage transaction
+IMPORT_CHUNK_SIZE = 500
+# The subscription options an imported subscription may carry, besides its signing secret
+IMPORTED_OPTIONS = ("content_encoding", "batch", "filter", "rate_limit")
+
 
 
 @router.post("/webhook", response_model=WebhookResponse)
@@ -32,30 +80,46 @@ def register_webhook(webhook: WebhookRequest):
     This endpoint allows the integrator to register a webhook URL for a specific event. 
     The webhook will be triggered whenever the specified event occurs.
 
+    The event can also be a wildcard pattern such as `user_*`, which subscribes the URL to every
+    event whose name starts with the prefix, including events created later. With a `filter`,
+    only the events whose data matches the filter are delivered to the webhook.
+
+    A signing secret is issued for the subscription and returned once. Every delivery to the
+    webhook is signed with it in the `Webhook-Signature` header, so the integrator can verify
+    that the request came from this service.
+
+    With a `rate_limit`, deliveries to the URL are sent no faster than the limit allows; the
+    deliveries above it are deferred until a token of the URL's bucket is available.
+
     Args:
-        webhook (WebhookRequest): The webhook object containing the event name and URL.
+        webhook (WebhookRequest): The webhook object containing the event name, URL and optional delivery options.
 
     Returns:
         response (WebhookResponse): A success message indicating that the webhook was registered, 
-        along with the event name and URL.
+        along with the event name, URL and signing secret.
 
     Raises:
         HTTPException: 
-            - 404: If the specified event does not exist.
+            - 404: If the specified event does not exist (and is not a wildcard pattern).
             - 400: If the URL is already registered for the given event.
+            - 422: If the codec of the content encoding is not installed.
     """
     try:
-        update(webhook.event, str(webhook.url))
+        options = _subscription_options(webhook)
+        update(webhook.event, str(webhook.url), options)
         return WebhookResponse(
             message="Webhook registered successfully",
             url=webhook.url,
-            event=webhook.event
+            event=webhook.event,
+            signing_secret=options["signing_secret"]
         )
         
     except WebhookEventNotFoundError:
         raise HTTPException(status_code=404, detail=f"Event '{webhook.event}' not found")
     except WebhookUrlAlreadyExistsError:
         raise HTTPException(status_code=400, detail=f"Webhook URL '{webhook.url}' already exists for event '{webhook.event}'")
+    except UnsupportedContentEncodingError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     
 
 @router.delete("/webhook", status_code=status.HTTP_204_NO_CONTENT)
@@ -68,7 +132,7 @@ def unregister_webhook(webhook: WebhookRequest):
     for the specified event.
 
     Args:
-        webhook (WebhookRequest): The webhook object containing the event name and URL.
+        webhook (WebhookRequest): The webhook object containing the event name, URL and optional delivery options.
 
     Returns:
         response (None): Returns a 204 No Content status code on successful deletion.
@@ -87,6 +151,323 @@ def unregister_webhook(webhook: WebhookRequest):
         raise HTTPException(status_code=404, detail=f"Webhook URL '{webhook.url}' not found for event '{webhook.event}'")
 
 
+def _subscription_options(webhook: WebhookRequest, signing_secret: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the stored options of a subscription, issuing a new signing secret unless one is given.
+
+    Raises:
+        UnsupportedContentEncodingError: If the codec of the content encoding is not installed (zstd needs
+            the optional `zstandard` package). The model only knows the encodings, not the installed codecs.
+    """
+    options: Dict[str, Any] = {"signing_secret": signing_secret or generate_signing_secret()}
+    if webhook.filter:
+        options["filter"] = webhook.filter
+    if webhook.content_encoding:
+        if not is_supported_encoding(webhook.content_encoding):
+            raise UnsupportedContentEncodingError(webhook.content_encoding)
+        options["content_encoding"] = webhook.content_encoding
+    if webhook.batch is not None:
+        options["batch"] = webhook.batch.model_dump()
+    if webhook.rate_limit is not None:
+        options["rate_limit"] = webhook.rate_limit.model_dump()
+    return options
+
+
+def _error_status(error: WebhookStorageError) -> int:
+    """
+    Return the status code the single webhook endpoints respond with for a storage error.
+    """
+    if isinstance(error, WebhookUrlAlreadyExistsError):
+        return 400
+    return 404
+
+
+def _bulk_response(
+    webhooks: List[WebhookRequest],
+    errors: List[Optional[WebhookStorageError]],
+    atomic: bool,
+    success_status_code: int,
+    signing_secrets: Optional[List[str]] = None,
+) -> BulkWebhooksResponse:
+    """
+    Build the per-webhook results of a bulk request from the errors returned by the storage.
+    """
+    rolled_back = atomic and any(errors)
+    results: List[BulkWebhookResult] = []
+    for index, (webhook, error) in enumerate(zip(webhooks, errors)):
+        if error is not None:
+            result = BulkWebhookResult(event=webhook.event, url=str(webhook.url), status_code=_error_status(error), detail=str(error))
+        elif rolled_back:
+            result = BulkWebhookResult(
+                event=webhook.event,
+                url=str(webhook.url),
+                status_code=409,
+                detail="Not applied, because another webhook of the atomic batch failed."
+            )
+        else:
+            result = BulkWebhookResult(
+                event=webhook.event,
+                url=str(webhook.url),
+                status_code=success_status_code,
+                signing_secret=signing_secrets[index] if signing_secrets is not None else None
+            )
+        results.append(result)
+    succeeded_count = sum(1 for result in results if result.status_code == success_status_code)
+    return BulkWebhooksResponse(
+        succeeded_count=succeeded_count,
+        failed_count=len(results) - succeeded_count,
+        results=results
+    )
+
+
+@router.post("/webhooks/bulk", response_model=BulkWebhooksResponse)
+def register_webhooks_bulk(request: BulkWebhooksRequest):
+    """
+    Register several webhooks at once.
+
+    The whole batch is validated first, then every webhook is registered in order in a single
+    storage transaction, i.e. one journal append (JSON backend) or one database transaction
+    (SQLite backend) however many webhooks the batch holds. Each webhook gets its own result,
+    with the status code `POST /webhook` would have responded with for it. With `atomic`, no
+    webhook is registered unless all of them can be.
+
+    Args:
+        request (BulkWebhooksRequest): The webhooks to register, and whether the batch is atomic.
+
+    Returns:
+        response (BulkWebhooksResponse): The result of every webhook, including the signing secrets of the
+            registered ones.
+
+    Raises:
+        HTTPException:
+            - 422: If the codec of a webhook's content encoding is not installed. No webhook is registered.
+    """
+    try:
+        options = [_subscription_options(webhook) for webhook in request.webhooks]
+    except UnsupportedContentEncodingError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    errors = update_many(
+        [(webhook.event, str(webhook.url), webhook_options) for webhook, webhook_options in zip(request.webhooks, options)],
+        request.atomic
+    )
+    signing_secrets = [webhook_options["signing_secret"] for webhook_options in options]
+    return _bulk_response(request.webhooks, errors, request.atomic, status.HTTP_200_OK, signing_secrets)
+
+
+@router.delete("/webhooks/bulk", response_model=BulkWebhooksResponse)
+def unregister_webhooks_bulk(request: BulkWebhooksRequest):
+    """
+    Unregister several webhooks at once, in a single storage transaction.
+
+    Each webhook gets its own result, with the status code `DELETE /webhook` would have
+    responded with for it. With `atomic`, no webhook is unregistered unless all of them can be.
+
+    Args:
+        request (BulkWebhooksRequest): The webhooks to unregister, and whether the batch is atomic.
+
+    Returns:
+        response (BulkWebhooksResponse): The result of every webhook.
+    """
+    errors = remove_many([(webhook.event, str(webhook.url)) for webhook in request.webhooks], request.atomic)
+    return _bulk_response(request.webhooks, errors, request.atomic, status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/webhooks/export")
+def export_webhooks():
+    """
+    Export every event and webhook subscription as newline-delimited JSON, e.g. for a backup or a migration.
+
+    The events come first, one `{"event": ...}` line each, followed by one
+    `{"event": ..., "url": ..., "options": {...}}` line per subscription. The options include the
+    signing secret, so the export must be kept as secret as the secrets themselves. The lines
+    are taken from a single snapshot of the registry and encoded as they are sent.
+
+    Returns:
+        response (StreamingResponse): An `application/x-ndjson` response with one event or subscription per line.
+    """
+    def encode():
+        for event, url, options in export_subscriptions():
+            if url is None:
+                yield json.dumps({"event": event}) + "\n"
+            else:
+                yield json.dumps({"event": event, "url": url, "options": options}) + "\n"
+
+    return StreamingResponse(encode(), media_type=NDJSON_MEDIA_TYPE)
+
+
+@router.post("/webhooks/import")
+async def import_webhooks(request: Request):
+    """
+    Import events and webhook subscriptions from newline-delimited JSON, in the format of `GET /webhooks/export`.
+
+    The body is read as it is streamed, so it is never held in memory as a whole, and the lines are
+    committed in chunks of `IMPORT_CHUNK_SIZE`, one storage transaction per chunk. The response has
+    the result of every line, as a `{"type": "result", "line": ..., "status": ...}` line, followed by
+    a final `{"type": "summary", ...}` line with the counts. A line's status is:
+    - `created`: the event or subscription was created.
+    - `exists`: the event or subscription already exists and was left as it is, so an import can
+      safely be run again.
+    - `failed`: the line is not valid JSON, fails validation, or names an event that does not exist;
+      `detail` says why.
+
+    Subscriptions keep the signing secret of the export, so their receivers can keep verifying
+    deliveries. A subscription without a signing secret is issued a new one.
+
+    Args:
+        request (Request): The request, whose body is the NDJSON to import.
+
+    Returns:
+        response (Response): An `application/x-ndjson` response with the result of every line.
+
+    Raises:
+        HTTPException:
+            - 413: If a line is longer than `MAX_NDJSON_LINE_BYTES` bytes. The chunks before it are already imported.
+    """
+    # The body is consumed before responding: a streaming response would compete with it for the ASGI receive channel
+    counts = {"created": 0, "exists": 0, "failed": 0}
+    encoded_results: List[str] = []
+    chunk: List[Tuple[int, bytes]] = []
+
+    async def commit() -> None:
+        for result in await asyncio.to_thread(_import_chunk, chunk):
+            counts[result["status"]] += 1
+            encoded_results.append(json.dumps({"type": "result", **result}) + "\n")
+
+    async for line in iter_ndjson_lines(request.stream()):
+        chunk.append(line)
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await commit()
+            chunk = []
+    if chunk:
+        await commit()
+
+    encoded_results.append(json.dumps({
+        "type": "summary",
+        "created_count": counts["created"],
+        "exists_count": counts["exists"],
+        "failed_count": counts["failed"]
+    }) + "\n")
+    return Response("".join(encoded_results), media_type=NDJSON_MEDIA_TYPE)
+
+
+def _import_chunk(lines: List[Tuple[int, bytes]]) -> List[Dict[str, Any]]:
+    """
+    Validate and import a chunk of NDJSON lines: first its events, then all its subscriptions in one storage transaction.
+
+    Returns:
+        results (List[Dict[str, Any]]): The result of every line, in line order.
+    """
+    results: Dict[int, Dict[str, Any]] = {}
+    subscriptions: List[Tuple[int, WebhookRequest, Dict[str, Any]]] = []
+    for line_number, line in lines:
+        result: Dict[str, Any] = {"line": line_number, "event": None, "url": None}
+        results[line_number] = result
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Every line must be a JSON object.")
+            result["event"], result["url"] = record.get("event"), record.get("url")
+            if record.get("url") is None:
+                event = EventRequest(event=record.get("event")).event
+                try:
+                    create_event(event)
+                    result["status"] = "created"
+                except WebhookEventAlreadyExistsError:
+                    result["status"] = "exists"
+                continue
+            options = record.get("options") or {}
+            webhook = WebhookRequest(
+                event=record.get("event"),
+                url=record.get("url"),
+                **{option: options[option] for option in IMPORTED_OPTIONS if option in options}
+            )
+            subscriptions.append((line_number, webhook, _subscription_options(webhook, options.get("signing_secret"))))
+        except ValidationError as e:
+            result.update(status="failed", detail="; ".join(error["msg"] for error in e.errors()))
+        except (ValueError, TypeError) as e:
+            result.update(status="failed", detail=str(e))
+
+    errors = update_many([(webhook.event, str(webhook.url), options) for _, webhook, options in subscriptions])
+    for (line_number, _, _), error in zip(subscriptions, errors):
+        if error is None:
+            results[line_number]["status"] = "created"
+        elif isinstance(error, WebhookUrlAlreadyExistsError):
+            results[line_number]["status"] = "exists"
+        else:
+            results[line_number].update(status="failed", detail=str(error))
+    return list(results.values())
+
+
+@router.get("/events", response_model=EventsResponse)
+def get_events():
+    """
+    Retrieve the names of all events that webhooks can subscribe to.
+
+    Returns:
+        response (EventsResponse): The event names, in the order they were created.
+    """
+    return EventsResponse(events=events())
+
+
+@router.post("/events", response_model=EventResponse, status_code=status.HTTP_201_CREATED)
+def register_event(event: EventRequest):
+    """
+    Create a new event type.
+
+    Once created, webhooks can subscribe to the event and it can be triggered through
+    `POST /events/{event}/trigger`. Webhooks subscribed to a wildcard pattern matching the
+    event receive it right away.
+
+    Args:
+        event (EventRequest): The name of the event to create.
+
+    Returns:
+        response (EventResponse): A success message along with the event name.
+
+    Raises:
+        HTTPException:
+            - 400: If the event already exists.
+    """
+    try:
+        create_event(event.event)
+    except WebhookEventAlreadyExistsError:
+        raise HTTPException(status_code=400, detail=f"Event '{event.event}' already exists")
+    return EventResponse(message="Event created successfully", event=event.event)
+
+
+@router.post("/events/{event}/trigger", response_model=TriggerEventResponse, status_code=status.HTTP_202_ACCEPTED)
+async def trigger_event(
+    event: str,
+    data: Dict[str, Any] = Body(
+        default=...,
+        description="The data of the event, sent to the webhooks as the payload's `data`.",
+        example={"invoice_id": "inv_42", "amount": 100}
+    )
+):
+    """
+    Trigger an event and deliver it to every webhook subscribed to it.
+
+    The event is routed to the webhooks subscribed to it and to the wildcard patterns matching
+    it, whose payload filters accept the data. The deliveries are queued in the outbox and sent
+    in the background, so the response does not wait for the webhooks.
+
+    Args:
+        event (str): The name of the event.
+        data (Dict[str, Any]): The data of the event.
+
+    Returns:
+        response (TriggerEventResponse): A success message along with the number of queued deliveries.
+
+    Raises:
+        HTTPException:
+            - 404: If the event does not exist.
+    """
+    if is_event_pattern(event) or await asyncio.to_thread(storage.webhook_urls, event) is None:
+        raise HTTPException(status_code=404, detail=f"Event '{event}' not found")
+    delivery_count = await trigger_webhooks(event, data)
+    return TriggerEventResponse(message="Event triggered successfully", event=event, delivery_count=delivery_count)
+
+
 @router.get("/webhooks", response_model=RegisteredWebhooksResponse)
 def get_all_registered_webhooks(
     event_filter: Optional[str] = Query(
@@ -97,7 +478,8 @@ def get_all_registered_webhooks(
     """
     Retrieve all registered webhooks grouped by event.
 
-    This endpoint returns a list of all registered webhooks grouped by event. 
+    This endpoint returns a list of all registered webhooks grouped by event, including the webhooks
+    subscribed to a wildcard pattern matching the event. The patterns are listed separately with their URLs.
     If an event filter is provided, only the webhooks for that specific event are returned.
 
     Args:
@@ -105,7 +487,7 @@ def get_all_registered_webhooks(
 
     Returns:
         response (RegisteredWebhooksResponse): A dictionary where the keys are event names and the values 
-        are lists of webhook URLs.
+        are lists of webhook URLs, and the wildcard patterns with their URLs.
 
     Raises:
         HTTPException: 
@@ -125,8 +507,12 @@ def get_all_registered_webhooks(
                 urls=webhook_urls
             )
             webhooks.append(webhook)
-            
 
+        if event_filter is None:
+            return RegisteredWebhooksResponse(
+                webhooks=webhooks,
+                patterns=[Webhook(event=pattern, urls=urls) for pattern, urls in patterns().items()]
+            )
         return RegisteredWebhooksResponse(webhooks=webhooks)
     
     except WebhookEventNotFoundError:
@@ -140,12 +526,134 @@ def get_all_registered_webhooks(
             detail=f"Event '{event_filter}' has no registered URLs."
         )
 
+@router.get("/webhooks/dead-letters", response_model=DeadLettersResponse)
+async def get_dead_letters(
+    event_filter: Optional[str] = Query(
+        default=None, 
+        description="Filter dead letters by a specific event name (e.g., 'user_registered')."
+    ),
+    limit: int = Query(
+        default=100,
+        ge=1,
+        le=1000,
+        description="The maximum number of dead letters to return."
+    ),
+    offset: int = Query(
+        default=0,
+        ge=0,
+        description="The number of dead letters to skip."
+    )
+):
+    """
+    Retrieve deliveries that were moved to the dead-letter store.
+
+    A delivery is dead-lettered when it has failed on every attempt, including all retries
+    with exponential backoff. Dead letters are returned with the most recently failed first.
+
+    Args:
+        event_filter (str | None): The event name to filter dead letters. If None, all dead letters are returned.
+        limit (int): The maximum number of dead letters to return.
+        offset (int): The number of dead letters to skip.
+
+    Returns:
+        response (DeadLettersResponse): The dead-lettered deliveries, including the last error of each.
+    """
+    dead_letters = await asyncio.to_thread(delivery_outbox.list_dead_letters, event_filter, limit, offset)
+    
+    return DeadLettersResponse(
+        dead_letters=[
+            DeadLetterResponse(
+                id=dead_letter.id,
+                event=dead_letter.event,
+                url=dead_letter.url,
+                payload=json.loads(decompress_payload(dead_letter.payload, dead_letter.content_encoding)),
+                attempts=dead_letter.attempts,
+                last_error=dead_letter.last_error,
+                last_status_code=dead_letter.last_status_code,
+                failed_at=datetime.fromtimestamp(dead_letter.failed_at, timezone.utc).isoformat()
+            )
+            for dead_letter in dead_letters
+        ]
+    )
+
+
+@router.post("/webhooks/dead-letters/replay", response_model=ReplayDeadLettersResponse)
+async def replay_dead_letters(request: Optional[ReplayDeadLettersRequest] = None):
+    """
+    Queue dead-lettered deliveries for delivery again.
+
+    The replayed deliveries are moved back into the delivery outbox as fresh deliveries, 
+    so they get the full number of attempts again.
+
+    Args:
+        request (ReplayDeadLettersRequest | None): The ids of the dead letters to replay. 
+            If not provided, all dead letters are replayed.
+
+    Returns:
+        response (ReplayDeadLettersResponse): The number of deliveries that were queued again.
+    """
+    ids = request.ids if request is not None else None
+    replayed_count = await asyncio.to_thread(delivery_outbox.replay_dead_letters, ids)
+    delivery_workers.notify()
+    
+    return ReplayDeadLettersResponse(
+        message="Dead letters replayed successfully",
+        replayed_count=replayed_count
+    )
+
+
+@router.get("/webhooks/health", response_model=WebhooksHealthResponse)
+async def get_webhooks_health(
+    state: Optional[Literal["closed", "open", "half_open"]] = Query(
+        default=None,
+        description="Only return webhook URLs whose circuit breaker is in this state."
+    )
+):
+    """
+    Retrieve the health of every webhook URL that was called since the service started.
+
+    Each URL has a circuit breaker that opens when too many of its recent requests failed. 
+    While it is open, deliveries and pings to the URL are skipped instead of waiting for a timeout. 
+    The response also shows the latency of the recent requests and the adaptive concurrency limit of the URL's host.
+
+    Args:
+        state (str | None): The circuit breaker state to filter by. If None, all URLs are returned.
+
+    Returns:
+        response (WebhooksHealthResponse): The health of each webhook URL.
+    """
+    return WebhooksHealthResponse(
+        webhooks=[
+            WebhookHealthResponse(
+                url=health.url,
+                state=health.state,
+                request_count=health.request_count,
+                failure_rate=health.failure_rate,
+                latency_p50_ms=health.latency_p50 * 1000 if health.latency_p50 is not None else None,
+                latency_p95_ms=health.latency_p95 * 1000 if health.latency_p95 is not None else None,
+                opened_at=datetime.fromtimestamp(health.opened_at, timezone.utc).isoformat() if health.opened_at else None,
+                host_concurrency_limit=health.host_concurrency_limit,
+                host_in_flight=health.host_in_flight
+            )
+            for health in endpoint_health.snapshot()
+            if state is None or health.state == state
+        ]
+    )
+
+
 @router.post("/ping", response_model=PingResponse)
-def ping_all_webhooks(
+async def ping_all_webhooks(
     event_filter: Optional[str] = Query(
         default=None, 
         description="Filter webhooks to ping by specific event name (e.g., 'user_registered')."
     ),
+    stream: Optional[Literal["ndjson", "sse"]] = Query(
+        default=None,
+        description=(
+            "Stream each result as soon as it completes instead of returning a summary at the end. "
+            "'ndjson' streams newline-delimited JSON, 'sse' streams server-sent events."
+        )
+    ),
     payload: Optional[Dict[str, Any]] = Body(
         default=None,
         description="Optional payload to send to the webhooks. If not provided, a default payload will be used.",
@@ -159,10 +667,18 @@ def ping_all_webhooks(
     Ping all registered webhooks across all events or for a specific event.
 
     This endpoint sends a test payload to all registered webhooks for all events or a specific event.
+    The webhooks of an event include the ones subscribed to a wildcard pattern matching it, and every
+    webhook is pinged once per event it receives, with the name of that event.
+    The webhooks are pinged concurrently and every ping has a connect and a read timeout.
     It provides a summary of successful and failed webhook calls.
 
+    If `stream` is set, every entry is sent as soon as its ping completes, followed by a final
+    summary with the counts and the message. Each record has a `type` of `successful_webhook`,
+    `failed_webhook` or `summary` (the event name when streaming server-sent events).
+
     Args:
         event_filter (str | None): The event name to filter webhooks. If None, all events are pinged.
+        stream (str | None): The streaming format, either 'ndjson' or 'sse'. If None, a summary is returned.
         payload (dict | None): An optional payload to send to the webhooks. If not provided, a default payload is used.
 
     Returns:
@@ -174,28 +690,8 @@ def ping_all_webhooks(
             - 404: If the specified event exists but has no registered URLs.
     """
     try:
-        # Read webhooks from storage
-        data = read(event_filter)
-
-        # Use the provided payload or fall back to the default payload
-        payload_to_send = payload or {"message": "Ping from User Notification Webhook Service"}
-
-        # Send pings to the webhooks
-        pinged_webhooks = send(data, payload_to_send)
-
-        # Construct the response message
-        message = (
-            "Pinged all registered webhooks successfully."
-            if event_filter is None
-            else f"Pinged webhooks for event '{event_filter}' successfully."
-        )
-
-        # Return the PingResponse
-        return PingResponse(
-            message=message,
-            **pinged_webhooks.model_dump()
-        )
-
+        # Read the webhooks of the events and their signing secrets from storage
+        data, secrets = await asyncio.to_thread(_read_ping_targets, event_filter)
     except WebhookEventNotFoundError:
         raise HTTPException(
             status_code=404, 
@@ -205,4 +701,69 @@ def ping_all_webhooks(
         raise HTTPException(
             status_code=404, 
             detail=f"Event '{event_filter}' has no registered URLs."
-        )
\ No newline at end of file
+        )
+
+    # Use the provided payload or fall back to the default payload
+    payload_to_send = payload or {"message": "Ping from User Notification Webhook Service"}
+
+    # Construct the response message
+    message = (
+        "Pinged all registered webhooks successfully."
+        if event_filter is None
+        else f"Pinged webhooks for event '{event_filter}' successfully."
+    )
+
+    if stream is not None:
+        return StreamingResponse(
+            _stream_ping_results(data, payload_to_send, secrets, message, stream),
+            media_type="application/x-ndjson" if stream == "ndjson" else "text/event-stream"
+        )
+
+    # Send pings to the webhooks
+    pinged_webhooks = await send(data, payload_to_send, secrets)
+
+    # Return the PingResponse
+    return PingResponse(
+        message=message,
+        **pinged_webhooks.model_dump()
+    )
+
+
+def _read_ping_targets(event_filter: Optional[str]) -> Tuple[Dict[str, List[str]], Dict[Tuple[str, str], str]]:
+    """
+    Read the webhooks to ping and their signing secrets in one go, off the event loop.
+    """
+    data = read(event_filter)
+    return data, signing_secrets(data)
+
+
+async def _stream_ping_results(
+    data: Dict[str, List[str]],
+    payload: Dict[str, Any],
+    secrets: Dict[Tuple[str, str], str],
+    message: str,
+    stream: str,
+) -> AsyncIterator[str]:
+    """
+    Ping the webhooks and encode every result as an NDJSON line or a server-sent event as it completes.
+    """
+    def encode(record_type: str, record: Dict[str, Any]) -> str:
+        if stream == "sse":
+            return f"event: {record_type}\ndata: {json.dumps(record)}\n\n"
+        return json.dumps({"type": record_type, **record}) + "\n"
+
+    successful_webhooks_count = 0
+    failed_webhooks_count = 0
+    async for successful, entry in iter_send(data, payload, secrets):
+        if successful:
+            successful_webhooks_count += 1
+            yield encode("successful_webhook", entry)
+        else:
+            failed_webhooks_count += 1
+            yield encode("failed_webhook", entry)
+
+    yield encode("summary", {
+        "message": message,
+        "successful_webhooks_count": successful_webhooks_count,
+        "failed_webhooks_count": failed_webhooks_count
+    })
@@ -0,0 +1,70 @@
+from .http_client import (
+    create_http_client,
+)
+
+from .payload_encoding import (
+    encode_event_payload,
+    encode_payload_variants,
+    decompress_payload,
+    is_supported_encoding,
+    UnsupportedContentEncodingError,
+)
+
+from .payload_signing import (
+    SIGNATURE_HEADER,
+    generate_signing_secret,
+    sign_payload,
+)
+
+from .rate_limiting import (
+    RateLimit,
+    SubscriberRateLimiter,
+    rate_limiter,
+)
+
+from .fair_scheduling import (
+    weighted_fair_shares,
+)
+
+from .endpoint_health import (
+    CircuitBreaker,
+    AdaptiveConcurrencyLimit,
+    EndpointHealth,
+    EndpointHealthTracker,
+    EndpointUnavailableError,
+    endpoint_health,
+)
+
+from .delivery_engine import (
+    DELIVERY_ID_HEADER,
+    WebhookDeliveryEngine,
+    DeliveryResult,
+    delivery_engine,
+)
+
+from .delivery_outbox import (
+    DeliveryOutbox,
+    OutboxDelivery,
+    DeadLetter,
+    delivery_outbox,
+)
+
+from .retry_scheduler import (
+    RetryScheduler,
+    compute_backoff,
+)
+
+from .delivery_batcher import (
+    DeliveryBatcher,
+    BatchOptions,
+)
+
+from .delivery_workers import (
+    DeliveryWorkerPool,
+    delivery_workers,
+)
+
+
+from .webhook_ping import (
+    ping_webhooks,
+)
\ No newline at end of file
@@ -0,0 +1,140 @@
+import asyncio
+import json
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .delivery_engine import DeliveryResult, WebhookDeliveryEngine
+from .delivery_outbox import OutboxDelivery
+from .payload_encoding import compress_payload, is_supported_encoding
+
+
+
+# Default maximum number of events sent in one batch
+BATCH_MAX_EVENTS = 100
+# Default maximum size (in bytes) of the uncompressed JSON array sent in one batch
+BATCH_MAX_BYTES = 1_000_000
+# Default maximum time (in seconds) the first event of a batch waits for more events
+BATCH_MAX_LINGER_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class BatchOptions:
+    """
+    The batching options of a subscription.
+
+    Attributes:
+        max_events (int): The batch is sent once it holds this many events.
+        max_bytes (int): The batch is sent before its uncompressed JSON array would exceed this size.
+        max_linger_seconds (float): The batch is sent at the latest this long after its first event was buffered.
+        content_encoding (str | None): The compression of the batch ("gzip" or "zstd"), or None if uncompressed.
+    """
+    max_events: int = BATCH_MAX_EVENTS
+    max_bytes: int = BATCH_MAX_BYTES
+    max_linger_seconds: float = BATCH_MAX_LINGER_SECONDS
+    content_encoding: Optional[str] = None
+
+
+@lru_cache(maxsize=1024)
+def parse_batch_options(encoded: str) -> BatchOptions:
+    """
+    Parse the JSON encoded batching options stored with an outbox delivery.
+    """
+    return BatchOptions(**json.loads(encoded))
+
+
+@dataclass
+class _Batch:
+    """
+    The deliveries buffered for one subscription.
+    """
+    options: BatchOptions
+    deliveries: List[OutboxDelivery] = field(default_factory=list)
+    # Size of the JSON array the buffered payloads are joined into
+    size: int = 2
+    linger_timer: Optional[asyncio.TimerHandle] = None
+
+
+class DeliveryBatcher:
+    """
+    Coalesce the deliveries of batched subscriptions into one POST request per subscriber.
+
+    The delivery workers hand every leased delivery of a batched subscription to the batcher
+    instead of sending it. The batcher buffers the deliveries per URL, batching options and signing secret,
+    and sends the buffered payloads as a single JSON array once the batch holds `max_events`
+    events, once adding another payload would exceed `max_bytes`, or `max_linger_seconds`
+    after the first event was buffered, whichever comes first.
+
+    The buffered deliveries stay leased in the outbox while they wait, so they are delivered
+    again after a restart if the process stops before the batch is sent. All deliveries of a
+    batch share the outcome of its request and are settled together through `on_sent`.
+
+    Attributes:
+        engine (WebhookDeliveryEngine): The engine used to send the batches.
+        on_sent (Callable[[List[DeliveryResult]], Awaitable[None]]): Called with the results of every sent batch.
+    """
+
+    def __init__(
+        self,
+        engine: WebhookDeliveryEngine,
+        on_sent: Callable[[List[DeliveryResult]], Awaitable[None]],
+    ):
+        self.engine = engine
+        self.on_sent = on_sent
+        self._batches: Dict[Tuple[str, str, Optional[str]], _Batch] = {}
+        self._sending: Set[asyncio.Task] = set()
+
+    def add(self, delivery: OutboxDelivery) -> None:
+        """
+        Buffer a delivery of a batched subscription, sending its batch if it is full.
+
+        Must be called from code running on the event loop.
+        """
+        key = (delivery.url, delivery.batch_options, delivery.signing_secret)
+        batch = self._batches.get(key)
+        if batch is not None and batch.size + len(delivery.payload) + 1 > batch.options.max_bytes:
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = self._batches[key] = _Batch(options=parse_batch_options(delivery.batch_options))
+            batch.linger_timer = asyncio.get_running_loop().call_later(
+                batch.options.max_linger_seconds, self._flush, key
+            )
+
+        batch.deliveries.append(delivery)
+        batch.size += len(delivery.payload) + (1 if len(batch.deliveries) > 1 else 0)
+        if len(batch.deliveries) >= batch.options.max_events or batch.size >= batch.options.max_bytes:
+            self._flush(key)
+
+    async def stop(self) -> None:
+        """
+        Send all buffered batches and wait until every batch has been sent and settled.
+        """
+        for key in list(self._batches):
+            self._flush(key)
+        await asyncio.gather(*self._sending, return_exceptions=True)
+
+    def _flush(self, key: Tuple[str, str, Optional[str]]) -> None:
+        """
+        Stop buffering a batch and send it in the background.
+        """
+        batch = self._batches.pop(key, None)
+        if batch is None:
+            return
+        batch.linger_timer.cancel()
+        task = asyncio.create_task(self._send(batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _send(self, batch: _Batch) -> None:
+        """
+        Send the payloads of a batch as one JSON array and settle its deliveries.
+        """
+        body = b"[" + b",".join(delivery.payload for delivery in batch.deliveries) + b"]"
+        content_encoding = batch.options.content_encoding
+        if content_encoding and is_supported_encoding(content_encoding):
+            body = await asyncio.to_thread(compress_payload, body, content_encoding)
+        else:
+            content_encoding = None
+        results = await self.engine.deliver_coalesced(batch.deliveries, body, content_encoding)
+        await self.on_sent(results)
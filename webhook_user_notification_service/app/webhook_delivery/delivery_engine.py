@@ -0,0 +1,270 @@
+import asyncio
+import contextlib
+import logging
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional
+import httpx
+
+from .delivery_outbox import OutboxDelivery
+from .endpoint_health import (
+    ENDPOINT_RETRY_SECONDS,
+    EndpointHealthTracker,
+    EndpointUnavailableError,
+    endpoint_health,
+    is_healthy_response
+    )
+from .http_client import create_http_client
+from .payload_signing import SIGNATURE_HEADER, sign_payload
+from .rate_limiting import SubscriberRateLimiter, parse_rate_limit, parse_retry_after, rate_limiter
+
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on the number of deliveries in flight across all events
+MAX_CONCURRENT_DELIVERIES = 100
+# Upper bound on the number of deliveries in flight for a single event within a batch
+MAX_CONCURRENT_DELIVERIES_PER_EVENT = 20
+# Timeout (in seconds) for a single delivery, covering connect, write and read
+DELIVERY_TIMEOUT_SECONDS = 5.0
+# How long (in seconds) a delivery waits for a free slot of its subscriber host, or for a token of its rate limit,
+# before it is deferred
+DELIVERY_HOST_WAIT_SECONDS = 2.0
+# Header carrying the ID of the delivery (the outbox row), which every retry keeps; a comma-separated list
+# of the IDs of its events, in array order, for a batch
+DELIVERY_ID_HEADER = "Webhook-Delivery-Id"
+# Status codes whose `Retry-After` header holds back every delivery to the URL until the given time
+THROTTLING_STATUS_CODES = (429, 503)
+
+
+@dataclass(frozen=True)
+class DeliveryResult:
+    """
+    The outcome of a single delivery attempt.
+
+    Attributes:
+        delivery (OutboxDelivery): The delivery that was attempted.
+        success (bool): Whether the subscriber responded with a 2xx status code.
+        status_code (int | None): The HTTP status code, or None if no response was received.
+        error (str | None): A description of the failure, or None if the delivery succeeded.
+        retry_at (float | None): Set if the delivery was not sent because the endpoint is unavailable
+            (its circuit is open, its host is saturated or its rate limit is exhausted). The delivery should
+            be deferred until this UNIX timestamp without using up an attempt.
+        duration (float | None): The time in seconds until the response (or the error) was received, or None
+            if the delivery was not sent.
+        retry_after (float | None): The UNIX timestamp before which the subscriber asked not to be called again,
+            through the `Retry-After` header of a 429 or 503 response. The next attempt must not be made earlier.
+    """
+    delivery: OutboxDelivery
+    success: bool
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+    retry_at: Optional[float] = None
+    duration: Optional[float] = None
+    retry_after: Optional[float] = None
+
+
+class WebhookDeliveryEngine:
+    """
+    Deliver webhook payloads asynchronously on the running event loop.
+
+    The engine owns the single shared HTTP client (see `create_http_client`), so connections
+    to each subscriber host are pooled and kept alive between deliveries. It is driven by the delivery workers, which lease batches of deliveries from
+    the outbox, so the request handler that caused an event never waits on subscriber latency.
+
+    Every delivery goes through the endpoint health tracker: deliveries to a URL whose circuit is
+    open are not sent at all, and the number of deliveries in flight to each host follows its
+    adaptive concurrency limit, so slow subscribers get fewer delivery slots.
+
+    Every request carries the outbox ID of its delivery in the `Webhook-Delivery-Id` header. The body is
+    shared by all subscribers of an event, the header tells the deliveries apart, and every retry of a
+    delivery carries the same ID, so a receiver can use it to drop duplicates.
+
+    Deliveries to subscriptions with a rate limit take a token from the URL's token bucket first,
+    and are deferred if no token becomes available within `host_wait_timeout`. A 429 or 503
+    response with a `Retry-After` header holds back all deliveries to the URL until then.
+
+    Attributes:
+        max_concurrent_deliveries (int): Maximum number of deliveries in flight across all events.
+        max_concurrent_per_event (int): Maximum number of deliveries in flight for one event within a batch.
+        timeout (float): Timeout in seconds applied to each delivery.
+        host_wait_timeout (float): How long in seconds a delivery waits for a free slot of its host or a token
+            of its rate limit.
+        health (EndpointHealthTracker): The circuit breakers and per-host concurrency limits.
+        rate_limiter (SubscriberRateLimiter): The token buckets of the rate limited URLs.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_deliveries: int = MAX_CONCURRENT_DELIVERIES,
+        max_concurrent_per_event: int = MAX_CONCURRENT_DELIVERIES_PER_EVENT,
+        timeout: float = DELIVERY_TIMEOUT_SECONDS,
+        host_wait_timeout: float = DELIVERY_HOST_WAIT_SECONDS,
+        health: EndpointHealthTracker = endpoint_health,
+        rate_limiter: SubscriberRateLimiter = rate_limiter,
+    ):
+        self.max_concurrent_deliveries = max_concurrent_deliveries
+        self.max_concurrent_per_event = max_concurrent_per_event
+        self.timeout = timeout
+        self.host_wait_timeout = host_wait_timeout
+        self.health = health
+        self.rate_limiter = rate_limiter
+        self._client: Optional[httpx.AsyncClient] = None
+        self._global_semaphore = asyncio.Semaphore(max_concurrent_deliveries)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        The shared HTTP client used for all deliveries.
+
+        Raises:
+            RuntimeError: If the engine has not been started.
+        """
+        if self._client is None:
+            raise RuntimeError("The webhook delivery engine has not been started.")
+        return self._client
+
+    async def start(self) -> None:
+        """
+        Create the shared HTTP client. Called once on application startup.
+        """
+        if self._client is None:
+            self._client = create_http_client(httpx.Timeout(self.timeout))
+
+    async def stop(self) -> None:
+        """
+        Close the shared HTTP client. Called once on application shutdown, after the workers have stopped.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def deliver_batch(self, deliveries: List[OutboxDelivery]) -> List[DeliveryResult]:
+        """
+        Deliver a batch of outbox deliveries concurrently.
+
+        Deliveries of the same event are bounded by the per-event limit, and all deliveries
+        are bounded by the global limit.
+
+        Args:
+            deliveries (List[OutboxDelivery]): The deliveries to send.
+
+        Returns:
+            results (List[DeliveryResult]): The outcome of each delivery, in the same order.
+        """
+        event_semaphores: Dict[str, asyncio.Semaphore] = {}
+        for delivery in deliveries:
+            if delivery.event not in event_semaphores:
+                event_semaphores[delivery.event] = asyncio.Semaphore(self.max_concurrent_per_event)
+        return await asyncio.gather(
+            *(self._deliver(event_semaphores[delivery.event], delivery) for delivery in deliveries)
+        )
+
+    async def deliver_coalesced(
+        self,
+        deliveries: List[OutboxDelivery],
+        body: bytes,
+        content_encoding: Optional[str] = None,
+    ) -> List[DeliveryResult]:
+        """
+        Deliver several deliveries to the same URL as a single POST request.
+
+        Args:
+            deliveries (List[OutboxDelivery]): The deliveries to send. They must all have the same URL.
+            body (bytes): The request body carrying the payloads of all deliveries.
+            content_encoding (str | None): The compression of the body, or None if uncompressed.
+
+        Returns:
+            results (List[DeliveryResult]): The outcome of each delivery, in the same order. All deliveries
+                share the outcome of the single request.
+        """
+        delivery_ids = ",".join(str(delivery.id) for delivery in deliveries)
+        result = await self._post(
+            None, deliveries[0], delivery_ids, body, content_encoding, f"with a batch of {len(deliveries)} events"
+        )
+        return [replace(result, delivery=delivery) for delivery in deliveries]
+
+    async def _deliver(self, event_semaphore: asyncio.Semaphore, delivery: OutboxDelivery) -> DeliveryResult:
+        """
+        Send a single delivery, bounded by the limit of its host, the per-event and the global limit.
+        """
+        return await self._post(
+            event_semaphore, delivery, str(delivery.id), delivery.payload, delivery.content_encoding, f"for event {delivery.event}"
+        )
+
+    async def _post(
+        self,
+        event_semaphore: Optional[asyncio.Semaphore],
+        delivery: OutboxDelivery,
+        delivery_ids: str,
+        body: bytes,
+        content_encoding: Optional[str],
+        description: str,
+    ) -> DeliveryResult:
+        """
+        Send a POST request to the URL of a delivery, bounded by its rate limit, the limit of its host, the
+        per-event limit (if given) and the global limit. The body is signed if the subscription has a signing secret,
+        and `delivery_ids` is sent in the `Webhook-Delivery-Id` header.
+        """
+        rate_limit = parse_rate_limit(delivery.rate_limit) if delivery.rate_limit else None
+        try:
+            delay = self.rate_limiter.reserve(delivery.url, rate_limit, self.host_wait_timeout)
+        except EndpointUnavailableError as e:
+            return DeliveryResult(delivery=delivery, success=False, error=str(e), retry_at=e.retry_at)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        try:
+            async with self.health.request(delivery.url, self.host_wait_timeout) as outcome:
+                async with event_semaphore or contextlib.nullcontext(), self._global_semaphore:
+                    started_at = time.monotonic()
+                    try:
+                        headers = {"Content-Type": "application/json", DELIVERY_ID_HEADER: delivery_ids}
+                        if content_encoding:
+                            headers["Content-Encoding"] = content_encoding
+                        if delivery.signing_secret:
+                            headers[SIGNATURE_HEADER] = sign_payload(body, delivery.signing_secret)
+                        response = await self.client.post(delivery.url, content=body, headers=headers)
+                    except httpx.PoolTimeout:
+                        # Every pooled connection is busy, the request was not sent and says nothing about the endpoint
+                        raise EndpointUnavailableError(
+                            delivery.url, time.time() + ENDPOINT_RETRY_SECONDS, "connection pool exhausted"
+                        )
+                    except Exception as e:
+                        duration = time.monotonic() - started_at
+                        outcome.report(False, duration)
+                        logger.warning(
+                            "Failed to trigger webhook",
+                            extra={"url": delivery.url, "event": delivery.event, "attempt": delivery.attempts, "error": repr(e)}
+                        )
+                        return DeliveryResult(delivery=delivery, success=False, error=repr(e), duration=duration)
+                    duration = time.monotonic() - started_at
+                    outcome.report(is_healthy_response(response.status_code), duration)
+        except EndpointUnavailableError as e:
+            self.rate_limiter.refund(delivery.url)
+            return DeliveryResult(delivery=delivery, success=False, error=str(e), retry_at=e.retry_at)
+
+        logger.info(
+            f"Webhook triggered {description}",
+            extra={"url": delivery.url, "event": delivery.event, "status_code": response.status_code}
+        )
+        if response.is_success:
+            return DeliveryResult(delivery=delivery, success=True, status_code=response.status_code, duration=duration)
+        retry_after = None
+        if response.status_code in THROTTLING_STATUS_CODES:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"), time.time())
+            if retry_after is not None:
+                self.rate_limiter.throttle(delivery.url, retry_after)
+        return DeliveryResult(
+            delivery=delivery,
+            success=False,
+            status_code=response.status_code,
+            error=f"HTTP error: {response.reason_phrase}",
+            duration=duration,
+            retry_after=retry_after
+        )
+
+
+# Shared engine instance, started and stopped by the application lifespan
+delivery_engine = WebhookDeliveryEngine()
@@ -0,0 +1,573 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from observability import outbox_pending
+from .fair_scheduling import parse_event_weights, round_robin, weighted_fair_shares
+
+
+
+# Path to the SQLite database used as the durable delivery outbox
+OUTBOX_FILE = Path(__file__).parent / "webhook_outbox.db"
+# How long (in seconds) a dequeued delivery stays invisible to other workers
+OUTBOX_VISIBILITY_TIMEOUT_SECONDS = 30.0
+# Maximum share of a dequeued batch that may be taken by retried deliveries
+RETRY_BATCH_SHARE = 0.25
+# How long (in seconds) a transaction waits for the write lock held by another process before it fails
+OUTBOX_BUSY_TIMEOUT_SECONDS = 30.0
+# Number of serialized payloads kept in memory, so all deliveries of an event share one bytes object
+PAYLOAD_CACHE_SIZE = 1024
+# Scheduling weight of each event type, e.g. "user_registered=4,user_send_message=1". Unlisted events have the weight 1
+DELIVERY_EVENT_WEIGHTS = parse_event_weights(os.getenv("DELIVERY_EVENT_WEIGHTS"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS payloads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_encoding TEXT,
+    body BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event TEXT NOT NULL,
+    url TEXT NOT NULL,
+    payload_id INTEGER NOT NULL REFERENCES payloads (id),
+    batch_options TEXT,
+    signing_secret TEXT,
+    rate_limit TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_available_at ON outbox (available_at, id);
+CREATE INDEX IF NOT EXISTS idx_outbox_attempts_available_at ON outbox (attempts, available_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_attempts_event ON outbox (attempts, event, available_at, id);
+CREATE INDEX IF NOT EXISTS idx_outbox_payload_id ON outbox (payload_id);
+
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY,
+    event TEXT NOT NULL,
+    url TEXT NOT NULL,
+    payload_id INTEGER NOT NULL REFERENCES payloads (id),
+    batch_options TEXT,
+    signing_secret TEXT,
+    rate_limit TEXT,
+    attempts INTEGER NOT NULL,
+    last_error TEXT NOT NULL,
+    last_status_code INTEGER,
+    failed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_dead_letters_event ON dead_letters (event);
+CREATE INDEX IF NOT EXISTS idx_dead_letters_payload_id ON dead_letters (payload_id);
+"""
+
+
+@dataclass(frozen=True)
+class OutboxDelivery:
+    """
+    A single pending delivery of a payload to one webhook URL.
+
+    Attributes:
+        id (int): The unique id of the delivery in the outbox.
+        event (str): The name of the event being delivered.
+        url (str): The webhook URL to deliver to.
+        payload (bytes): The JSON encoded payload, including the event name, compressed with `content_encoding`.
+            Deliveries of the same event and encoding share the same bytes object.
+        content_encoding (str | None): The compression of the payload ("gzip" or "zstd"), or None if uncompressed.
+        payload_id (int): The id of the stored payload.
+        attempts (int): How many times the delivery has been dequeued, including the current one.
+        batch_options (str | None): The JSON encoded batching options of the subscription, or None if the
+            payload is delivered on its own. Batched deliveries are stored uncompressed.
+        signing_secret (str | None): The secret the request body is signed with, or None if the subscription
+            has no secret.
+        rate_limit (str | None): The JSON encoded rate limit of the subscription, or None if it has none.
+        created_at (float): The UNIX timestamp at which the delivery was appended (or replayed).
+    """
+    id: int
+    event: str
+    url: str
+    payload: bytes
+    content_encoding: Optional[str]
+    payload_id: int
+    attempts: int
+    batch_options: Optional[str] = None
+    signing_secret: Optional[str] = None
+    rate_limit: Optional[str] = None
+    created_at: float = 0.0
+
+
+@dataclass(frozen=True)
+class DeadLetter:
+    """
+    A delivery that failed too many times and was moved to the dead-letter store.
+
+    Attributes:
+        id (int): The id the delivery had in the outbox.
+        event (str): The name of the event that was delivered.
+        url (str): The webhook URL the delivery was sent to.
+        payload (bytes): The JSON encoded payload, including the event name, compressed with `content_encoding`.
+        content_encoding (str | None): The compression of the payload, or None if uncompressed.
+        attempts (int): How many times the delivery was attempted.
+        last_error (str): The error of the last attempt.
+        last_status_code (int | None): The HTTP status code of the last attempt, if any.
+        failed_at (float): The UNIX timestamp at which the delivery was dead-lettered.
+    """
+    id: int
+    event: str
+    url: str
+    payload: bytes
+    content_encoding: Optional[str]
+    attempts: int
+    last_error: str
+    last_status_code: Optional[int]
+    failed_at: float
+
+
+class DeliveryOutbox:
+    """
+    A durable, SQLite backed queue of pending webhook deliveries.
+
+    Deliveries are appended when an event is triggered and stay in the outbox until a worker
+    settles them, so deliveries that are in flight when the process stops are picked up
+    again after a restart (at-least-once delivery).
+
+    The serialized payload of an event is stored once per content encoding, and every delivery
+    references it. Dequeued payloads are cached in memory, so all deliveries of an event share
+    a single bytes object.
+
+    Dequeuing leases a delivery instead of removing it: the delivery becomes invisible for
+    `visibility_timeout` seconds and is handed out again if it is not settled before the
+    lease expires. Leases are taken in a write transaction, so several worker processes can
+    share one outbox file without ever leasing the same delivery twice. Failed deliveries are deferred until their next attempt is due, or moved
+    to the dead-letter store once they have been attempted too many times.
+
+    Fresh deliveries are leased fairly rather than oldest first: every event type is a lane,
+    and a batch is divided between the lanes in proportion to their weights, then between the
+    subscribers of each lane in turn. A flood of one event therefore cannot delay the deliveries
+    of a quieter event by more than one batch.
+
+    Attributes:
+        path (Path): The path to the SQLite database file.
+        visibility_timeout (float): The default lease duration in seconds.
+        retry_batch_share (float): The maximum share of a batch that may be taken by retried deliveries
+            while fresh deliveries are waiting.
+        event_weights (Dict[str, float]): The scheduling weight of each event type. Unlisted events have the weight 1.
+    """
+
+    def __init__(
+        self,
+        path: Path = OUTBOX_FILE,
+        visibility_timeout: float = OUTBOX_VISIBILITY_TIMEOUT_SECONDS,
+        retry_batch_share: float = RETRY_BATCH_SHARE,
+        event_weights: Optional[Dict[str, float]] = None,
+    ):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.retry_batch_share = retry_batch_share
+        self.event_weights = event_weights if event_weights is not None else DELIVERY_EVENT_WEIGHTS
+        self._connection: Optional[sqlite3.Connection] = None
+        # Payload id -> (content encoding, body) of recently dequeued payloads
+        self._payload_cache: "OrderedDict[int, Tuple[Optional[str], bytes]]" = OrderedDict()
+        # The connection is shared between the event loop and worker threads
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open the database on first use and create the schema.
+        """
+        if self._connection is None:
+            connection = sqlite3.connect(
+                self.path, timeout=OUTBOX_BUSY_TIMEOUT_SECONDS, check_same_thread=False, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def append(
+        self,
+        event: str,
+        deliveries: List[Tuple[str, Optional[str], Optional[Dict[str, Any]], Optional[str], Optional[Dict[str, Any]]]],
+        payloads: Dict[Optional[str], bytes],
+    ) -> None:
+        """
+        Append one delivery per URL to the outbox in a single transaction.
+
+        Every variant of the payload is stored once, no matter how many deliveries reference it.
+
+        Args:
+            event (str): The name of the event being delivered.
+            deliveries (List[Tuple[str, str | None, Dict[str, Any] | None, str | None, Dict[str, Any] | None]]):
+                `(url, content_encoding, batch_options, signing_secret, rate_limit)` tuples of the subscribed webhooks.
+                A content encoding without a payload variant falls back to the uncompressed payload. Batched
+                deliveries always reference the uncompressed payload, they are compressed when the batch is sent.
+            payloads (Dict[str | None, bytes]): The JSON encoded payload, including the event name, for each
+                content encoding. The uncompressed payload is stored under the None key.
+        """
+        self.append_many(event, [(deliveries, payloads)])
+
+    def append_many(
+        self,
+        event: str,
+        triggers: List[Tuple[
+            List[Tuple[str, Optional[str], Optional[Dict[str, Any]], Optional[str], Optional[Dict[str, Any]]]],
+            Dict[Optional[str], bytes],
+        ]],
+    ) -> None:
+        """
+        Append the deliveries of several triggers of an event to the outbox in a single transaction.
+
+        Args:
+            event (str): The name of the event being delivered.
+            triggers (List[Tuple[List[Tuple[...]], Dict[str | None, bytes]]]): The `(deliveries, payloads)` of
+                every trigger, as taken by `append`.
+        """
+        now = time.time()
+        encoded_triggers = []
+        for deliveries, payloads in triggers:
+            rows: List[Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]] = []
+            for url, content_encoding, batch_options, signing_secret, rate_limit in deliveries:
+                if batch_options is not None or content_encoding not in payloads:
+                    content_encoding = None
+                encoded_batch_options = json.dumps(batch_options, sort_keys=True) if batch_options is not None else None
+                encoded_rate_limit = json.dumps(rate_limit, sort_keys=True) if rate_limit is not None else None
+                rows.append((url, content_encoding, encoded_batch_options, signing_secret, encoded_rate_limit))
+            if rows:
+                encoded_triggers.append((rows, payloads))
+        if not encoded_triggers:
+            return
+
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                outbox_rows = []
+                for rows, payloads in encoded_triggers:
+                    payload_ids: Dict[Optional[str], int] = {}
+                    for _, content_encoding, _, _, _ in rows:
+                        if content_encoding not in payload_ids:
+                            payload_ids[content_encoding] = connection.execute(
+                                "INSERT INTO payloads (content_encoding, body) VALUES (?, ?)",
+                                (content_encoding, payloads[content_encoding])
+                            ).lastrowid
+                    outbox_rows.extend(
+                        (event, url, payload_ids[content_encoding], batch_options, signing_secret, rate_limit, now, now)
+                        for url, content_encoding, batch_options, signing_secret, rate_limit in rows
+                    )
+                connection.executemany(
+                    "INSERT INTO outbox (event, url, payload_id, batch_options, signing_secret, rate_limit, available_at, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    outbox_rows
+                )
+
+    def dequeue_batch(self, limit: int, visibility_timeout: Optional[float] = None) -> Tuple[List[OutboxDelivery], float]:
+        """
+        Lease up to `limit` deliveries that are currently visible.
+
+        Fresh deliveries and retried deliveries are dequeued from separate lanes. Retries may
+        take at most `retry_batch_share` of the batch while fresh deliveries are waiting, so a
+        retry storm after a subscriber outage cannot starve new events. Retries are leased oldest
+        first, fresh deliveries are divided fairly between event types and subscribers (see `_select_fresh`).
+
+        Args:
+            limit (int): The maximum number of deliveries to lease.
+            visibility_timeout (float | None): The lease duration in seconds. Defaults to the outbox setting.
+
+        Returns:
+            deliveries (List[OutboxDelivery]): The leased deliveries. Empty if nothing is pending.
+            leased_until (float): The UNIX timestamp at which the leases expire.
+        """
+        now = time.time()
+        leased_until = now + (visibility_timeout if visibility_timeout is not None else self.visibility_timeout)
+        retry_limit = max(1, int(limit * self.retry_batch_share))
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                retry_rows = connection.execute(
+                    "SELECT id, event, url, payload_id, attempts, batch_options, signing_secret, rate_limit, created_at FROM outbox "
+                    "WHERE attempts > 0 AND available_at <= ? ORDER BY available_at, id LIMIT ?",
+                    (now, retry_limit)
+                ).fetchall()
+                fresh_rows = self._select_fresh(connection, now, limit - len(retry_rows))
+                if len(retry_rows) == retry_limit and len(retry_rows) + len(fresh_rows) < limit:
+                    # No fresh deliveries are waiting, so retries may fill up the rest of the batch
+                    retry_rows += connection.execute(
+                        "SELECT id, event, url, payload_id, attempts, batch_options, signing_secret, rate_limit, created_at FROM outbox "
+                        "WHERE attempts > 0 AND available_at <= ? ORDER BY available_at, id LIMIT ? OFFSET ?",
+                        (now, limit - len(retry_rows) - len(fresh_rows), retry_limit)
+                    ).fetchall()
+                rows = fresh_rows + retry_rows
+                connection.executemany(
+                    "UPDATE outbox SET available_at = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(leased_until, row[0]) for row in rows]
+                )
+            payloads = self._load_payloads(connection, {row[3] for row in rows})
+        deliveries = [
+            OutboxDelivery(
+                id=row[0],
+                event=row[1],
+                url=row[2],
+                payload=payloads[row[3]][1],
+                content_encoding=payloads[row[3]][0],
+                payload_id=row[3],
+                attempts=row[4] + 1,
+                batch_options=row[5],
+                signing_secret=row[6],
+                rate_limit=row[7],
+                created_at=row[8]
+            )
+            for row in rows
+        ]
+        return deliveries, leased_until
+
+    def _select_fresh(self, connection: sqlite3.Connection, now: float, limit: int) -> List[tuple]:
+        """
+        Select up to `limit` visible fresh deliveries, divided fairly between event types and subscribers.
+
+        Every event type with fresh deliveries is a lane. The events are found with a skip scan of the
+        `(attempts, event, ...)` index, which costs one index lookup per event however many deliveries
+        are waiting, and each lane reads at most `limit` of its oldest deliveries. The batch is divided
+        between the lanes with `weighted_fair_shares`, and each lane's share is taken in turn from the
+        subscribers among those deliveries. A subscriber's backlog is therefore interleaved with the
+        deliveries of the other subscribers that are waiting as long, but deliveries queued behind more
+        than `limit` deliveries of one subscriber still wait until that backlog has been leased.
+
+        Must be called while holding the lock.
+        """
+        if limit <= 0:
+            return []
+        lanes: Dict[str, List[tuple]] = {}
+        for (event,) in connection.execute(
+            "WITH RECURSIVE lanes (event) AS ("
+            "SELECT MIN(event) FROM outbox WHERE attempts = 0 "
+            "UNION ALL "
+            "SELECT (SELECT MIN(event) FROM outbox WHERE attempts = 0 AND event > lanes.event) FROM lanes "
+            "WHERE lanes.event IS NOT NULL"
+            ") SELECT event FROM lanes WHERE event IS NOT NULL"
+        ).fetchall():
+            rows = connection.execute(
+                "SELECT id, event, url, payload_id, attempts, batch_options, signing_secret, rate_limit, created_at FROM outbox "
+                "WHERE attempts = 0 AND event = ? AND available_at <= ? ORDER BY available_at, id LIMIT ?",
+                (event, now, limit)
+            ).fetchall()
+            if rows:
+                lanes[event] = rows
+        if len(lanes) == 1:
+            (rows,) = lanes.values()
+            return round_robin(rows, key=lambda row: row[2])
+
+        # List the lanes oldest delivery first, so ties go to the event that has waited longest
+        lanes = dict(sorted(lanes.items(), key=lambda lane: lane[1][0][0]))
+        shares = weighted_fair_shares({event: len(rows) for event, rows in lanes.items()}, self.event_weights, limit)
+        selected: List[tuple] = []
+        for event, rows in lanes.items():
+            selected.extend(round_robin(rows, key=lambda row: row[2])[:shares[event]])
+        return selected
+
+    def _load_payloads(self, connection: sqlite3.Connection, payload_ids: set) -> Dict[int, Tuple[Optional[str], bytes]]:
+        """
+        Return the content encoding and body of each payload, reading only the ones that are not cached.
+
+        Must be called while holding the lock.
+        """
+        payloads: Dict[int, Tuple[Optional[str], bytes]] = {}
+        missing: List[int] = []
+        for payload_id in payload_ids:
+            cached = self._payload_cache.get(payload_id)
+            if cached is None:
+                missing.append(payload_id)
+            else:
+                self._payload_cache.move_to_end(payload_id)
+                payloads[payload_id] = cached
+        if missing:
+            placeholders = ",".join("?" * len(missing))
+            for payload_id, content_encoding, body in connection.execute(
+                f"SELECT id, content_encoding, body FROM payloads WHERE id IN ({placeholders})",
+                missing
+            ):
+                payloads[payload_id] = self._payload_cache[payload_id] = (content_encoding, bytes(body))
+            while len(self._payload_cache) > PAYLOAD_CACHE_SIZE:
+                self._payload_cache.popitem(last=False)
+        return payloads
+
+    def settle(
+        self,
+        delivered: List[OutboxDelivery],
+        retries: List[Tuple[OutboxDelivery, float]],
+        dead_letters: List[Tuple[OutboxDelivery, str, Optional[int]]],
+        unsent: Optional[List[Tuple[OutboxDelivery, float]]] = None,
+    ) -> None:
+        """
+        Record the outcome of a batch of deliveries in a single transaction.
+
+        Payloads that are no longer referenced by any delivery or dead letter are removed.
+
+        Args:
+            delivered (List[OutboxDelivery]): The deliveries that were delivered. They are removed from the outbox.
+            retries (List[Tuple[OutboxDelivery, float]]): `(delivery, available_at)` pairs of failed deliveries that
+                should be attempted again once `available_at` (a UNIX timestamp) has been reached.
+            dead_letters (List[Tuple[OutboxDelivery, str, int | None]]): `(delivery, error, status_code)` triples of
+                failed deliveries that are moved to the dead-letter store.
+            unsent (List[Tuple[OutboxDelivery, float]] | None): `(delivery, available_at)` pairs of deliveries that
+                were not sent. They are deferred like retries, but the attempt is not counted.
+        """
+        unsent = unsent or []
+        if not (delivered or retries or dead_letters or unsent):
+            return
+        now = time.time()
+        removed = delivered + [delivery for delivery, _, _ in dead_letters]
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.executemany(
+                    "UPDATE outbox SET available_at = ? WHERE id = ?",
+                    [(available_at, delivery.id) for delivery, available_at in retries]
+                )
+                connection.executemany(
+                    "UPDATE outbox SET available_at = ?, attempts = attempts - 1 WHERE id = ?",
+                    [(available_at, delivery.id) for delivery, available_at in unsent]
+                )
+                connection.executemany(
+                    "INSERT OR REPLACE INTO dead_letters "
+                    "(id, event, url, payload_id, batch_options, signing_secret, rate_limit, attempts, last_error, last_status_code, failed_at) "
+                    "SELECT id, event, url, payload_id, batch_options, signing_secret, rate_limit, ?, ?, ?, ? FROM outbox WHERE id = ?",
+                    [
+                        (delivery.attempts, error, status_code, now, delivery.id)
+                        for delivery, error, status_code in dead_letters
+                    ]
+                )
+                connection.executemany(
+                    "DELETE FROM outbox WHERE id = ?",
+                    [(delivery.id,) for delivery in removed]
+                )
+                self._remove_unreferenced_payloads(connection, {delivery.payload_id for delivery in removed})
+
+    @staticmethod
+    def _remove_unreferenced_payloads(connection: sqlite3.Connection, payload_ids: set) -> None:
+        """
+        Remove the given payloads if no delivery or dead letter references them anymore.
+        """
+        connection.executemany(
+            "DELETE FROM payloads WHERE id = ? "
+            "AND NOT EXISTS (SELECT 1 FROM outbox WHERE payload_id = payloads.id) "
+            "AND NOT EXISTS (SELECT 1 FROM dead_letters WHERE payload_id = payloads.id)",
+            [(payload_id,) for payload_id in payload_ids]
+        )
+
+    def deferred_due_times(self) -> List[float]:
+        """
+        Return the distinct times at which currently invisible deliveries become visible again.
+
+        Used on startup to schedule the deliveries that were deferred or leased before a restart.
+        """
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT DISTINCT available_at FROM outbox WHERE available_at > ?",
+                (time.time(),)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def list_dead_letters(self, event: Optional[str] = None, limit: int = 100, offset: int = 0) -> List[DeadLetter]:
+        """
+        Return dead-lettered deliveries, most recently failed first.
+
+        Args:
+            event (str | None): Only return dead letters of this event. If None, return all.
+            limit (int): The maximum number of dead letters to return.
+            offset (int): The number of dead letters to skip.
+
+        Returns:
+            dead_letters (List[DeadLetter]): The dead-lettered deliveries.
+        """
+        query = (
+            "SELECT d.id, d.event, d.url, p.body, p.content_encoding, d.attempts, d.last_error, d.last_status_code, d.failed_at "
+            "FROM dead_letters d JOIN payloads p ON p.id = d.payload_id "
+            + ("WHERE d.event = ? " if event is not None else "")
+            + "ORDER BY d.failed_at DESC, d.id DESC LIMIT ? OFFSET ?"
+        )
+        parameters = ((event,) if event is not None else ()) + (limit, offset)
+        with self._lock:
+            rows = self._connect().execute(query, parameters).fetchall()
+        return [DeadLetter(*row) for row in rows]
+
+    def replay_dead_letters(self, dead_letter_ids: Optional[List[int]] = None) -> int:
+        """
+        Move dead-lettered deliveries back into the outbox as fresh deliveries.
+
+        Args:
+            dead_letter_ids (List[int] | None): The ids of the dead letters to replay. If None, replay all of them.
+
+        Returns:
+            count (int): The number of deliveries that were moved back into the outbox.
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute("CREATE TEMP TABLE IF NOT EXISTS replay_ids (id INTEGER PRIMARY KEY)")
+                connection.execute("DELETE FROM replay_ids")
+                if dead_letter_ids is None:
+                    connection.execute("INSERT INTO replay_ids SELECT id FROM dead_letters")
+                else:
+                    connection.executemany(
+                        "INSERT OR IGNORE INTO replay_ids (id) VALUES (?)",
+                        [(dead_letter_id,) for dead_letter_id in dead_letter_ids]
+                    )
+                count = connection.execute(
+                    "INSERT INTO outbox (event, url, payload_id, batch_options, signing_secret, rate_limit, available_at, created_at) "
+                    "SELECT event, url, payload_id, batch_options, signing_secret, rate_limit, ?, ? FROM dead_letters WHERE id IN (SELECT id FROM replay_ids) ORDER BY id",
+                    (now, now)
+                ).rowcount
+                connection.execute("DELETE FROM dead_letters WHERE id IN (SELECT id FROM replay_ids)")
+        return count
+
+    def next_due_time(self) -> Optional[float]:
+        """
+        Return the earliest time at which a currently invisible delivery becomes visible again, or None if there is none.
+        """
+        with self._lock:
+            return self._connect().execute(
+                "SELECT MIN(available_at) FROM outbox WHERE available_at > ?",
+                (time.time(),)
+            ).fetchone()[0]
+
+    def data_version(self) -> int:
+        """
+        Return a number that changes whenever another connection (e.g. another worker process) commits to the outbox.
+
+        Commits made through this outbox do not change it.
+        """
+        with self._lock:
+            return self._connect().execute("PRAGMA data_version").fetchone()[0]
+
+    def pending_count(self) -> int:
+        """
+        Return the number of deliveries in the outbox, including leased ones.
+        """
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def close(self) -> None:
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            self._payload_cache.clear()
+
+
+# Shared outbox instance, appended to by trigger_webhooks and drained by the worker pool
+delivery_outbox = DeliveryOutbox()
+outbox_pending.set_function(delivery_outbox.pending_count)
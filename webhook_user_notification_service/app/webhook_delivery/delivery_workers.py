@@ -0,0 +1,228 @@
+import asyncio
+import dataclasses
+import logging
+import os
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from observability import (
+    delivery_attempts,
+    delivery_duration,
+    delivery_retries,
+    delivery_dead_letters,
+    delivery_deferrals
+    )
+
+from .delivery_batcher import DeliveryBatcher
+from .delivery_engine import DeliveryResult, WebhookDeliveryEngine, delivery_engine
+from .delivery_outbox import DeliveryOutbox, OutboxDelivery, delivery_outbox
+from .retry_scheduler import MAX_DELIVERY_ATTEMPTS, RetryScheduler, compute_backoff
+
+
+
+logger = logging.getLogger(__name__)
+
+# Number of background workers draining the outbox, per process
+DELIVERY_WORKER_COUNT = int(os.getenv("DELIVERY_WORKER_COUNT", "4"))
+# Maximum number of deliveries a worker leases from the outbox at once
+DELIVERY_BATCH_SIZE = int(os.getenv("DELIVERY_BATCH_SIZE", "50"))
+# Interval (in seconds) at which the outbox is checked for changes made by other processes
+OUTBOX_POLL_INTERVAL_SECONDS = 0.25
+# Interval (in seconds) at which the earliest deferred delivery is scheduled even if the outbox did not change,
+# so deliveries deferred by a process that has stopped are picked up
+OUTBOX_RESCAN_SECONDS = 30.0
+# Age (in seconds) after which a delivery that is deferred because its endpoint is unavailable is dead-lettered
+DELIVERY_MAX_AGE_SECONDS = float(os.getenv("DELIVERY_MAX_AGE_SECONDS", "86400"))
+
+
+class DeliveryWorkerPool:
+    """
+    A pool of background tasks that drain the delivery outbox.
+
+    Each worker leases a batch of deliveries, sends them concurrently through the delivery
+    engine and settles them: delivered ones are removed from the outbox, failed ones are
+    deferred with exponential backoff, and deliveries that failed `max_attempts` times are
+    moved to the dead-letter store. Deliveries that were not sent because their endpoint is
+    unavailable are deferred until the endpoint may be tried again, without using up an attempt,
+    until they are `max_age` seconds old; a delivery to an endpoint that stays unavailable is then
+    dead-lettered instead of being deferred forever.
+    A failed delivery whose subscriber answered with `Retry-After` is not retried before then.
+
+    Deliveries of batched subscriptions are handed to the batcher, which coalesces them into one
+    request per subscriber and settles them once the batch was sent.
+
+    Idle workers sleep until `notify` is called, either because new deliveries were appended
+    or because the retry scheduler reached the due time of a deferred delivery or an expired lease.
+
+    Several processes (e.g. uvicorn workers) can drain the same outbox file: leases are atomic,
+    so every delivery is sent by one worker at a time. A process is not told about deliveries
+    appended or deferred by another process, so the pool watches the outbox's `data_version`,
+    which changes whenever another process commits, and wakes its workers when it does.
+
+    Attributes:
+        outbox (DeliveryOutbox): The outbox to drain.
+        engine (WebhookDeliveryEngine): The engine used to send the deliveries.
+        worker_count (int): The number of workers to run.
+        batch_size (int): The maximum number of deliveries leased per batch.
+        max_attempts (int): The number of attempts after which a delivery is dead-lettered.
+        max_age (float): The age in seconds after which a delivery is dead-lettered instead of being deferred.
+        retry_scheduler (RetryScheduler): Wakes the workers when deferred deliveries become due.
+        batcher (DeliveryBatcher): Buffers and sends the deliveries of batched subscriptions.
+    """
+
+    def __init__(
+        self,
+        outbox: DeliveryOutbox,
+        engine: WebhookDeliveryEngine,
+        worker_count: int = DELIVERY_WORKER_COUNT,
+        batch_size: int = DELIVERY_BATCH_SIZE,
+        max_attempts: int = MAX_DELIVERY_ATTEMPTS,
+        max_age: float = DELIVERY_MAX_AGE_SECONDS,
+    ):
+        self.outbox = outbox
+        self.engine = engine
+        self.worker_count = worker_count
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.max_age = max_age
+        self.retry_scheduler = RetryScheduler(on_due=self.notify)
+        self.batcher = DeliveryBatcher(engine, on_sent=self._settle)
+        self._workers: List[asyncio.Task] = []
+        self._watcher: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+    async def start(self) -> None:
+        """
+        Start the retry scheduler and the workers. Called once on application startup.
+        """
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        await self.retry_scheduler.start(await asyncio.to_thread(self.outbox.deferred_due_times))
+        self._workers = [
+            asyncio.create_task(self._run_worker(), name=f"webhook-delivery-worker-{index}")
+            for index in range(self.worker_count)
+        ]
+        self._watcher = asyncio.create_task(self._watch_outbox(), name="webhook-outbox-watcher")
+
+    async def stop(self) -> None:
+        """
+        Let the workers finish their current batch and stop them. Called once on application shutdown.
+
+        Buffered batches are sent right away. Deliveries that were not leased yet stay in the outbox and
+        are delivered after the next start.
+        """
+        self._stopping = True
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+        self.notify()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self.batcher.stop()
+        await self.retry_scheduler.stop()
+
+    def notify(self) -> None:
+        """
+        Wake up idle workers because deliveries became available in the outbox.
+        """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _watch_outbox(self) -> None:
+        """
+        Wake the workers and schedule the earliest deferred delivery whenever another process changed the outbox.
+        """
+        data_version = await asyncio.to_thread(self.outbox.data_version)
+        rescan_at = time.monotonic() + OUTBOX_RESCAN_SECONDS
+        while True:
+            await asyncio.sleep(OUTBOX_POLL_INTERVAL_SECONDS)
+            current_data_version = await asyncio.to_thread(self.outbox.data_version)
+            if current_data_version == data_version and time.monotonic() < rescan_at:
+                continue
+            data_version = current_data_version
+            rescan_at = time.monotonic() + OUTBOX_RESCAN_SECONDS
+            self.notify()
+            next_due_time = await asyncio.to_thread(self.outbox.next_due_time)
+            if next_due_time is not None:
+                self.retry_scheduler.schedule(next_due_time)
+
+    async def _run_worker(self) -> None:
+        """
+        Lease, deliver and settle batches until the pool is stopped.
+        """
+        while not self._stopping:
+            deliveries, leased_until = await asyncio.to_thread(self.outbox.dequeue_batch, self.batch_size)
+            if not deliveries:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            # Make sure the batch is picked up again if it is not settled before the lease expires
+            self.retry_scheduler.schedule(leased_until)
+
+            single_deliveries: List[OutboxDelivery] = []
+            for delivery in deliveries:
+                if delivery.batch_options is not None:
+                    self.batcher.add(delivery)
+                else:
+                    single_deliveries.append(delivery)
+            if single_deliveries:
+                results = await self.engine.deliver_batch(single_deliveries)
+                await self._settle(results)
+
+    async def _settle(self, results: List[DeliveryResult]) -> None:
+        """
+        Remove delivered deliveries, defer failed and unsent ones and dead-letter the ones that ran out of attempts
+        or that are too old to be deferred again.
+        """
+        now = time.time()
+        delivered: List[OutboxDelivery] = []
+        retries: List[Tuple[OutboxDelivery, float]] = []
+        dead_letters: List[Tuple[OutboxDelivery, str, Optional[int]]] = []
+        unsent: List[Tuple[OutboxDelivery, float]] = []
+
+        for result in results:
+            delivery = result.delivery
+            if result.duration is not None:
+                delivery_attempts.labels(delivery.event, str(result.status_code or "error")).inc()
+                delivery_duration.labels(delivery.event, urlsplit(delivery.url).netloc).observe(result.duration)
+
+            if result.success:
+                delivered.append(delivery)
+            elif result.retry_at is not None and now - delivery.created_at < self.max_age:
+                delivery_deferrals.labels(delivery.event).inc()
+                unsent.append((delivery, result.retry_at))
+            elif result.retry_at is not None:
+                delivery_dead_letters.labels(delivery.event).inc()
+                logger.warning(
+                    "Webhook delivery moved to dead letters, its endpoint was unavailable for too long",
+                    extra={"url": delivery.url, "event": delivery.event, "attempts": delivery.attempts - 1}
+                )
+                # The delivery was not sent, so the current lease is not an attempt
+                delivery = dataclasses.replace(delivery, attempts=delivery.attempts - 1)
+                dead_letters.append((delivery, result.error or "Endpoint unavailable", None))
+            elif delivery.attempts >= self.max_attempts:
+                delivery_dead_letters.labels(delivery.event).inc()
+                logger.warning(
+                    "Webhook delivery moved to dead letters",
+                    extra={"url": delivery.url, "event": delivery.event, "attempts": delivery.attempts}
+                )
+                dead_letters.append((delivery, result.error or "Unknown error", result.status_code))
+            else:
+                delivery_retries.labels(delivery.event).inc()
+                retry_at = now + compute_backoff(delivery.attempts)
+                if result.retry_after is not None:
+                    # Never call the subscriber again before the time it asked for
+                    retry_at = max(retry_at, result.retry_after)
+                retries.append((delivery, retry_at))
+
+        await asyncio.to_thread(self.outbox.settle, delivered, retries, dead_letters, unsent)
+        for _, available_at in retries + unsent:
+            self.retry_scheduler.schedule(available_at)
+
+
+# Shared worker pool instance, started and stopped by the application lifespan
+delivery_workers = DeliveryWorkerPool(delivery_outbox, delivery_engine)
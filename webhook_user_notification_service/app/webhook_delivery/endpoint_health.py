@@ -0,0 +1,419 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from observability import open_circuits
+from .http_client import HTTP_MAX_CONNECTIONS_PER_HOST
+
+
+
+logger = logging.getLogger(__name__)
+
+# Number of most recent requests per URL kept in the rolling health window
+CIRCUIT_WINDOW_SIZE = 20
+# Minimum number of requests in the window before the circuit breaker may open
+CIRCUIT_MIN_REQUESTS = 5
+# Share of failed requests in the window at which the circuit breaker opens
+CIRCUIT_FAILURE_RATE_THRESHOLD = 0.5
+# How long (in seconds) an open circuit rejects requests before a single probe request is let through
+CIRCUIT_OPEN_SECONDS = 30.0
+# How long (in seconds) requests held back while an endpoint is probed or saturated wait before they try again
+ENDPOINT_RETRY_SECONDS = 5.0
+# Maximum number of URLs (and hosts) whose health is tracked, the least recently used ones are forgotten
+MAX_TRACKED_ENDPOINTS = 10_000
+
+# Concurrency limit per host before any request to it has completed
+ADAPTIVE_INITIAL_CONCURRENCY = 4
+# Lower bound of the concurrency limit per host
+ADAPTIVE_MIN_CONCURRENCY = 1
+# Responses slower than this (in seconds) count as congestion and shrink the concurrency limit
+ADAPTIVE_LATENCY_TARGET_SECONDS = 1.0
+# Factor the concurrency limit is multiplied with on congestion
+ADAPTIVE_DECREASE_FACTOR = 0.5
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Track the health of a single webhook URL and stop sending requests to it while it is down.
+
+    The breaker keeps the outcome and latency of the last `window_size` requests. While it is
+    closed, every request is allowed. Once the window holds at least `min_requests` requests
+    and the share of failures reaches `failure_rate_threshold`, the breaker opens and rejects
+    all requests for `open_seconds`, so a dead endpoint costs no connect timeouts. After that,
+    it is half-open: a single probe request is let through, and its outcome closes the breaker
+    again or keeps it open for another `open_seconds`.
+
+    Attributes:
+        url (str): The webhook URL.
+        state (str): "closed", "open" or "half_open". An open breaker only becomes half-open on the
+            next `allow`; see `effective_state` for the state as of a given time.
+        opened_at (float | None): The time the breaker last opened, or None if it never opened.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        window_size: int = CIRCUIT_WINDOW_SIZE,
+        min_requests: int = CIRCUIT_MIN_REQUESTS,
+        failure_rate_threshold: float = CIRCUIT_FAILURE_RATE_THRESHOLD,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+    ):
+        self.url = url
+        self.min_requests = min_requests
+        self.failure_rate_threshold = failure_rate_threshold
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        # (success, latency in seconds) of the most recent requests
+        self._window: Deque[Tuple[bool, float]] = deque(maxlen=window_size)
+        self._failures = 0
+        self._probe_in_flight = False
+
+    @property
+    def failure_rate(self) -> float:
+        """
+        The share of failed requests in the window.
+        """
+        return self._failures / len(self._window) if self._window else 0.0
+
+    @property
+    def request_count(self) -> int:
+        """
+        The number of requests in the window.
+        """
+        return len(self._window)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        """
+        Return a latency percentile (between 0 and 1) of the requests in the window, in seconds.
+        """
+        if not self._window:
+            return None
+        latencies = sorted(latency for _, latency in self._window)
+        return latencies[min(len(latencies) - 1, int(percentile * len(latencies)))]
+
+    def effective_state(self, now: float) -> str:
+        """
+        Return the state of the breaker at the given time, i.e. half-open once an open breaker's `open_seconds` have passed.
+        """
+        if self.state == OPEN and now >= self.opened_at + self.open_seconds:
+            return HALF_OPEN
+        return self.state
+
+    def allow(self, now: float) -> Optional[float]:
+        """
+        Decide whether a request may be sent now.
+
+        Returns:
+            retry_at (float | None): None if the request may be sent, otherwise the time at which
+                it should be attempted again.
+        """
+        if self.state == OPEN:
+            reopens_at = self.opened_at + self.open_seconds
+            if now < reopens_at:
+                return reopens_at
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                return now + ENDPOINT_RETRY_SECONDS
+            self._probe_in_flight = True
+        return None
+
+    def cancel(self) -> None:
+        """
+        Forget a request that was allowed by `allow` but never sent.
+        """
+        self._probe_in_flight = False
+
+    def record(self, success: bool, latency: float, now: float) -> None:
+        """
+        Record the outcome of a request that was allowed by `allow`.
+        """
+        if len(self._window) == self._window.maxlen and not self._window[0][0]:
+            self._failures -= 1
+        self._window.append((success, latency))
+        if not success:
+            self._failures += 1
+
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+            if success:
+                self.state = CLOSED
+                # Start over, so the failures from before the outage do not trip the breaker again
+                self._window.clear()
+                self._failures = 0
+            else:
+                self._open(now)
+        elif (
+            self.state == CLOSED
+            and len(self._window) >= self.min_requests
+            and self.failure_rate >= self.failure_rate_threshold
+        ):
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        logger.warning("Circuit opened for webhook", extra={"url": self.url, "failure_rate": self.failure_rate})
+
+
+class AdaptiveConcurrencyLimit:
+    """
+    Limit the number of concurrent requests to a host with additive increase, multiplicative decrease (AIMD).
+
+    Every fast, successful response raises the limit by `1 / limit`, so the limit grows by about one
+    per round trip of a full window. A failure or a response slower than `latency_target` multiplies
+    the limit by `decrease_factor`. Only requests that started after the last decrease can decrease
+    the limit again, so one burst of slow responses shrinks it once rather than once per request.
+
+    Attributes:
+        limit (float): The current concurrency limit. Requests are admitted while fewer than
+            `int(limit)` are in flight.
+        in_flight (int): The number of requests currently in flight.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = ADAPTIVE_INITIAL_CONCURRENCY,
+        min_limit: int = ADAPTIVE_MIN_CONCURRENCY,
+        max_limit: int = HTTP_MAX_CONNECTIONS_PER_HOST,
+        latency_target: float = ADAPTIVE_LATENCY_TARGET_SECONDS,
+        decrease_factor: float = ADAPTIVE_DECREASE_FACTOR,
+    ):
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        """
+        Wait until the request can be admitted under the current limit.
+
+        Returns:
+            started_at (float): The time the request was admitted, to be passed to `release`.
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        return time.monotonic()
+
+    async def release(self, started_at: float, success: Optional[bool], latency: float) -> None:
+        """
+        Release the slot of a finished request and adapt the limit to its outcome.
+
+        If `success` is None, the request did not complete (e.g. it was cancelled) and the limit is kept.
+        """
+        async with self._condition:
+            self.in_flight -= 1
+            if success and latency <= self.latency_target:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif success is not None and started_at >= self._last_decrease:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+                self._last_decrease = time.monotonic()
+            self._condition.notify_all()
+
+
+@dataclass(frozen=True)
+class EndpointHealth:
+    """
+    A snapshot of the health of a webhook URL.
+
+    Attributes:
+        url (str): The webhook URL.
+        state (str): The circuit breaker state, "closed", "open" or "half_open".
+        request_count (int): The number of requests in the rolling window.
+        failure_rate (float): The share of failed requests in the rolling window.
+        latency_p50 (float | None): The median latency in seconds of the requests in the window.
+        latency_p95 (float | None): The 95th percentile latency in seconds of the requests in the window.
+        opened_at (float | None): The time the circuit breaker last opened, or None if it never opened.
+        host_concurrency_limit (int): The current concurrency limit of the URL's host.
+        host_in_flight (int): The number of requests currently in flight to the URL's host.
+    """
+    url: str
+    state: str
+    request_count: int
+    failure_rate: float
+    latency_p50: Optional[float]
+    latency_p95: Optional[float]
+    opened_at: Optional[float]
+    host_concurrency_limit: int
+    host_in_flight: int
+
+
+def is_healthy_response(status_code: int) -> bool:
+    """
+    Return whether a response status code shows that the endpoint is up and not overloaded.
+
+    Client errors other than 429 count as healthy: the endpoint is reachable, it just rejected the request.
+    """
+    return status_code < 500 and status_code != 429
+
+
+class EndpointUnavailableError(Exception):
+    """
+    Raised instead of sending a request to an endpoint whose circuit is open, or whose host
+    stayed saturated for too long.
+
+    Attributes:
+        url (str): The webhook URL.
+        retry_at (float): The UNIX timestamp at which the request should be attempted again.
+    """
+
+    def __init__(self, url: str, retry_at: float, reason: str):
+        self.url = url
+        self.retry_at = retry_at
+        self.reason = reason
+        super().__init__(f"Webhook URL '{url}' is unavailable: {reason}")
+
+
+class RequestOutcome:
+    """
+    The outcome of a request, reported by the caller of `EndpointHealthTracker.request`.
+
+    Attributes:
+        success (bool | None): False if no response was received or the subscriber responded with a
+            server error (5xx) or 429, i.e. the endpoint is down or overloaded. None until reported.
+        latency (float): The time in seconds until the response was received.
+    """
+
+    def __init__(self):
+        self.success: Optional[bool] = None
+        self.latency = 0.0
+
+    def report(self, success: bool, latency: float) -> None:
+        self.success = success
+        self.latency = latency
+
+
+class EndpointHealthTracker:
+    """
+    Keep a circuit breaker per webhook URL and an adaptive concurrency limit per host.
+
+    The state is kept in memory and shared by the delivery engine and `/ping`, so both skip
+    URLs whose circuit is open. It starts out empty (all circuits closed) after a restart.
+    At most `max_endpoints` URLs and hosts are tracked: the least recently requested ones are
+    forgotten, so URLs of removed subscriptions do not accumulate.
+
+    Attributes:
+        max_endpoints (int): The maximum number of tracked URLs, and of tracked hosts.
+    """
+
+    def __init__(self, max_endpoints: int = MAX_TRACKED_ENDPOINTS):
+        self.max_endpoints = max_endpoints
+        # URL -> circuit breaker, least recently requested first
+        self._breakers: "OrderedDict[str, CircuitBreaker]" = OrderedDict()
+        # Host -> concurrency limit, least recently requested first
+        self._limits: "OrderedDict[str, AdaptiveConcurrencyLimit]" = OrderedDict()
+
+    def _breaker(self, url: str) -> CircuitBreaker:
+        breaker = self._breakers.get(url)
+        if breaker is None:
+            breaker = self._breakers[url] = CircuitBreaker(url)
+            self._evict(self._breakers)
+        else:
+            self._breakers.move_to_end(url)
+        return breaker
+
+    def _limit(self, url: str) -> AdaptiveConcurrencyLimit:
+        host = urlsplit(url).netloc
+        limit = self._limits.get(host)
+        if limit is None:
+            limit = self._limits[host] = AdaptiveConcurrencyLimit()
+            self._evict(self._limits)
+        else:
+            self._limits.move_to_end(host)
+        return limit
+
+    def _evict(self, tracked: OrderedDict) -> None:
+        """
+        Forget the least recently requested entries beyond `max_endpoints`.
+
+        A request still in flight keeps its breaker and limit, it just reports to an entry that is no longer tracked.
+        """
+        while len(tracked) > self.max_endpoints:
+            tracked.popitem(last=False)
+
+    @asynccontextmanager
+    async def request(self, url: str, wait_timeout: Optional[float] = None) -> AsyncIterator[RequestOutcome]:
+        """
+        Guard a request to a webhook URL with its circuit breaker and the concurrency limit of its host.
+
+        The block runs while holding one of the host's slots and must report the outcome of its
+        request on the yielded `RequestOutcome`, which updates both the breaker and the limit.
+
+        Args:
+            url (str): The webhook URL.
+            wait_timeout (float | None): How long in seconds to wait for a slot of the host. Waits
+                forever if None.
+
+        Raises:
+            EndpointUnavailableError: If the circuit of the URL is open, or no slot of the host became
+                free within `wait_timeout`. The request must not be sent.
+        """
+        breaker = self._breaker(url)
+        limit = self._limit(url)
+        retry_at = breaker.allow(time.time())
+        if retry_at is not None:
+            raise EndpointUnavailableError(url, retry_at, f"circuit {breaker.state}")
+        try:
+            started_at = await asyncio.wait_for(limit.acquire(), wait_timeout)
+        except asyncio.TimeoutError:
+            breaker.cancel()
+            raise EndpointUnavailableError(url, time.time() + ENDPOINT_RETRY_SECONDS, "host saturated")
+
+        outcome = RequestOutcome()
+        try:
+            yield outcome
+        finally:
+            if outcome.success is None:
+                breaker.cancel()
+            else:
+                breaker.record(outcome.success, outcome.latency, time.time())
+            await limit.release(started_at, outcome.success, outcome.latency)
+
+    def open_count(self) -> int:
+        """
+        Return the number of URLs whose circuit breaker is currently open, not counting the ones due for a probe.
+        """
+        now = time.time()
+        return sum(1 for breaker in list(self._breakers.values()) if breaker.effective_state(now) == OPEN)
+
+    def snapshot(self) -> List[EndpointHealth]:
+        """
+        Return the health of every tracked URL a request was sent to since startup.
+        """
+        now = time.time()
+        health = []
+        for url, breaker in list(self._breakers.items()):
+            # Reading the health does not count as using the host
+            limit = self._limits.get(urlsplit(url).netloc) or AdaptiveConcurrencyLimit()
+            health.append(EndpointHealth(
+                url=url,
+                state=breaker.effective_state(now),
+                request_count=breaker.request_count,
+                failure_rate=breaker.failure_rate,
+                latency_p50=breaker.latency_percentile(0.5),
+                latency_p95=breaker.latency_percentile(0.95),
+                opened_at=breaker.opened_at,
+                host_concurrency_limit=int(limit.limit),
+                host_in_flight=limit.in_flight
+            ))
+        return health
+
+
+# Shared tracker instance, used by the delivery engine and the ping endpoint
+endpoint_health = EndpointHealthTracker()
+open_circuits.set_function(endpoint_health.open_count)
@@ -0,0 +1,84 @@
+import heapq
+from typing import Callable, Dict, Hashable, List, Optional, Sequence, TypeVar
+
+
+
+# Weight of an event type that is not listed in the configured event weights
+DEFAULT_EVENT_WEIGHT = 1.0
+
+T = TypeVar("T")
+
+
+def parse_event_weights(value: Optional[str]) -> Dict[str, float]:
+    """
+    Parse the scheduling weights of event types.
+
+    Args:
+        value (str | None): Comma separated `event=weight` pairs, e.g. `user_registered=4,user_send_message=1`.
+
+    Returns:
+        weights (Dict[str, float]): Event name -> its weight.
+
+    Raises:
+        ValueError: If a pair is malformed or a weight is not positive.
+    """
+    weights: Dict[str, float] = {}
+    for pair in (value or "").split(","):
+        if not pair.strip():
+            continue
+        event, separator, weight = pair.partition("=")
+        if not separator or float(weight) <= 0:
+            raise ValueError(f"Invalid event weight '{pair.strip()}', expected 'event=weight' with a positive weight.")
+        weights[event.strip()] = float(weight)
+    return weights
+
+
+def weighted_fair_shares(backlogs: Dict[Hashable, int], weights: Dict[Hashable, float], capacity: int) -> Dict[Hashable, int]:
+    """
+    Divide a capacity between lanes in proportion to their weights, like weighted fair queuing.
+
+    Every unit of capacity goes to the lane with the earliest virtual finish time, i.e. the
+    smallest `(share + 1) / weight`. A lane never gets more than its backlog, and the capacity
+    it leaves unused goes to the other lanes, so no capacity is wasted while any lane has work.
+    A lane with little work therefore gets all of it, however much work the other lanes have.
+
+    Args:
+        backlogs (Dict[Hashable, int]): Lane -> the number of items waiting in it. Ties are broken in the order
+            of the dict, so lanes should be listed oldest work first.
+        weights (Dict[Hashable, float]): Lane -> its weight. Lanes that are missing have the weight 1.
+        capacity (int): The number of items to divide.
+
+    Returns:
+        shares (Dict[Hashable, int]): Lane -> the number of items to take from it.
+    """
+    shares = {lane: 0 for lane in backlogs}
+    heap = [
+        (1 / weights.get(lane, DEFAULT_EVENT_WEIGHT), index, lane)
+        for index, (lane, backlog) in enumerate(backlogs.items()) if backlog > 0
+    ]
+    heapq.heapify(heap)
+    while capacity > 0 and heap:
+        _, index, lane = heapq.heappop(heap)
+        shares[lane] += 1
+        capacity -= 1
+        if shares[lane] < backlogs[lane]:
+            heapq.heappush(heap, ((shares[lane] + 1) / weights.get(lane, DEFAULT_EVENT_WEIGHT), index, lane))
+    return shares
+
+
+def round_robin(items: Sequence[T], key: Callable[[T], Hashable]) -> List[T]:
+    """
+    Reorder items so that consecutive items take turns between their keys, keeping the order of the items of each key.
+
+    Taking the first `n` items of the result gives every key an equal share of them, e.g. every subscriber
+    an equal share of the deliveries of an event.
+    """
+    rounds: Dict[Hashable, int] = {}
+    ranked = []
+    for position, item in enumerate(items):
+        item_key = key(item)
+        rank = rounds.get(item_key, 0)
+        rounds[item_key] = rank + 1
+        ranked.append((rank, position, item))
+    ranked.sort(key=lambda entry: entry[:2])
+    return [item for _, _, item in ranked]
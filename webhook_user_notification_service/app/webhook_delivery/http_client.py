@@ -0,0 +1,55 @@
+import os
+import httpx
+
+
+
+# Maximum number of open connections across all subscriber hosts
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+# Maximum number of idle connections kept alive for reuse across all subscriber hosts
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "100"))
+# How long (in seconds) an idle connection is kept alive before it is closed
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", "60"))
+# How long (in seconds) a request waits for a connection from the pool before it fails with `httpx.PoolTimeout`
+HTTP_POOL_TIMEOUT_SECONDS = float(os.getenv("HTTP_POOL_TIMEOUT_SECONDS", "2"))
+# Upper bound on the adaptive number of concurrent requests to a single subscriber host
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+# User-Agent header sent with every outbound request
+HTTP_USER_AGENT = "webhook-user-notification-service/0.1.0"
+
+
+def create_http_client(
+    timeout: httpx.Timeout,
+    max_connections: int = HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    pool_timeout: float = HTTP_POOL_TIMEOUT_SECONDS,
+) -> httpx.AsyncClient:
+    """
+    Create the shared HTTP client used for all outbound webhook requests.
+
+    Connections are pooled per subscriber host and kept alive between requests, so repeated
+    deliveries to the same subscriber reuse a warm connection instead of paying for a new
+    TCP (and TLS) handshake every time. The concurrency per host is bounded by the adaptive
+    limit of `EndpointHealthTracker`; the pool only bounds the total, and waiting for one of
+    its connections is covered by the pool timeout.
+
+    Args:
+        timeout (httpx.Timeout): The connect, read and write timeouts of every request.
+        max_connections (int): The maximum number of open connections across all hosts.
+        max_keepalive_connections (int): The maximum number of idle connections kept alive across all hosts.
+        keepalive_expiry (float): How long in seconds an idle connection is kept alive.
+        pool_timeout (float): How long in seconds a request waits for a connection from the pool.
+
+    Returns:
+        client (httpx.AsyncClient): The HTTP client. It must be closed with `aclose()` on shutdown.
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry
+    )
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(connect=timeout.connect, read=timeout.read, write=timeout.write, pool=pool_timeout),
+        limits=limits,
+        headers={"User-Agent": HTTP_USER_AGENT}
+    )
@@ -0,0 +1,147 @@
+import gzip
+import json
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Union
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, the standard library encoder is used without it
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # zstd compression is optional
+    zstandard = None
+
+
+
+# Compression level used for gzip encoded payloads (1 is fastest, 9 is smallest)
+GZIP_COMPRESSION_LEVEL = 6
+# Compression level used for zstd encoded payloads
+ZSTD_COMPRESSION_LEVEL = 3
+
+
+def encode_event_payload(
+    event: str,
+    data: Union[BaseModel, Dict[str, Any]],
+    delivery_id: Optional[str] = None,
+    timestamp: Optional[str] = None,
+) -> bytes:
+    """
+    Serialize the payload of an event to JSON bytes, once for all of its subscribers.
+
+    Pydantic models are serialized directly with `model_dump_json()` instead of being dumped to
+    a dictionary first, and the event envelope is written around the serialized data. Dictionaries
+    are serialized with orjson when it is installed.
+
+    The envelope carries a unique delivery ID and the time the event was triggered. The payload
+    is stored in the outbox as is, so every retry of a delivery carries the same ID and a receiver
+    can use it to drop the duplicates. The body is shared by all subscribers, so the ID identifies
+    the triggered event; the delivery to each subscriber is identified by the `Webhook-Delivery-Id` header.
+
+    Args:
+        event (str): The name of the event.
+        data (BaseModel | Dict[str, Any]): The data of the event.
+        delivery_id (str | None): The delivery ID. If None, a random UUID is generated.
+        timestamp (str | None): The ISO 8601 time the event was triggered. If None, the current time is used.
+
+    Returns:
+        body (bytes): The JSON encoded `{"delivery_id": ..., "timestamp": ..., "event": ..., "data": ...}` payload.
+    """
+    if isinstance(data, BaseModel):
+        encoded_data = data.model_dump_json().encode()
+    else:
+        encoded_data = _dumps(data)
+    envelope = {
+        "delivery_id": delivery_id or uuid.uuid4().hex,
+        "timestamp": timestamp or datetime.now(timezone.utc).isoformat(),
+        "event": event,
+    }
+    return _dumps(envelope)[:-1] + b',"data":' + encoded_data + b"}"
+
+
+def _dumps(value: Dict[str, Any]) -> bytes:
+    """
+    Serialize JSON compatible values to compact JSON bytes.
+    """
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+class UnsupportedContentEncodingError(ValueError):
+    """
+    Raised when a webhook asks for a content encoding whose codec is not installed in this process.
+    """
+
+    def __init__(self, content_encoding: str):
+        super().__init__(f"The '{content_encoding}' content encoding is not available, install the 'zstd' extra to use it.")
+
+
+def is_supported_encoding(content_encoding: str) -> bool:
+    """
+    Return whether payloads can be compressed with the given content encoding in this process.
+    """
+    return content_encoding == "gzip" or (content_encoding == "zstd" and zstandard is not None)
+
+
+def compress_payload(body: bytes, content_encoding: str) -> bytes:
+    """
+    Compress a serialized payload.
+
+    Args:
+        body (bytes): The JSON encoded payload.
+        content_encoding (str): The content encoding, either "gzip" or "zstd".
+
+    Returns:
+        compressed (bytes): The compressed payload.
+
+    Raises:
+        ValueError: If the content encoding is not supported.
+    """
+    if content_encoding == "gzip":
+        # A fixed mtime keeps the output identical for identical payloads
+        return gzip.compress(body, compresslevel=GZIP_COMPRESSION_LEVEL, mtime=0)
+    if content_encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_COMPRESSION_LEVEL).compress(body)
+    raise ValueError(f"Unsupported content encoding '{content_encoding}'.")
+
+
+def decompress_payload(body: bytes, content_encoding: Optional[str]) -> bytes:
+    """
+    Reverse `compress_payload`. Payloads without a content encoding are returned unchanged.
+
+    Raises:
+        ValueError: If the content encoding is not supported.
+    """
+    if not content_encoding:
+        return body
+    if content_encoding == "gzip":
+        return gzip.decompress(body)
+    if content_encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompress(body)
+    raise ValueError(f"Unsupported content encoding '{content_encoding}'.")
+
+
+def encode_payload_variants(body: bytes, content_encodings: Iterable[Optional[str]]) -> Dict[Optional[str], bytes]:
+    """
+    Compute each requested encoding of a serialized payload exactly once.
+
+    Encodings that are not supported in this process fall back to the uncompressed payload.
+
+    Args:
+        body (bytes): The JSON encoded payload.
+        content_encodings (Iterable[str | None]): The content encodings requested by the subscribers.
+            None stands for the uncompressed payload.
+
+    Returns:
+        variants (Dict[str | None, bytes]): The payload for each supported content encoding, and the
+            uncompressed payload under the None key.
+    """
+    variants: Dict[Optional[str], bytes] = {None: body}
+    for content_encoding in content_encodings:
+        if content_encoding and content_encoding not in variants and is_supported_encoding(content_encoding):
+            variants[content_encoding] = compress_payload(body, content_encoding)
+    return variants
@@ -0,0 +1,191 @@
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from functools import lru_cache
+from typing import Dict, Optional
+
+from .endpoint_health import EndpointUnavailableError
+
+
+
+# Upper bound (in seconds) on a `Retry-After` delay requested by a subscriber
+RETRY_AFTER_MAX_SECONDS = 3600.0
+# Number of processes delivering webhooks (see WEBHOOK_WORKERS in main.py). Each enforces its share of a rate limit
+RATE_LIMIT_PROCESS_COUNT = max(1, int(os.getenv("WEBHOOK_WORKERS", "1")))
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """
+    The rate limit of a subscription.
+
+    Attributes:
+        requests_per_second (float): The sustained number of requests per second sent to the webhook URL.
+        burst (int): The number of requests that may be sent at once after the URL was idle.
+    """
+    requests_per_second: float
+    burst: int = 1
+
+
+@lru_cache(maxsize=1024)
+def parse_rate_limit(encoded: str) -> RateLimit:
+    """
+    Parse the JSON encoded rate limit stored with an outbox delivery.
+    """
+    return RateLimit(**json.loads(encoded))
+
+
+def parse_retry_after(value: Optional[str], now: float) -> Optional[float]:
+    """
+    Parse the `Retry-After` header of a response.
+
+    Args:
+        value (str | None): The header value, either a number of seconds or an HTTP date.
+        now (float): The current UNIX timestamp.
+
+    Returns:
+        retry_at (float | None): The UNIX timestamp before which the subscriber asked not to be called again,
+            capped at `RETRY_AFTER_MAX_SECONDS` from now, or None if the header is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - now
+        except (TypeError, ValueError):
+            return None
+    return now + min(max(delay, 0.0), RETRY_AFTER_MAX_SECONDS)
+
+
+class TokenBucket:
+    """
+    A token bucket holding up to `burst` tokens, refilled at `rate` tokens per second.
+
+    A request reserves a token; the bucket may go into debt, in which case the request has to
+    wait until its token has been refilled. Requests are thereby spaced evenly once the burst
+    is used up.
+
+    Attributes:
+        rate (float): The number of tokens added per second.
+        burst (float): The maximum number of tokens.
+        tokens (float): The number of tokens at `updated_at`. Negative while tokens are reserved ahead.
+        updated_at (float): The time of the last refill.
+    """
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def reserve(self, now: float, max_wait: float) -> Optional[float]:
+        """
+        Reserve a token if it becomes available within `max_wait` seconds.
+
+        Returns:
+            delay (float | None): The time in seconds to wait before the request may be sent, or None
+                if no token is available in time. Nothing is reserved then.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        delay = (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+        if delay > max_wait:
+            return None
+        self.tokens -= 1
+        return delay
+
+    def refund(self) -> None:
+        """
+        Give back a reserved token whose request was not sent.
+        """
+        self.tokens = min(self.burst, self.tokens + 1)
+
+
+class SubscriberRateLimiter:
+    """
+    Keep a token bucket per rate limited webhook URL, and the time until which each URL asked not
+    to be called (through `Retry-After` on a 429 or 503 response).
+
+    Deliveries that would have to wait longer than the caller allows are not sent: an
+    `EndpointUnavailableError` tells the worker to defer them until a token is available,
+    without using up an attempt. The deferred deliveries are spread over the time it takes to
+    refill the burst, so they do not all come back at the same moment.
+
+    The buckets are kept in memory. With several worker processes, each process enforces its
+    share of the limit, so the subscriber sees the configured rate in total.
+
+    Attributes:
+        process_count (int): The number of processes sharing every rate limit.
+    """
+
+    def __init__(self, process_count: int = RATE_LIMIT_PROCESS_COUNT):
+        self.process_count = process_count
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._throttled_until: Dict[str, float] = {}
+
+    def reserve(self, url: str, rate_limit: Optional[RateLimit], max_wait: float) -> float:
+        """
+        Reserve a request to a webhook URL.
+
+        Args:
+            url (str): The webhook URL.
+            rate_limit (RateLimit | None): The rate limit of the subscription, or None if it has none.
+            max_wait (float): How long in seconds the request may wait before it is sent.
+
+        Returns:
+            delay (float): The time in seconds to wait before the request is sent.
+
+        Raises:
+            EndpointUnavailableError: If the URL asked not to be called for longer than `max_wait`, or its rate
+                limit does not allow a request within `max_wait`. The request must not be sent.
+        """
+        now = time.time()
+        throttle_delay = 0.0
+        throttled_until = self._throttled_until.get(url)
+        if throttled_until is not None:
+            if throttled_until <= now:
+                del self._throttled_until[url]
+            elif throttled_until - now > max_wait:
+                raise EndpointUnavailableError(url, throttled_until, "throttled by subscriber")
+            else:
+                throttle_delay = throttled_until - now
+        if rate_limit is None:
+            return throttle_delay
+
+        rate = rate_limit.requests_per_second / self.process_count
+        burst = max(1.0, rate_limit.burst / self.process_count)
+        bucket = self._buckets.get(url)
+        if bucket is None:
+            bucket = self._buckets[url] = TokenBucket(rate, burst, now)
+        elif bucket.rate != rate or bucket.burst != burst:
+            # The subscription was registered again with another limit
+            bucket.rate, bucket.burst = rate, burst
+        delay = bucket.reserve(now, max_wait)
+        if delay is None:
+            retry_at = now + (1 - bucket.tokens) / rate + random.uniform(0, burst / rate)
+            raise EndpointUnavailableError(url, retry_at, "rate limited")
+        return max(throttle_delay, delay)
+
+    def refund(self, url: str) -> None:
+        """
+        Give back the token of a request reserved with `reserve` that was not sent.
+        """
+        bucket = self._buckets.get(url)
+        if bucket is not None:
+            bucket.refund()
+
+    def throttle(self, url: str, until: float) -> None:
+        """
+        Hold back all requests to a webhook URL until a UNIX timestamp, as requested by its `Retry-After` header.
+        """
+        if until > self._throttled_until.get(url, 0.0):
+            self._throttled_until[url] = until
+
+
+# Shared rate limiter instance, used by the delivery engine
+rate_limiter = SubscriberRateLimiter()
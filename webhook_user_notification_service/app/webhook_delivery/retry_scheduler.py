@@ -0,0 +1,113 @@
+import asyncio
+import heapq
+import random
+import time
+from typing import Callable, List, Optional
+
+
+
+# Base delay (in seconds) before the first retry of a failed delivery
+RETRY_BASE_DELAY_SECONDS = 2.0
+# Upper bound (in seconds) on the delay between two attempts
+RETRY_MAX_DELAY_SECONDS = 600.0
+# Number of attempts after which a delivery is moved to the dead-letter store
+MAX_DELIVERY_ATTEMPTS = 8
+
+
+def compute_backoff(attempt: int, base_delay: float = RETRY_BASE_DELAY_SECONDS, max_delay: float = RETRY_MAX_DELAY_SECONDS) -> float:
+    """
+    Compute the delay before the next attempt of a delivery using exponential backoff with jitter.
+
+    The delay doubles with every attempt and is capped at `max_delay`. A random jitter of up to
+    half the delay is subtracted, so retries of deliveries that failed at the same moment
+    (e.g. during a subscriber outage) are spread out instead of arriving in one burst.
+
+    Args:
+        attempt (int): The number of attempts made so far (1 for the first failed attempt).
+        base_delay (float): The delay in seconds after the first failed attempt.
+        max_delay (float): The upper bound in seconds on the delay.
+
+    Returns:
+        delay (float): The delay in seconds before the next attempt.
+    """
+    delay = min(max_delay, base_delay * (2 ** max(attempt - 1, 0)))
+    return random.uniform(delay / 2, delay)
+
+
+class RetryScheduler:
+    """
+    Wake up the delivery workers when deferred deliveries become due.
+
+    Due times are kept in a min-heap, and a single background task sleeps exactly until the
+    earliest due time instead of polling the outbox. Scheduling an earlier time than the
+    current earliest one interrupts the sleep.
+
+    Attributes:
+        on_due (Callable[[], None]): Called (on the event loop) whenever a scheduled time is reached.
+    """
+
+    def __init__(self, on_due: Callable[[], None]):
+        self.on_due = on_due
+        self._due_times: List[float] = []
+        self._changed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, due_times: Optional[List[float]] = None) -> None:
+        """
+        Start the scheduler. Called once on application startup.
+
+        Args:
+            due_times (List[float] | None): Due times (UNIX timestamps) of deliveries that were
+                already deferred when the application started.
+        """
+        self._changed = asyncio.Event()
+        self._due_times = list(due_times or [])
+        heapq.heapify(self._due_times)
+        self._task = asyncio.create_task(self._run(), name="webhook-retry-scheduler")
+
+    async def stop(self) -> None:
+        """
+        Stop the scheduler. Called once on application shutdown.
+
+        Deferred deliveries stay in the outbox and are scheduled again on the next start.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def schedule(self, due_at: float) -> None:
+        """
+        Schedule a wake-up of the workers at the given time.
+
+        Args:
+            due_at (float): The UNIX timestamp at which a deferred delivery becomes visible.
+        """
+        earliest = self._due_times[0] if self._due_times else None
+        heapq.heappush(self._due_times, due_at)
+        if self._changed is not None and (earliest is None or due_at < earliest):
+            self._changed.set()
+
+    async def _run(self) -> None:
+        """
+        Sleep until the earliest due time, then notify the workers.
+        """
+        while True:
+            self._changed.clear()
+            if not self._due_times:
+                await self._changed.wait()
+                continue
+
+            delay = self._due_times[0] - time.time()
+            if delay > 0:
+                try:
+                    # Wake up early if an earlier due time is scheduled in the meantime
+                    await asyncio.wait_for(self._changed.wait(), timeout=delay)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+
+            now = time.time()
+            while self._due_times and self._due_times[0] <= now:
+                heapq.heappop(self._due_times)
+            self.on_due()
@@ -0,0 +1,125 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import httpx
+
+from .delivery_engine import delivery_engine
+from .endpoint_health import EndpointUnavailableError, endpoint_health, is_healthy_response
+from .payload_encoding import encode_event_payload
+from .payload_signing import SIGNATURE_HEADER, sign_payload
+
+
+
+# Maximum number of ping requests in flight at once
+PING_CONCURRENCY = 20
+# Timeout (in seconds) for establishing the connection to a webhook URL
+PING_CONNECT_TIMEOUT_SECONDS = 3.0
+# Timeout (in seconds) for sending the ping and reading the response
+PING_READ_TIMEOUT_SECONDS = 5.0
+
+
+async def ping_webhooks(
+    data: Dict[str, List[str]],
+    payload: Dict[str, Any],
+    signing_secrets: Optional[Dict[Tuple[str, str], str]] = None,
+    concurrency: int = PING_CONCURRENCY,
+    connect_timeout: float = PING_CONNECT_TIMEOUT_SECONDS,
+    read_timeout: float = PING_READ_TIMEOUT_SECONDS,
+) -> AsyncIterator[Tuple[bool, Dict[str, Any]]]:
+    """
+    Ping all given webhook URLs concurrently and yield each result as soon as it completes.
+
+    URLs whose circuit breaker is open are not pinged and are reported as failed right away.
+
+    Args:
+        data (Dict[str, List[str]]): A dictionary where keys are event names and values are lists of webhook URLs.
+        payload (Dict[str, Any]): The payload to send to the webhooks.
+        signing_secrets (Dict[Tuple[str, str], str] | None): The signing secret of each `(event, url)` subscription.
+            Pings to subscriptions with a secret are signed like deliveries.
+        concurrency (int): The maximum number of ping requests in flight at once.
+        connect_timeout (float): The timeout in seconds for establishing a connection.
+        read_timeout (float): The timeout in seconds for sending the ping and reading the response.
+
+    Yields:
+        (successful, entry) (Tuple[bool, Dict[str, Any]]): Whether the webhook returned a 2xx status code,
+            and the entry for `PingedWebhooks.successful_webhooks` or `PingedWebhooks.failed_webhooks`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+    signing_secrets = signing_secrets or {}
+    tasks: List[asyncio.Task] = []
+    for event, urls in data.items():
+        # Encode the payload with the event name once per event
+        body = encode_event_payload(event, payload)
+        tasks.extend(
+            asyncio.create_task(_ping(semaphore, timeout, event, url, body, signing_secrets.get((event, url))))
+            for url in urls
+        )
+
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            yield await next_result
+    finally:
+        # Stop the remaining pings if the caller stops iterating (e.g. the client disconnected)
+        for task in tasks:
+            task.cancel()
+
+
+async def _ping(
+    semaphore: asyncio.Semaphore,
+    timeout: httpx.Timeout,
+    event: str,
+    url: str,
+    body: bytes,
+    signing_secret: Optional[str],
+) -> Tuple[bool, Dict[str, Any]]:
+    """
+    Send a single ping request and describe its outcome.
+    """
+    headers = {"Content-Type": "application/json"}
+    if signing_secret:
+        headers[SIGNATURE_HEADER] = sign_payload(body, signing_secret)
+    async with semaphore:
+        try:
+            async with endpoint_health.request(url, timeout.connect) as outcome:
+                started_at = time.monotonic()
+                try:
+                    response = await delivery_engine.client.post(
+                        url,
+                        content=body,
+                        headers=headers,
+                        timeout=timeout
+                    )
+                except httpx.HTTPError:
+                    outcome.report(False, time.monotonic() - started_at)
+                    raise
+                outcome.report(is_healthy_response(response.status_code), time.monotonic() - started_at)
+        except (httpx.HTTPError, EndpointUnavailableError) as e:
+            # Handle network-related exceptions and endpoints that are known to be down
+            return False, {
+                "event": event,
+                "url": url,
+                "error": str(e) or repr(e),
+                "status_code": None  # No status code available for exceptions
+            }
+
+    if not response.is_success:
+        # Failed webhooks for non-2xx status codes
+        return False, {
+            "event": event,
+            "url": url,
+            "error": f"HTTP error: {response.reason_phrase}",
+            "status_code": response.status_code
+        }
+
+    # Parse the JSON response or use an empty dictionary if parsing fails
+    try:
+        received_payload = response.json()
+    except ValueError:
+        received_payload = {}
+    return True, {
+        "event": event,
+        "url": url,
+        "payload": received_payload,
+        "status_code": response.status_code
+    }
@@ -0,0 +1,167 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from database_management.json_backend import JsonStorageBackend
+from database_management.sqlite_backend import SqliteStorageBackend
+from pydantic_models import UserResponse
+from routers import user_router
+from routers.pagination import NDJSON_MEDIA_TYPE, iter_ndjson_lines
+import routers.user_controller
+
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "json":
+        path = tmp_path / "webhook_data.json"
+        path.write_text("{}")
+        backend = JsonStorageBackend(path)
+    else:
+        backend = SqliteStorageBackend(tmp_path / "webhook_data.db")
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def triggered(monkeypatch):
+    calls = []
+
+    async def trigger_webhooks_many(event, records):
+        calls.append((event, [record.model_dump() for record in records]))
+
+    monkeypatch.setattr(routers.user_controller, "trigger_webhooks_many", trigger_webhooks_many)
+    return calls
+
+
+@pytest.fixture
+def client(backend, triggered, monkeypatch):
+    monkeypatch.setattr(routers.user_controller, "storage", backend)
+    app = FastAPI()
+    app.include_router(user_router)
+    return TestClient(app)
+
+
+def lines(chunks, max_line_length):
+    async def stream():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [line async for line in iter_ndjson_lines(stream(), max_line_length)]
+
+    return asyncio.run(collect())
+
+
+def test_ndjson_lines_are_split_across_chunks():
+    assert lines([b'{"a"', b': 1}\n\n{"b": 2}\n{"c"', b": 3}"], 16) == [(1, b'{"a": 1}'), (3, b'{"b": 2}'), (4, b'{"c": 3}')]
+
+
+@pytest.mark.parametrize("chunks", [[b"0123456789\n"], [b"01234", b"56789", b"0"]])
+def test_ndjson_line_longer_than_the_limit_is_rejected(chunks):
+    with pytest.raises(HTTPException) as error:
+        lines([b"ok\n"] + chunks, 8)
+    assert error.value.status_code == 413
+
+
+def test_json_array_larger_than_the_byte_limit_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(routers.user_controller, "MAX_BULK_ARRAY_BYTES", 64)
+    response = client.post("/users/bulk", json=[{"username": f"user{index}"} for index in range(10)])
+    assert response.status_code == 413
+
+
+def test_ndjson_line_longer_than_the_limit_fails_the_request(client, monkeypatch):
+    monkeypatch.setattr(routers.user_controller, "iter_ndjson_lines", lambda chunks: iter_ndjson_lines(chunks, 32))
+    body = '{"username": "alice"}\n{"username": "' + "b" * 64 + '"}\n'
+    response = client.post("/users/bulk", content=body, headers={"content-type": NDJSON_MEDIA_TYPE})
+    assert response.status_code == 413
+
+
+def test_json_backend_checks_a_batch_against_itself_and_the_stored_users(tmp_path):
+    path = tmp_path / "webhook_data.json"
+    path.write_text("{}")
+    backend = JsonStorageBackend(path)
+    backend.add_user(UserResponse(username="alice"))
+
+    errors = backend.add_users([UserResponse(username=name) for name in ["ALICE", "bob", "carol", "Bob"]])
+    assert [error is None for error in errors] == [False, True, True, False]
+    assert [user.username for _, user in backend.iter_users()] == ["alice", "bob", "carol"]
+
+
+def ndjson(records):
+    return "".join(record if isinstance(record, str) else json.dumps(record) for record in records)
+
+
+def test_bulk_register_rejects_duplicates_within_the_batch_and_against_stored_users(client, backend, triggered):
+    backend.add_user(UserResponse(username="alice"))
+
+    response = client.post("/users/bulk", json=[{"username": "ALICE"}, {"username": "bob"}, {"username": "Bob"}, {}])
+
+    body = response.json()
+    assert [(result["index"], result["status_code"]) for result in body["results"]] == [(0, 400), (1, 200), (2, 400), (3, 422)]
+    assert (body["succeeded_count"], body["failed_count"]) == (1, 3)
+    assert [user["username"] for _, users in triggered for user in users] == ["bob"]
+
+
+def test_bulk_ndjson_reports_failures_by_line_number(client, triggered):
+    body = ndjson(['{"username": "alice"}\n', '{"username": \n', "\n", '{"username": "alice"}\n', '{"username": "bob"}'])
+    response = client.post("/users/bulk", content=body, headers={"content-type": NDJSON_MEDIA_TYPE})
+
+    *failures, summary = [json.loads(line) for line in response.text.splitlines()]
+    assert [(failure["line"], failure["status_code"]) for failure in failures] == [(2, 422), (4, 400)]
+    assert summary == {"type": "summary", "succeeded_count": 2, "failed_count": 2}
+
+
+def test_json_array_with_too_many_records_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(routers.user_controller, "MAX_BULK_ARRAY_SIZE", 2)
+    response = client.post("/users/bulk", json=[{"username": f"user{index}"} for index in range(3)])
+    assert response.status_code == 413
+
+
+def test_body_that_is_neither_an_array_nor_ndjson_is_rejected(client):
+    assert client.post("/users/bulk", json={"username": "alice"}).status_code == 422
+
+
+def test_webhooks_are_triggered_once_per_chunk(client, triggered, monkeypatch):
+    monkeypatch.setattr(routers.user_controller, "BULK_CHUNK_SIZE", 2)
+    body = ndjson(json.dumps({"username": f"user{index}"}) + "\n" for index in range(5))
+    client.post("/users/bulk", content=body, headers={"content-type": NDJSON_MEDIA_TYPE})
+
+    assert [(event, [user["username"] for user in users]) for event, users in triggered] == [
+        ("user_registered", ["user0", "user1"]),
+        ("user_registered", ["user2", "user3"]),
+        ("user_registered", ["user4"]),
+    ]
+
+
+def test_bulk_messages_check_senders_and_recipients(client, backend, triggered):
+    backend.add_users([UserResponse(username=name) for name in ["alice", "bob"]])
+
+    response = client.post("/users/messages/bulk", json=[
+        {"sender": "alice", "recipient": "BOB", "subject": "s", "message": "m"},
+        {"sender": "carol", "recipient": "bob", "subject": "s", "message": "m"},
+        {"sender": "alice", "recipient": "carol", "subject": "s", "message": "m"},
+        {"sender": "alice", "recipient": "Alice", "subject": "s", "message": "m"},
+        {"sender": "alice"},
+    ])
+
+    assert [result["status_code"] for result in response.json()["results"]] == [200, 400, 400, 400, 422]
+    assert [detail for detail in (result["detail"] for result in response.json()["results"][1:4])] == [
+        "Sender does not exist", "Recipient does not exist", "Sender and recipient cannot be the same",
+    ]
+    assert [(event, len(messages)) for event, messages in triggered] == [("user_send_message", 1)]
+    assert [message.message for _, message in backend.iter_messages("bob")] == ["m"]
+
+
+def test_bulk_messages_ndjson_is_chunked_like_users(client, backend, triggered, monkeypatch):
+    monkeypatch.setattr(routers.user_controller, "BULK_CHUNK_SIZE", 2)
+    backend.add_users([UserResponse(username=name) for name in ["alice", "bob"]])
+    body = ndjson(json.dumps({"sender": "alice", "recipient": "bob", "subject": "s", "message": str(index)}) + "\n" for index in range(3))
+
+    response = client.post("/users/messages/bulk", content=body, headers={"content-type": NDJSON_MEDIA_TYPE})
+
+    assert json.loads(response.text.splitlines()[-1]) == {"type": "summary", "succeeded_count": 3, "failed_count": 0}
+    assert [len(messages) for _, messages in triggered] == [2, 1]
@@ -0,0 +1,153 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import database_management.webhook_storage
+from database_management.json_backend import JsonStorageBackend
+from database_management.sqlite_backend import SqliteStorageBackend
+from routers import webhook_router
+from routers.pagination import NDJSON_MEDIA_TYPE
+import routers.webhook_controller
+
+
+
+def make_backend(kind, path):
+    if kind == "json":
+        path = path / "webhook_data.json"
+        path.write_text('{"user_registered": [], "user_send_message": []}')
+        return JsonStorageBackend(path)
+    return SqliteStorageBackend(path / "webhook_data.db")
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, tmp_path):
+    backend = make_backend(request.param, tmp_path)
+    yield backend
+    backend.close()
+
+
+def client_for(backend, monkeypatch) -> TestClient:
+    monkeypatch.setattr(database_management.webhook_storage, "storage", backend)
+    monkeypatch.setattr(routers.webhook_controller, "storage", backend)
+    app = FastAPI()
+    app.include_router(webhook_router)
+    return TestClient(app)
+
+
+@pytest.fixture
+def client(backend, monkeypatch):
+    return client_for(backend, monkeypatch)
+
+
+def webhooks(*pairs):
+    return [{"event": event, "url": url} for event, url in pairs]
+
+
+def status_codes(response):
+    return [result["status_code"] for result in response.json()["results"]]
+
+
+def test_bulk_register_applies_what_it_can(client, backend):
+    client.post("/webhook", json={"event": "user_registered", "url": "http://taken.test/"})
+
+    response = client.post("/webhooks/bulk", json={"webhooks": webhooks(
+        ("user_registered", "http://a.test/"),
+        ("user_registered", "http://taken.test/"),
+        ("invoice_paid", "http://a.test/"),
+        ("user_send_message", "http://a.test/"),
+    )})
+
+    assert status_codes(response) == [200, 400, 404, 200]
+    assert response.json()["succeeded_count"] == 2
+    assert all(result["signing_secret"] for result in response.json()["results"] if result["status_code"] == 200)
+    assert sorted(backend.webhook_urls("user_registered")) == ["http://a.test/", "http://taken.test/"]
+    assert backend.webhook_urls("user_send_message") == ["http://a.test/"]
+
+
+def test_atomic_bulk_register_rolls_back_on_any_failure(client, backend):
+    client.post("/webhook", json={"event": "user_registered", "url": "http://taken.test/"})
+
+    response = client.post("/webhooks/bulk", json={"atomic": True, "webhooks": webhooks(
+        ("user_send_message", "http://a.test/"),
+        ("user_registered", "http://taken.test/"),
+        ("user_registered", "http://b.test/"),
+    )})
+
+    assert status_codes(response) == [409, 400, 409]
+    assert response.json()["succeeded_count"] == 0
+    assert all(result["signing_secret"] is None for result in response.json()["results"])
+    assert backend.webhook_urls("user_send_message") == []
+    assert backend.webhook_urls("user_registered") == ["http://taken.test/"]
+
+
+def test_bulk_unregister_reports_every_webhook(client, backend):
+    client.post("/webhooks/bulk", json={"webhooks": webhooks(("user_registered", "http://a.test/"), ("user_registered", "http://b.test/"))})
+
+    response = client.request("DELETE", "/webhooks/bulk", json={"webhooks": webhooks(
+        ("user_registered", "http://a.test/"),
+        ("user_registered", "http://missing.test/"),
+    )})
+
+    assert status_codes(response) == [204, 404]
+    assert backend.webhook_urls("user_registered") == ["http://b.test/"]
+
+
+def test_atomic_bulk_unregister_rolls_back_on_any_failure(client, backend):
+    client.post("/webhooks/bulk", json={"webhooks": webhooks(("user_registered", "http://a.test/"))})
+
+    response = client.request("DELETE", "/webhooks/bulk", json={"atomic": True, "webhooks": webhooks(
+        ("user_registered", "http://a.test/"),
+        ("user_registered", "http://missing.test/"),
+    )})
+
+    assert status_codes(response) == [409, 404]
+    assert backend.webhook_urls("user_registered") == ["http://a.test/"]
+
+
+def import_lines(client, lines):
+    body = "".join(f"{line}\n" for line in lines)
+    response = client.post("/webhooks/import", content=body, headers={"content-type": NDJSON_MEDIA_TYPE})
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_import_reports_the_result_of_every_line(client, backend):
+    records = import_lines(client, [
+        json.dumps({"event": "invoice_paid"}),
+        json.dumps({"event": "invoice_paid", "url": "http://a.test/", "options": {"signing_secret": "kept"}}),
+        "not json",
+        json.dumps({"event": "order_shipped", "url": "http://a.test/"}),
+        json.dumps({"event": "invoice_paid", "url": "not a url"}),
+        "",
+        json.dumps({"event": "invoice_paid", "url": "http://a.test/"}),
+    ])
+
+    *results, summary = records
+    assert [(result["line"], result["status"]) for result in results] == [
+        (1, "created"), (2, "created"), (3, "failed"), (4, "failed"), (5, "failed"), (7, "exists"),
+    ]
+    assert summary == {"type": "summary", "created_count": 2, "exists_count": 1, "failed_count": 3}
+    assert backend.webhook_subscriptions("invoice_paid")["http://a.test/"]["signing_secret"] == "kept"
+
+
+def test_export_imports_into_an_empty_backend_of_either_kind(client, backend, tmp_path, monkeypatch):
+    client.post("/events", json={"event": "invoice_paid"})
+    client.post("/webhook", json={"event": "invoice_paid", "url": "http://a.test/", "content_encoding": "gzip"})
+    client.post("/webhook", json={"event": "user_*", "url": "http://b.test/", "filter": {"username": "alice"}})
+    exported = client.get("/webhooks/export").text
+
+    for kind in ("json", "sqlite"):
+        target_path = tmp_path / kind
+        target_path.mkdir()
+        target = make_backend(kind, target_path)
+        try:
+            target_client = client_for(target, monkeypatch)
+            response = target_client.post("/webhooks/import", content=exported, headers={"content-type": NDJSON_MEDIA_TYPE})
+            summary = json.loads(response.text.splitlines()[-1])
+            assert summary["failed_count"] == 0
+            assert target.all_subscriptions() == backend.all_subscriptions()
+            assert target_client.get("/webhooks/export").text == exported
+        finally:
+            target.close()
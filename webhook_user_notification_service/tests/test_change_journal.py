@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from database_management.file_storage import ChangeJournal
+from database_management.webhook_registry import WebhookRegistry
+
+
+
+@pytest.fixture
+def storage_file(tmp_path):
+    path = tmp_path / "webhook_data.json"
+    path.write_text(json.dumps({"user_registered": ["http://a.test"]}))
+    return path
+
+
+def test_journal_skips_a_torn_tail(tmp_path):
+    journal = ChangeJournal(tmp_path / "changes.journal")
+    journal.append([{"op": "add", "event": "e", "url": "http://a.test"}])
+    with journal.path.open("a") as file:
+        file.write('{"op": "add", "event": "e", "url": "http://b.')
+
+    assert [record["url"] for record in journal.read()] == ["http://a.test"]
+
+
+def test_append_after_a_torn_tail_loses_no_record(tmp_path):
+    journal = ChangeJournal(tmp_path / "changes.journal")
+    journal.append([{"op": "add", "event": "e", "url": "http://a.test"}])
+    with journal.path.open("a") as file:
+        file.write('{"op": "add", "event": "e", "url": "http://b.')
+
+    journal.append([{"op": "add", "event": "e", "url": "http://c.test"}])
+    journal.append([{"op": "add", "event": "e", "url": "http://d.test"}])
+    assert [record["url"] for record in journal.read()] == ["http://a.test", "http://c.test", "http://d.test"]
+
+
+def test_append_to_a_journal_that_is_only_a_torn_record(tmp_path):
+    journal = ChangeJournal(tmp_path / "changes.journal")
+    journal.path.write_text('{"op": "add", "event": "e", "url": "http://b.' + "x" * 10000)
+
+    journal.append([{"op": "add", "event": "e", "url": "http://c.test"}])
+    assert [record["url"] for record in journal.read()] == ["http://c.test"]
+
+
+def test_registry_recovers_from_a_crash_during_an_append(storage_file):
+    registry = WebhookRegistry(storage_file)
+    assert registry.add("user_registered", "http://b.test")
+    # A crash in the middle of writing the next record
+    with registry.journal.path.open("a") as file:
+        file.write('{"op": "add", "event": "user_registered", "url": "http://torn.')
+
+    restarted = WebhookRegistry(storage_file)
+    assert restarted.urls("user_registered") == ["http://a.test", "http://b.test"]
+    assert restarted.add("user_registered", "http://c.test")
+    assert restarted.discard("user_registered", "http://a.test")
+
+    reloaded = WebhookRegistry(storage_file)
+    assert reloaded.urls("user_registered") == ["http://b.test", "http://c.test"]
+
+
+def test_compaction_folds_the_journal_into_the_storage_file(storage_file):
+    registry = WebhookRegistry(storage_file, compaction_threshold=2)
+    registry.add("user_registered", "http://b.test")
+    registry.add("user_registered", "http://c.test")
+
+    assert list(registry.journal.read()) == []
+    assert json.loads(storage_file.read_text()) == {"user_registered": ["http://a.test", "http://b.test", "http://c.test"]}
+    assert WebhookRegistry(storage_file).urls("user_registered") == ["http://a.test", "http://b.test", "http://c.test"]
+
+
+def test_registries_of_two_processes_see_each_others_changes(storage_file):
+    first, second = WebhookRegistry(storage_file), WebhookRegistry(storage_file)
+    first.add("user_registered", "http://b.test")
+    second.add("user_registered", "http://c.test")
+
+    assert first.urls("user_registered") == ["http://a.test", "http://b.test", "http://c.test"]
+    assert second.urls("user_registered") == ["http://a.test", "http://b.test", "http://c.test"]
@@ -0,0 +1,105 @@
+import asyncio
+import gzip
+import json
+from dataclasses import asdict
+
+from webhook_delivery.delivery_batcher import BatchOptions, DeliveryBatcher
+from webhook_delivery.delivery_engine import DeliveryResult
+from webhook_delivery.delivery_outbox import OutboxDelivery
+
+
+
+class RecordingEngine:
+    """
+    Stands in for the delivery engine and records every batch instead of sending it.
+    """
+
+    def __init__(self):
+        self.batches = []
+
+    async def deliver_coalesced(self, deliveries, body, content_encoding=None):
+        self.batches.append(([delivery.id for delivery in deliveries], body, content_encoding))
+        return [DeliveryResult(delivery=delivery, success=True, status_code=200) for delivery in deliveries]
+
+
+def delivery(id: int, payload: bytes = b'{"n":0}', signing_secret=None, url="http://a.test/", **options) -> OutboxDelivery:
+    return OutboxDelivery(
+        id=id,
+        event="user_registered",
+        url=url,
+        payload=payload,
+        content_encoding=None,
+        payload_id=id,
+        attempts=1,
+        batch_options=json.dumps(asdict(BatchOptions(**options))),
+        signing_secret=signing_secret
+    )
+
+
+def run(deliveries, settle_seconds=0.0):
+    engine = RecordingEngine()
+    settled = []
+
+    async def on_sent(results):
+        settled.extend(result.delivery.id for result in results)
+
+    async def main():
+        batcher = DeliveryBatcher(engine, on_sent)
+        for item in deliveries:
+            batcher.add(item)
+        await asyncio.sleep(settle_seconds)
+        sent_before_stop = list(engine.batches)
+        await batcher.stop()
+        return sent_before_stop
+
+    sent_before_stop = asyncio.run(main())
+    return engine.batches, sent_before_stop, settled
+
+
+def test_batch_is_sent_once_it_holds_max_events():
+    batches, sent_before_stop, settled = run([delivery(index, max_events=2, max_linger_seconds=60) for index in range(5)])
+
+    assert [ids for ids, _, _ in sent_before_stop] == [[0, 1], [2, 3]]
+    assert [ids for ids, _, _ in batches] == [[0, 1], [2, 3], [4]]
+    assert sorted(settled) == [0, 1, 2, 3, 4]
+
+
+def test_batch_is_sent_before_it_would_exceed_max_bytes():
+    # Each payload is 7 bytes, so an array of two is 2 + 7 + 1 + 7 = 17 bytes and one of three 25 bytes
+    batches, sent_before_stop, _ = run([delivery(index, max_bytes=24, max_linger_seconds=60) for index in range(3)])
+
+    assert [ids for ids, _, _ in sent_before_stop] == [[0, 1]]
+    assert batches[0][1] == b'[{"n":0},{"n":0}]'
+    assert [ids for ids, _, _ in batches] == [[0, 1], [2]]
+
+
+def test_batch_is_sent_after_max_linger():
+    _, sent_before_stop, settled = run([delivery(0, max_linger_seconds=0.01)], settle_seconds=0.05)
+
+    assert [ids for ids, _, _ in sent_before_stop] == [[0]]
+    assert settled == [0]
+
+
+def test_subscriptions_with_different_signing_secrets_are_batched_apart():
+    batches, _, _ = run([
+        delivery(0, signing_secret="first", max_linger_seconds=60),
+        delivery(1, signing_secret="second", max_linger_seconds=60),
+        delivery(2, signing_secret="first", max_linger_seconds=60),
+    ])
+
+    assert sorted(ids for ids, _, _ in batches) == [[0, 2], [1]]
+
+
+def test_subscriptions_with_different_content_encodings_are_batched_apart():
+    batches, _, _ = run([
+        delivery(0, content_encoding="gzip", max_linger_seconds=60),
+        delivery(1, max_linger_seconds=60),
+        delivery(2, content_encoding="gzip", max_linger_seconds=60),
+    ])
+
+    by_ids = {tuple(ids): (body, content_encoding) for ids, body, content_encoding in batches}
+    assert set(by_ids) == {(0, 2), (1,)}
+    body, content_encoding = by_ids[(0, 2)]
+    assert content_encoding == "gzip"
+    assert gzip.decompress(body) == b'[{"n":0},{"n":0}]'
+    assert by_ids[(1,)] == (b'[{"n":0}]', None)
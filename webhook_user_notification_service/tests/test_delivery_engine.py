@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import httpx
+
+from webhook_delivery.delivery_engine import DELIVERY_ID_HEADER, WebhookDeliveryEngine
+from webhook_delivery.delivery_outbox import OutboxDelivery
+from webhook_delivery.endpoint_health import EndpointHealthTracker
+from webhook_delivery.http_client import create_http_client
+from webhook_delivery.rate_limiting import SubscriberRateLimiter
+
+
+
+def delivery(url: str = "http://a.test/webhook", id: int = 1) -> OutboxDelivery:
+    return OutboxDelivery(id=id, event="user_registered", url=url, payload=b"{}", content_encoding=None, payload_id=1, attempts=1)
+
+
+def engine_with(handler) -> WebhookDeliveryEngine:
+    engine = WebhookDeliveryEngine(health=EndpointHealthTracker(), rate_limiter=SubscriberRateLimiter())
+    engine._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return engine
+
+
+def test_http_client_bounds_the_wait_for_a_pooled_connection():
+    async def create():
+        client = create_http_client(httpx.Timeout(5.0), pool_timeout=1.5)
+        await client.aclose()
+        return client
+
+    client = asyncio.run(create())
+    assert (client.timeout.connect, client.timeout.read, client.timeout.pool) == (5.0, 5.0, 1.5)
+
+
+def test_delivery_that_times_out_waiting_for_a_connection_is_deferred():
+    def handler(request):
+        raise httpx.PoolTimeout("no connection available", request=request)
+
+    engine = engine_with(handler)
+    before = time.time()
+    (result,) = asyncio.run(engine.deliver_batch([delivery()]))
+
+    assert not result.success
+    assert result.retry_at is not None and result.retry_at > before
+    # Waiting for our own pool says nothing about the health of the endpoint
+    assert engine.health.snapshot()[0].request_count == 0
+
+
+def test_delivery_that_fails_to_connect_is_retried():
+    def handler(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    engine = engine_with(handler)
+    (result,) = asyncio.run(engine.deliver_batch([delivery()]))
+
+    assert not result.success
+    assert result.retry_at is None
+    assert engine.health.snapshot()[0].request_count == 1
+
+
+def test_every_delivery_carries_the_id_of_its_outbox_row():
+    received = []
+
+    def handler(request):
+        received.append((str(request.url), request.headers[DELIVERY_ID_HEADER]))
+        return httpx.Response(200)
+
+    engine = engine_with(handler)
+    asyncio.run(engine.deliver_batch([delivery("http://a.test/", 7), delivery("http://b.test/", 8)]))
+    asyncio.run(engine.deliver_coalesced([delivery("http://c.test/", 9), delivery("http://c.test/", 12)], b"[{},{}]"))
+
+    assert sorted(received) == [("http://a.test/", "7"), ("http://b.test/", "8"), ("http://c.test/", "9,12")]
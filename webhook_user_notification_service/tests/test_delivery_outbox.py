@@ -0,0 +1,114 @@
+import pytest
+
+from webhook_delivery.delivery_outbox import DeliveryOutbox
+
+
+
+PAYLOAD = b'{"event": "user_registered", "data": {"username": "alice"}}'
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = DeliveryOutbox(tmp_path / "outbox.db", event_weights={})
+    yield outbox
+    outbox.close()
+
+
+def append(outbox: DeliveryOutbox, event: str, *urls: str) -> None:
+    outbox.append(event, [(url, None, None, None, None) for url in urls], {None: PAYLOAD})
+
+
+def test_dequeue_leases_deliveries_until_the_visibility_timeout(outbox):
+    append(outbox, "user_registered", "http://a.test")
+
+    deliveries, leased_until = outbox.dequeue_batch(10, visibility_timeout=60)
+    assert [delivery.url for delivery in deliveries] == ["http://a.test"]
+    assert deliveries[0].attempts == 1
+    assert deliveries[0].payload == PAYLOAD
+    assert outbox.next_due_time() == leased_until
+    # Leased deliveries are invisible to other workers
+    assert outbox.dequeue_batch(10)[0] == []
+
+
+def test_expired_lease_is_handed_out_again(outbox):
+    append(outbox, "user_registered", "http://a.test")
+
+    first, _ = outbox.dequeue_batch(10, visibility_timeout=0)
+    second, _ = outbox.dequeue_batch(10)
+    assert [delivery.id for delivery in second] == [first[0].id]
+    assert second[0].attempts == 2
+
+
+def test_outboxes_sharing_a_file_never_lease_the_same_delivery(outbox, tmp_path):
+    other = DeliveryOutbox(tmp_path / "outbox.db", event_weights={})
+    try:
+        append(outbox, "user_registered", *(f"http://{index}.test" for index in range(20)))
+        leased = []
+        for _ in range(10):
+            leased += outbox.dequeue_batch(1)[0] + other.dequeue_batch(1)[0]
+        assert len(leased) == 20
+        assert len({delivery.id for delivery in leased}) == 20
+    finally:
+        other.close()
+
+
+def test_deliveries_of_an_event_share_one_payload(outbox):
+    append(outbox, "user_registered", "http://a.test", "http://b.test")
+
+    first, second = outbox.dequeue_batch(10)[0]
+    assert first.payload_id == second.payload_id
+    assert first.payload is second.payload
+
+
+def test_settle_removes_delivered_and_defers_retries(outbox):
+    append(outbox, "user_registered", "http://a.test", "http://b.test")
+    delivered, retried = outbox.dequeue_batch(10)[0]
+
+    outbox.settle([delivered], [(retried, 0.0)], [])
+    assert outbox.pending_count() == 1
+    (again,) = outbox.dequeue_batch(10)[0]
+    assert again.id == retried.id
+    assert again.attempts == 2
+
+
+def test_unsent_deliveries_do_not_use_up_an_attempt(outbox):
+    append(outbox, "user_registered", "http://a.test")
+    (delivery,) = outbox.dequeue_batch(10)[0]
+
+    outbox.settle([], [], [], unsent=[(delivery, 0.0)])
+    (again,) = outbox.dequeue_batch(10)[0]
+    assert again.attempts == 1
+
+
+def test_retries_take_a_bounded_share_of_the_batch_while_fresh_deliveries_wait(outbox):
+    append(outbox, "user_registered", *(f"http://retry-{index}.test" for index in range(8)))
+    retries = outbox.dequeue_batch(8)[0]
+    outbox.settle([], [(delivery, 0.0) for delivery in retries], [])
+    append(outbox, "user_registered", *(f"http://fresh-{index}.test" for index in range(8)))
+
+    batch = outbox.dequeue_batch(8)[0]
+    assert sum(delivery.attempts > 1 for delivery in batch) == 2
+    assert sum(delivery.attempts == 1 for delivery in batch) == 6
+
+
+def test_retries_fill_the_batch_when_no_fresh_deliveries_wait(outbox):
+    append(outbox, "user_registered", *(f"http://retry-{index}.test" for index in range(8)))
+    retries = outbox.dequeue_batch(8)[0]
+    outbox.settle([], [(delivery, 0.0) for delivery in retries], [])
+
+    assert len(outbox.dequeue_batch(8)[0]) == 8
+
+
+def test_dead_letters_can_be_replayed(outbox):
+    append(outbox, "user_registered", "http://a.test")
+    (delivery,) = outbox.dequeue_batch(10)[0]
+
+    outbox.settle([], [], [(delivery, "HTTP 500", 500)])
+    assert outbox.pending_count() == 0
+    (dead_letter,) = outbox.list_dead_letters()
+    assert (dead_letter.url, dead_letter.last_status_code, dead_letter.payload) == ("http://a.test", 500, PAYLOAD)
+
+    assert outbox.replay_dead_letters() == 1
+    assert outbox.list_dead_letters() == []
+    (replayed,) = outbox.dequeue_batch(10)[0]
+    assert (replayed.url, replayed.attempts, replayed.payload) == ("http://a.test", 1, PAYLOAD)
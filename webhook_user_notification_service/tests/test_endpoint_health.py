@@ -0,0 +1,187 @@
+import asyncio
+import sys
+
+import pytest
+
+from webhook_delivery.endpoint_health import CLOSED, HALF_OPEN, OPEN, AdaptiveConcurrencyLimit, CircuitBreaker, EndpointHealthTracker
+
+
+
+class FakeClock:
+    """
+    Stands in for the `time` module of endpoint_health, so the tests control the time.
+    """
+
+    def __init__(self, now: float = 100.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sys.modules["webhook_delivery.endpoint_health"], "time", clock)
+    return clock
+
+
+def trip(breaker: CircuitBreaker, now: float) -> None:
+    for _ in range(breaker.min_requests):
+        breaker.allow(now)
+        breaker.record(False, 0.1, now)
+
+
+def test_an_open_breaker_reports_half_open_once_it_is_due_for_a_probe():
+    breaker = CircuitBreaker("http://a.test", open_seconds=30)
+    trip(breaker, 100.0)
+
+    assert breaker.effective_state(129.9) == OPEN
+    assert breaker.effective_state(130.0) == HALF_OPEN
+    # Only `allow` moves the breaker itself on
+    assert breaker.state == OPEN
+
+
+def test_tracker_reports_the_effective_state(clock):
+    tracker = EndpointHealthTracker()
+    breaker = tracker._breaker("http://a.test")
+    breaker.open_seconds = 30
+    trip(breaker, 100.0)
+
+    clock.now = 110.0
+    assert tracker.open_count() == 1
+    assert tracker.snapshot()[0].state == OPEN
+
+    clock.now = 131.0
+    assert tracker.open_count() == 0
+    assert tracker.snapshot()[0].state == HALF_OPEN
+
+
+def test_tracker_forgets_the_least_recently_requested_endpoints():
+    tracker = EndpointHealthTracker(max_endpoints=2)
+
+    async def request(url):
+        async with tracker.request(url) as outcome:
+            outcome.report(True, 0.01)
+
+    async def run():
+        for url in ["http://a.test/1", "http://b.test/1", "http://a.test/2", "http://c.test/1"]:
+            await request(url)
+
+    asyncio.run(run())
+    assert list(tracker._breakers) == ["http://a.test/2", "http://c.test/1"]
+    assert list(tracker._limits) == ["a.test", "c.test"]
+    assert [health.state for health in tracker.snapshot()] == [CLOSED, CLOSED]
+
+
+def test_breaker_opens_probes_and_closes_again():
+    breaker = CircuitBreaker("http://a.test", min_requests=4, failure_rate_threshold=0.5, open_seconds=30)
+    for success in (True, True, False):
+        assert breaker.allow(100.0) is None
+        breaker.record(success, 0.1, 100.0)
+    assert breaker.state == CLOSED
+
+    breaker.allow(100.0)
+    breaker.record(False, 0.1, 101.0)
+    assert breaker.state == OPEN
+    assert breaker.allow(120.0) == 131.0
+
+    # Half-open: a single probe is let through, the others are held back
+    assert breaker.allow(131.0) is None
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow(131.0) is not None
+    breaker.record(True, 0.1, 132.0)
+
+    assert breaker.state == CLOSED
+    assert breaker.request_count == 0
+
+
+def test_failed_probe_keeps_the_breaker_open_for_another_period():
+    breaker = CircuitBreaker("http://a.test", open_seconds=30)
+    trip(breaker, 100.0)
+
+    breaker.allow(130.0)
+    breaker.record(False, 0.1, 131.0)
+    assert breaker.state == OPEN
+    assert breaker.allow(140.0) == 161.0
+
+
+def test_cancelled_probe_lets_the_next_request_probe():
+    breaker = CircuitBreaker("http://a.test", open_seconds=30)
+    trip(breaker, 100.0)
+
+    assert breaker.allow(130.0) is None
+    breaker.cancel()
+    assert breaker.allow(130.0) is None
+
+
+def test_failures_leave_the_rolling_window():
+    breaker = CircuitBreaker("http://a.test", window_size=4, min_requests=4, failure_rate_threshold=0.75)
+    for success in (False, False, True, True, True):
+        breaker.allow(100.0)
+        breaker.record(success, 0.1, 100.0)
+
+    assert breaker.request_count == 4
+    assert breaker.failure_rate == 0.25
+    # The failures that left the window no longer count towards the threshold
+    for _ in range(2):
+        breaker.allow(100.0)
+        breaker.record(False, 0.1, 100.0)
+    assert breaker.failure_rate == 0.5
+    assert breaker.state == CLOSED
+
+
+def test_latency_percentiles_cover_the_window():
+    breaker = CircuitBreaker("http://a.test", window_size=10)
+    for latency in range(1, 11):
+        breaker.record(True, latency / 10, 100.0)
+
+    assert breaker.latency_percentile(0.5) == 0.6
+    assert breaker.latency_percentile(0.95) == 1.0
+
+
+def test_concurrency_limit_grows_additively_and_shrinks_multiplicatively(clock):
+    limit = AdaptiveConcurrencyLimit(initial_limit=4, min_limit=1, max_limit=10, latency_target=1.0, decrease_factor=0.5)
+
+    async def request(success, latency, admitted_at=None):
+        started_at = await limit.acquire()
+        clock.now += 1
+        await limit.release(started_at if admitted_at is None else admitted_at, success, latency)
+
+    async def run():
+        await request(True, 0.2)
+        assert limit.limit == 4.25
+        # A slow response counts as congestion
+        await request(True, 2.0)
+        assert limit.limit == 2.125
+        # A request admitted before the last decrease does not decrease the limit again
+        await request(False, 0.2, admitted_at=0.0)
+        assert limit.limit == 2.125
+        await request(False, 0.2)
+        assert limit.limit == 1.0625
+        await request(False, 0.2)
+        assert limit.limit == 1
+        # A request that did not complete keeps the limit
+        await request(None, 0.0)
+        assert limit.limit == 1
+        assert limit.in_flight == 0
+
+    asyncio.run(run())
+
+
+def test_concurrency_limit_is_capped_and_admits_up_to_its_whole_part():
+    limit = AdaptiveConcurrencyLimit(initial_limit=2, max_limit=2)
+
+    async def run():
+        first = await limit.acquire()
+        await limit.acquire()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(limit.acquire(), 0.01)
+        await limit.release(first, True, 0.1)
+        assert limit.limit == 2
+        await asyncio.wait_for(limit.acquire(), 0.01)
+
+    asyncio.run(run())
@@ -0,0 +1,100 @@
+from collections import Counter
+
+import pytest
+
+from webhook_delivery.delivery_outbox import DeliveryOutbox
+from webhook_delivery.fair_scheduling import parse_event_weights, round_robin, weighted_fair_shares
+
+
+
+def test_event_weights_are_parsed_from_pairs():
+    assert parse_event_weights(None) == {}
+    assert parse_event_weights(" user_registered=4, user_send_message=0.5 ,") == {"user_registered": 4.0, "user_send_message": 0.5}
+
+
+@pytest.mark.parametrize("value", ["user_registered", "user_registered=0", "user_registered=-1", "user_registered=fast"])
+def test_malformed_event_weights_are_rejected(value):
+    with pytest.raises(ValueError):
+        parse_event_weights(value)
+
+
+def test_capacity_is_divided_in_proportion_to_the_weights():
+    shares = weighted_fair_shares({"a": 100, "b": 100}, {"a": 3}, 40)
+    assert shares == {"a": 30, "b": 10}
+
+
+def test_capacity_a_lane_cannot_use_goes_to_the_others():
+    shares = weighted_fair_shares({"flood": 1000, "quiet": 3, "empty": 0}, {}, 50)
+    assert shares == {"flood": 47, "quiet": 3, "empty": 0}
+
+
+def test_ties_go_to_the_lane_listed_first():
+    assert weighted_fair_shares({"older": 10, "newer": 10}, {}, 3) == {"older": 2, "newer": 1}
+
+
+def test_round_robin_takes_turns_between_keys_and_keeps_their_order():
+    items = [("a", 1), ("a", 2), ("a", 3), ("b", 1), ("c", 1), ("b", 2)]
+    assert round_robin(items, key=lambda item: item[0]) == [("a", 1), ("b", 1), ("c", 1), ("a", 2), ("b", 2), ("a", 3)]
+
+
+def make_outbox(tmp_path, event_weights=None) -> DeliveryOutbox:
+    return DeliveryOutbox(tmp_path / "outbox.db", event_weights=event_weights or {})
+
+
+def append(outbox: DeliveryOutbox, event: str, urls) -> None:
+    outbox.append(event, [(url, None, None, None, None) for url in urls], {None: b"{}"})
+
+
+def test_flood_of_one_event_does_not_hold_up_another(tmp_path):
+    outbox = make_outbox(tmp_path)
+    try:
+        append(outbox, "user_registered", (f"http://{index}.test" for index in range(100)))
+        append(outbox, "user_send_message", ["http://a.test", "http://b.test"])
+
+        batch = outbox.dequeue_batch(10)[0]
+        assert Counter(delivery.event for delivery in batch) == {"user_registered": 8, "user_send_message": 2}
+    finally:
+        outbox.close()
+
+
+def test_batch_is_divided_between_events_by_their_weights(tmp_path):
+    outbox = make_outbox(tmp_path, {"user_registered": 3})
+    try:
+        append(outbox, "user_send_message", (f"http://{index}.test" for index in range(50)))
+        append(outbox, "user_registered", (f"http://{index}.test" for index in range(50)))
+
+        batch = outbox.dequeue_batch(20)[0]
+        assert Counter(delivery.event for delivery in batch) == {"user_registered": 15, "user_send_message": 5}
+    finally:
+        outbox.close()
+
+
+def test_subscribers_of_an_event_take_turns_within_its_share(tmp_path):
+    outbox = make_outbox(tmp_path)
+    try:
+        for _ in range(5):
+            append(outbox, "user_registered", ["http://busy.test"])
+        append(outbox, "user_registered", ["http://quiet.test"])
+        append(outbox, "user_send_message", (f"http://{index}.test" for index in range(6)))
+
+        batch = outbox.dequeue_batch(6)[0]
+        registered = [delivery.url for delivery in batch if delivery.event == "user_registered"]
+        assert registered == ["http://busy.test", "http://quiet.test", "http://busy.test"]
+    finally:
+        outbox.close()
+
+
+def test_every_delivery_is_leased_once_across_batches(tmp_path):
+    outbox = make_outbox(tmp_path, {"user_registered": 2})
+    try:
+        append(outbox, "user_registered", (f"http://{index}.test" for index in range(30)))
+        append(outbox, "user_send_message", (f"http://{index}.test" for index in range(7)))
+        append(outbox, "invoice_paid", ["http://a.test"])
+
+        leased = []
+        while batch := outbox.dequeue_batch(8)[0]:
+            leased += batch
+        assert len(leased) == 38
+        assert len({delivery.id for delivery in leased}) == 38
+    finally:
+        outbox.close()
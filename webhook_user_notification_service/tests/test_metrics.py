@@ -0,0 +1,81 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from observability import PROMETHEUS_CONTENT_TYPE, MetricsRegistry, RequestMetricsMiddleware
+from routers import metrics_router
+
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    counter = registry.counter("webhook_events", "Events by name.", ("event",))
+    counter.labels('say "hi"\\\n').inc(2)
+
+    assert registry.render().splitlines() == [
+        "# HELP webhook_events Events by name.",
+        "# TYPE webhook_events counter",
+        'webhook_events_total{event="say \\"hi\\"\\\\\\n"} 2',
+    ]
+
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ("host",), buckets=(1.0, 0.25))
+    # A value equal to a bound falls into that bucket
+    for value in (0.125, 0.25, 0.5, 4.0):
+        histogram.labels("a.test").observe(value)
+
+    assert registry.render().splitlines() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{host="a.test",le="0.25"} 2',
+        'latency_seconds_bucket{host="a.test",le="1"} 3',
+        'latency_seconds_bucket{host="a.test",le="+Inf"} 4',
+        'latency_seconds_sum{host="a.test"} 4.875',
+        'latency_seconds_count{host="a.test"} 4',
+    ]
+
+
+def test_labels_must_match_the_label_names():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("pending", "Pending.", ("event",))
+    with pytest.raises(ValueError):
+        gauge.labels("a", "b")
+
+
+def scrape_counts(client):
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == PROMETHEUS_CONTENT_TYPE
+    return {
+        sample: int(value)
+        for sample, value in (line.rsplit(" ", 1) for line in response.text.splitlines() if not line.startswith("#"))
+        if sample.startswith("http_request_duration_seconds_count")
+    }
+
+
+def test_requests_are_recorded_by_route_template_and_scraped():
+    app = FastAPI()
+    app.add_middleware(RequestMetricsMiddleware)
+    app.include_router(metrics_router)
+
+    @app.get("/things/{thing_id}")
+    def get_thing(thing_id: int):
+        return {"id": thing_id}
+
+    client = TestClient(app)
+    # The request metrics are process-wide, so compare against the counts before the requests
+    before = scrape_counts(client)
+    assert client.get("/things/123").status_code == 200
+    assert client.get("/things/456").status_code == 200
+    assert client.get("/nowhere/789").status_code == 404
+    after = scrape_counts(client)
+
+    def increase(route, status_code):
+        sample = f'http_request_duration_seconds_count{{method="GET",route="{route}",status_code="{status_code}"}}'
+        return after.get(sample, 0) - before.get(sample, 0)
+
+    assert increase("/things/{thing_id}", 200) == 2
+    assert increase("unmatched", 404) == 1
+    assert not any("123" in sample or "/nowhere" in sample for sample in after)
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import database_management.webhook_storage
+import routers.webhook_controller
+import webhook_delivery.payload_encoding as payload_encoding
+from database_management.json_backend import JsonStorageBackend
+from pydantic_models import UserResponse, WebhookRequest
+from routers import webhook_router
+
+
+
+@pytest.mark.parametrize("standard_library", [False, True])
+def test_event_payload_is_compact_json_with_the_envelope(standard_library, monkeypatch):
+    if standard_library:
+        monkeypatch.setattr(payload_encoding, "orjson", None)
+
+    body = payload_encoding.encode_event_payload("user_registered", {"username": "alice"}, "id-1", "2025-05-07T04:03:10+00:00")
+    assert b" " not in body
+    assert json.loads(body) == {
+        "delivery_id": "id-1",
+        "timestamp": "2025-05-07T04:03:10+00:00",
+        "event": "user_registered",
+        "data": {"username": "alice"},
+    }
+
+
+def test_models_are_serialized_into_the_envelope():
+    user = UserResponse(username="alice", registered_at="2025-05-07T04:03:10+00:00")
+    body = payload_encoding.encode_event_payload("user_registered", user)
+    assert json.loads(body)["data"] == {"username": "alice", "registered_at": "2025-05-07T04:03:10+00:00"}
+
+
+def test_gzip_variant_round_trips():
+    body = payload_encoding.encode_event_payload("user_registered", {"username": "alice"})
+    variants = payload_encoding.encode_payload_variants(body, [None, "gzip"])
+    assert variants[None] == body
+    assert payload_encoding.decompress_payload(variants["gzip"], "gzip") == body
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    path = tmp_path / "webhook_data.json"
+    path.write_text('{"user_registered": []}')
+    backend = JsonStorageBackend(path)
+    monkeypatch.setattr(database_management.webhook_storage, "storage", backend)
+    monkeypatch.setattr(routers.webhook_controller, "storage", backend)
+    app = FastAPI()
+    app.include_router(webhook_router)
+    yield TestClient(app)
+    backend.close()
+
+
+def test_model_leaves_the_codec_check_to_the_router(monkeypatch):
+    monkeypatch.setattr(payload_encoding, "zstandard", None)
+    assert WebhookRequest(event="user_registered", url="http://a.test", content_encoding="zstd").content_encoding == "zstd"
+
+
+def test_registration_rejects_an_encoding_whose_codec_is_missing(client, monkeypatch):
+    monkeypatch.setattr(routers.webhook_controller, "is_supported_encoding", lambda content_encoding: content_encoding == "gzip")
+
+    webhook = {"event": "user_registered", "url": "http://a.test", "content_encoding": "gzip"}
+    assert client.post("/webhook", json=webhook).status_code == 200
+    response = client.post("/webhook", json={**webhook, "url": "http://b.test", "content_encoding": "zstd"})
+    assert response.status_code == 422
+    assert "zstd" in response.json()["detail"]
+
+    bulk = client.post("/webhooks/bulk", json={"webhooks": [{**webhook, "url": "http://c.test"}, {**webhook, "url": "http://d.test", "content_encoding": "zstd"}]})
+    assert bulk.status_code == 422
+    assert client.get("/webhooks", params={"event_filter": "user_registered"}).json()["webhooks"][0]["urls"] == ["http://a.test/"]
+
+    imported = client.post("/webhooks/import", content=json.dumps({**webhook, "options": {"content_encoding": "zstd"}}) + "\n")
+    result = json.loads(imported.text.splitlines()[0])
+    assert result["status"] == "failed" and "zstd" in result["detail"]
+
+
+def test_registration_accepts_zstd_when_the_codec_is_installed(client, monkeypatch):
+    monkeypatch.setattr(routers.webhook_controller, "is_supported_encoding", lambda content_encoding: True)
+
+    webhook = {"event": "user_registered", "url": "http://a.test", "content_encoding": "zstd"}
+    assert client.post("/webhook", json=webhook).status_code == 200
@@ -0,0 +1,136 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from webhook_delivery.delivery_engine import WebhookDeliveryEngine
+from webhook_delivery.delivery_outbox import OutboxDelivery
+from webhook_delivery.endpoint_health import EndpointHealthTracker, EndpointUnavailableError
+from webhook_delivery.rate_limiting import RETRY_AFTER_MAX_SECONDS, RateLimit, SubscriberRateLimiter, TokenBucket, parse_retry_after
+
+
+
+class FakeClock:
+    """
+    Stands in for the `time` module of rate_limiting, so the tests control the time.
+    """
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(sys.modules["webhook_delivery.rate_limiting"], "time", clock)
+    return clock
+
+
+def test_bucket_serves_the_burst_then_spaces_requests_evenly():
+    bucket = TokenBucket(rate=2.0, burst=3, now=0.0)
+
+    assert [bucket.reserve(0.0, 10.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve(0.0, 10.0) == 0.5
+    assert bucket.reserve(0.0, 10.0) == 1.0
+    # A request that would wait too long reserves nothing
+    assert bucket.reserve(0.0, 1.0) is None
+    assert bucket.tokens == -2.0
+
+
+def test_bucket_refills_up_to_its_burst():
+    bucket = TokenBucket(rate=1.0, burst=2, now=0.0)
+    bucket.reserve(0.0, 0.0)
+    bucket.reserve(0.0, 0.0)
+
+    assert bucket.reserve(100.0, 0.0) == 0.0
+    assert bucket.tokens == 1.0
+    bucket.refund()
+    bucket.refund()
+    assert bucket.tokens == 2.0
+
+
+def test_rate_limited_url_is_deferred_once_it_would_wait_too_long(clock):
+    limiter = SubscriberRateLimiter(process_count=1)
+    rate_limit = RateLimit(requests_per_second=1.0, burst=2)
+
+    assert limiter.reserve("http://a.test", rate_limit, 0.5) == 0.0
+    assert limiter.reserve("http://a.test", rate_limit, 0.5) == 0.0
+    with pytest.raises(EndpointUnavailableError) as error:
+        limiter.reserve("http://a.test", rate_limit, 0.5)
+    # Deferred until a token is available, spread over the time it takes to refill the burst
+    assert 1001.0 <= error.value.retry_at <= 1003.0
+    # Other URLs have their own bucket, URLs without a limit are never held back
+    assert limiter.reserve("http://b.test", rate_limit, 0.5) == 0.0
+    assert limiter.reserve("http://c.test", None, 0.5) == 0.0
+
+
+def test_every_process_enforces_its_share_of_the_rate(clock):
+    limiter = SubscriberRateLimiter(process_count=4)
+    rate_limit = RateLimit(requests_per_second=8.0, burst=8)
+
+    assert [limiter.reserve("http://a.test", rate_limit, 10.0) for _ in range(3)] == [0.0, 0.0, 0.5]
+
+
+def test_process_count_is_read_from_webhook_workers():
+    app = Path(__file__).parent.parent / "app"
+    output = subprocess.run(
+        [sys.executable, "-c", "from webhook_delivery.rate_limiting import rate_limiter; print(rate_limiter.process_count)"],
+        cwd=app,
+        env={**os.environ, "WEBHOOK_WORKERS": "3"},
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    assert output.strip() == "3"
+
+
+def test_throttled_url_is_held_back_until_its_retry_after(clock):
+    limiter = SubscriberRateLimiter()
+    limiter.throttle("http://a.test", 1010.0)
+
+    assert limiter.reserve("http://a.test", None, 30.0) == 10.0
+    with pytest.raises(EndpointUnavailableError) as error:
+        limiter.reserve("http://a.test", None, 5.0)
+    assert error.value.retry_at == 1010.0
+
+    clock.now = 1010.0
+    assert limiter.reserve("http://a.test", None, 5.0) == 0.0
+
+
+def test_retry_after_is_parsed_from_seconds_and_dates():
+    assert parse_retry_after("120", 1000.0) == 1120.0
+    assert parse_retry_after("Thu, 01 Jan 1970 00:20:00 GMT", 1000.0) == 1200.0
+    assert parse_retry_after("-5", 1000.0) == 1000.0
+    assert parse_retry_after(str(RETRY_AFTER_MAX_SECONDS * 2), 0.0) == RETRY_AFTER_MAX_SECONDS
+    assert parse_retry_after("soon", 1000.0) is None
+    assert parse_retry_after(None, 1000.0) is None
+
+
+def test_429_with_retry_after_throttles_the_url():
+    limiter = SubscriberRateLimiter()
+    engine = WebhookDeliveryEngine(health=EndpointHealthTracker(), rate_limiter=limiter, host_wait_timeout=1.0)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(429, headers={"Retry-After": "60"})
+
+    engine._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    delivery = OutboxDelivery(id=1, event="user_registered", url="http://a.test/", payload=b"{}", content_encoding=None, payload_id=1, attempts=1)
+
+    before = time.time()
+    (first,) = asyncio.run(engine.deliver_batch([delivery]))
+    assert first.status_code == 429
+    assert before + 60 <= first.retry_after <= time.time() + 60
+
+    (second,) = asyncio.run(engine.deliver_batch([delivery]))
+    assert len(requests) == 1
+    assert second.retry_at == pytest.approx(first.retry_after)
@@ -0,0 +1,94 @@
+import asyncio
+import sys
+import time
+
+import pytest
+
+from webhook_delivery.delivery_engine import DeliveryResult
+from webhook_delivery.delivery_outbox import DeliveryOutbox
+from webhook_delivery.delivery_workers import DeliveryWorkerPool
+from webhook_delivery.retry_scheduler import compute_backoff
+
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = DeliveryOutbox(tmp_path / "outbox.db", event_weights={})
+    outbox.append("user_registered", [("http://a.test", None, None, None, None)], {None: b"{}"})
+    yield outbox
+    outbox.close()
+
+
+@pytest.mark.parametrize("attempt, full_delay", [(1, 2.0), (2, 4.0), (3, 8.0), (6, 64.0), (10, 600.0), (40, 600.0)])
+def test_backoff_doubles_per_attempt_with_jitter_up_to_the_cap(attempt, full_delay):
+    delays = [compute_backoff(attempt) for _ in range(200)]
+    assert all(full_delay / 2 <= delay <= full_delay for delay in delays)
+    # The jitter spreads retries that failed at the same moment
+    assert len(set(delays)) > 1
+
+
+def test_failed_delivery_is_retried_until_it_is_dead_lettered(outbox, monkeypatch):
+    # The package exports the worker pool instance under the name of its module
+    monkeypatch.setattr(sys.modules["webhook_delivery.delivery_workers"], "compute_backoff", lambda attempt: 0.0)
+    pool = DeliveryWorkerPool(outbox, engine=None, max_attempts=3)
+
+    for attempt in range(1, 4):
+        (delivery,) = outbox.dequeue_batch(10)[0]
+        assert delivery.attempts == attempt
+        asyncio.run(pool._settle([DeliveryResult(delivery, success=False, status_code=500, error="HTTP 500", duration=0.1)]))
+
+    assert outbox.pending_count() == 0
+    (dead_letter,) = outbox.list_dead_letters()
+    assert (dead_letter.attempts, dead_letter.last_error, dead_letter.last_status_code) == (3, "HTTP 500", 500)
+
+
+def test_retry_is_deferred_by_the_backoff(outbox):
+    pool = DeliveryWorkerPool(outbox, engine=None)
+    (delivery,) = outbox.dequeue_batch(10)[0]
+
+    before = time.time()
+    asyncio.run(pool._settle([DeliveryResult(delivery, success=False, error="timeout", duration=1.0)]))
+    assert outbox.dequeue_batch(10)[0] == []
+    assert before + 1.0 <= outbox.next_due_time() <= time.time() + 2.0
+
+
+def test_retry_is_not_made_before_retry_after(outbox):
+    pool = DeliveryWorkerPool(outbox, engine=None)
+    (delivery,) = outbox.dequeue_batch(10)[0]
+
+    retry_after = time.time() + 120
+    asyncio.run(pool._settle([
+        DeliveryResult(delivery, success=False, status_code=429, error="HTTP 429", duration=0.1, retry_after=retry_after)
+    ]))
+    assert outbox.next_due_time() == retry_after
+
+
+def test_delivered_delivery_is_removed(outbox):
+    pool = DeliveryWorkerPool(outbox, engine=None)
+    (delivery,) = outbox.dequeue_batch(10)[0]
+
+    asyncio.run(pool._settle([DeliveryResult(delivery, success=True, status_code=200, duration=0.1)]))
+    assert outbox.pending_count() == 0
+    assert outbox.list_dead_letters() == []
+
+
+def test_delivery_to_an_unavailable_endpoint_is_deferred_without_using_up_an_attempt(outbox):
+    pool = DeliveryWorkerPool(outbox, engine=None, max_attempts=1, max_age=3600)
+
+    for _ in range(3):
+        (delivery,) = outbox.dequeue_batch(10)[0]
+        assert delivery.attempts == 1
+        asyncio.run(pool._settle([DeliveryResult(delivery, success=False, error="Circuit open", retry_at=time.time())]))
+
+    assert outbox.pending_count() == 1
+    assert outbox.list_dead_letters() == []
+
+
+def test_delivery_to_an_endpoint_unavailable_for_too_long_is_dead_lettered(outbox):
+    pool = DeliveryWorkerPool(outbox, engine=None, max_age=0)
+    (delivery,) = outbox.dequeue_batch(10)[0]
+
+    asyncio.run(pool._settle([DeliveryResult(delivery, success=False, error="Circuit open", retry_at=time.time() + 60)]))
+    assert outbox.pending_count() == 0
+    (dead_letter,) = outbox.list_dead_letters()
+    assert (dead_letter.attempts, dead_letter.last_error, dead_letter.last_status_code) == (0, "Circuit open", None)
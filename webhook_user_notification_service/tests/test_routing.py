@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import database_management.webhook_storage as webhook_storage
+from database_management import read, patterns, route, iter_send, signing_secrets
+from database_management.json_backend import JsonStorageBackend
+from database_management.webhook_routing import RoutingTable
+from routers import webhook_router
+
+
+
+def urls(routes):
+    return [route.url for route in routes]
+
+
+def test_wildcard_subscriptions_match_by_prefix():
+    table = RoutingTable({
+        "user_registered": {"http://exact.test": {}},
+        "user_*": {"http://user.test": {}},
+        "*": {"http://all.test": {}},
+        "order_*": {"http://order.test": {}},
+    })
+
+    assert urls(table.match("user_registered", dict)) == ["http://exact.test", "http://user.test", "http://all.test"]
+    assert urls(table.match("user_deleted", dict)) == ["http://user.test", "http://all.test"]
+    assert urls(table.match("invoice_paid", dict)) == ["http://all.test"]
+
+
+def test_filters_only_deliver_matching_payloads():
+    table = RoutingTable({
+        "user_send_message": {
+            "http://alice.test": {"filter": {"recipient": "alice"}},
+            "http://team.test": {"filter": {"recipient": ["alice", "bob"], "sender": "carol"}},
+        },
+    })
+
+    assert urls(table.match("user_send_message", lambda: {"recipient": "alice", "sender": "dave"})) == ["http://alice.test"]
+    assert urls(table.match("user_send_message", lambda: {"recipient": "bob", "sender": "carol"})) == ["http://team.test"]
+    assert urls(table.match("user_send_message", lambda: {"sender": "carol"})) == []
+
+
+def test_url_is_delivered_once_through_its_most_specific_accepting_subscription():
+    table = RoutingTable({
+        "user_send_message": {"http://a.test": {"filter": {"recipient": "alice"}, "content_encoding": "gzip"}},
+        "user_*": {"http://a.test": {}},
+    })
+
+    (for_alice,) = table.match("user_send_message", lambda: {"recipient": "alice"})
+    assert for_alice.options["content_encoding"] == "gzip"
+    (for_bob,) = table.match("user_send_message", lambda: {"recipient": "bob"})
+    assert for_bob.options == {}
+
+
+def test_routes_ignore_filters_and_list_every_url_once():
+    table = RoutingTable({
+        "user_send_message": {"http://a.test": {"filter": {"recipient": "alice"}}},
+        "user_*": {"http://a.test": {}, "http://b.test": {}},
+    })
+
+    assert urls(table.routes("user_send_message")) == ["http://a.test", "http://b.test"]
+
+
+def test_filters_are_not_evaluated_without_filtered_subscriptions():
+    table = RoutingTable({"user_*": {"http://a.test": {}}})
+
+    def data():
+        raise AssertionError("the payload was serialized")
+
+    assert urls(table.match("user_registered", data)) == ["http://a.test"]
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    path = tmp_path / "webhook_data.json"
+    path.write_text('{"user_registered": ["http://exact.test"], "user_send_message": [], "invoice_paid": []}')
+    storage = JsonStorageBackend(path)
+    storage.add_webhook("user_*", "http://user.test", {"signing_secret": "user-secret"})
+    storage.add_webhook("user_send_message", "http://filtered.test", {"filter": {"recipient": "alice"}})
+    monkeypatch.setattr(webhook_storage, "storage", storage)
+    yield storage
+    storage.close()
+
+
+def test_route_resolves_wildcards_and_filters(storage):
+    assert urls(route("user_send_message", {"recipient": "alice"})) == ["http://filtered.test", "http://user.test"]
+    assert urls(route("user_send_message", {"recipient": "bob"})) == ["http://user.test"]
+    assert urls(route("invoice_paid", {})) == []
+
+
+def test_read_lists_events_with_their_wildcard_subscribers(storage):
+    assert read() == {
+        "user_registered": ["http://exact.test", "http://user.test"],
+        "user_send_message": ["http://filtered.test", "http://user.test"],
+        "invoice_paid": [],
+    }
+    assert read("user_send_message") == {"user_send_message": ["http://filtered.test", "http://user.test"]}
+    assert patterns() == {"user_*": ["http://user.test"]}
+
+
+def test_read_does_not_treat_a_pattern_as_an_event(storage):
+    with pytest.raises(webhook_storage.WebhookEventNotFoundError):
+        read("user_*")
+
+
+def test_ping_targets_the_event_names_with_the_secrets_of_the_matched_subscriptions(storage, monkeypatch):
+    pinged = {}
+
+    async def ping_webhooks(data, payload, signing_secrets):
+        pinged.update(data=data, signing_secrets=signing_secrets)
+        yield True, {}
+
+    monkeypatch.setattr(webhook_storage, "ping_webhooks", ping_webhooks)
+    data = read("user_registered")
+    secrets = signing_secrets(data)
+
+    def no_storage_io():
+        raise AssertionError("the routing table was read while pinging")
+
+    monkeypatch.setattr(webhook_storage, "routing_table", no_storage_io)
+
+    async def ping():
+        return [result async for result in iter_send(data, {"message": "ping"}, secrets)]
+
+    asyncio.run(ping())
+    assert pinged["data"] == {"user_registered": ["http://exact.test", "http://user.test"]}
+    assert pinged["signing_secrets"] == {("user_registered", "http://user.test"): "user-secret"}
+
+
+def test_get_webhooks_lists_patterns_apart_from_events(storage):
+    app = FastAPI()
+    app.include_router(webhook_router)
+    client = TestClient(app)
+
+    body = client.get("/webhooks").json()
+    assert [webhook["event"] for webhook in body["webhooks"]] == ["user_registered", "user_send_message", "invoice_paid"]
+    assert body["patterns"] == [{"event": "user_*", "urls": ["http://user.test"]}]
+    assert client.get("/webhooks", params={"event_filter": "user_*"}).status_code == 404
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from database_management.json_backend import JsonStorageBackend
+from database_management.sqlite_backend import SqliteStorageBackend
+from pydantic_models import SendMessageResponse, UserResponse
+from routers import user_router
+from routers.pagination import NEXT_CURSOR_HEADER
+import routers.user_controller
+
+
+
+START = datetime(2025, 5, 7, 4, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "json":
+        path = tmp_path / "webhook_data.json"
+        path.write_text("{}")
+        backend = JsonStorageBackend(path)
+    else:
+        backend = SqliteStorageBackend(tmp_path / "webhook_data.db")
+    # One user per minute, the first one without microseconds
+    for minute in range(5):
+        registered_at = START + timedelta(minutes=minute, microseconds=minute * 1000)
+        backend.add_user(UserResponse(username=f"user{minute}", registered_at=registered_at.isoformat()))
+    yield backend
+    backend.close()
+
+
+@pytest.fixture
+def client(backend, monkeypatch):
+    monkeypatch.setattr(routers.user_controller, "storage", backend)
+    app = FastAPI()
+    app.include_router(user_router)
+    return TestClient(app)
+
+
+def usernames(users):
+    return [user.username if isinstance(user, UserResponse) else user["username"] for user in users]
+
+
+def test_since_compares_times_rather_than_strings(backend):
+    # 06:02 in UTC+2 is 04:02 UTC, a string comparison would place it after every user
+    since = datetime(2025, 5, 7, 6, 2, tzinfo=timezone(timedelta(hours=2)))
+    assert usernames(user for _, user in backend.iter_users(since=since)) == ["user2", "user3", "user4"]
+
+
+def test_since_includes_a_user_registered_at_exactly_that_time(backend):
+    assert usernames(user for _, user in backend.iter_users(since=START)) == [f"user{minute}" for minute in range(5)]
+    since = START + timedelta(minutes=1, microseconds=1000)
+    assert usernames(user for _, user in backend.iter_users(since=since)) == ["user1", "user2", "user3", "user4"]
+
+
+def test_naive_since_is_taken_as_utc(backend):
+    since = datetime(2025, 5, 7, 4, 3, 1)
+    assert usernames(user for _, user in backend.iter_users(since=since)) == ["user4"]
+
+
+def test_since_and_after_combine(backend):
+    (cursor, _), *_ = backend.iter_users(since=START + timedelta(minutes=1))
+    assert usernames(user for _, user in backend.iter_users(after=cursor, since=START)) == ["user2", "user3", "user4"]
+
+
+def test_since_filters_messages(backend):
+    for minute in range(3):
+        received_at = (START + timedelta(minutes=minute)).isoformat()
+        backend.add_message(SendMessageResponse(sender="user0", recipient="user1", subject="s", message=str(minute), received_at=received_at))
+
+    since = datetime(2025, 5, 7, 0, 1, tzinfo=timezone(timedelta(hours=-4)))
+    assert [message.message for _, message in backend.iter_messages("USER1", since=since)] == ["1", "2"]
+
+
+def test_get_users_without_page_parameters_returns_all_users(client, monkeypatch):
+    monkeypatch.setattr(routers.user_controller, "DEFAULT_PAGE_SIZE", 2)
+
+    response = client.get("/users")
+    assert usernames(response.json()) == [f"user{minute}" for minute in range(5)]
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_get_users_pages_with_a_cursor(client):
+    first = client.get("/users", params={"limit": 2})
+    assert usernames(first.json()) == ["user0", "user1"]
+
+    second = client.get("/users", params={"limit": 2, "after": first.headers[NEXT_CURSOR_HEADER]})
+    assert usernames(second.json()) == ["user2", "user3"]
+
+
+def test_get_users_parses_since(client):
+    response = client.get("/users", params={"since": "2025-05-07T06:03:00+02:00"})
+    assert usernames(response.json()) == ["user3", "user4"]
+
+
+def test_get_users_rejects_an_invalid_since(client):
+    assert client.get("/users", params={"since": "yesterday"}).status_code == 422
@@ -0,0 +1,111 @@
+import sqlite3
+
+import pytest
+
+from database_management import UserAlreadyExistsError
+from database_management.json_backend import JsonStorageBackend
+from database_management.sqlite_backend import SqliteStorageBackend
+from pydantic_models import SendMessageResponse, UserResponse
+
+
+
+REGISTERED_AT = "2025-05-07T04:00:00+00:00"
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "json":
+        path = tmp_path / "webhook_data.json"
+        path.write_text("{}")
+        backend = JsonStorageBackend(path)
+    else:
+        backend = SqliteStorageBackend(tmp_path / "webhook_data.db")
+    yield backend
+    backend.close()
+
+
+def message(recipient: str, text: str) -> SendMessageResponse:
+    return SendMessageResponse(sender="bob", recipient=recipient, subject="s", message=text, received_at=REGISTERED_AT)
+
+
+def test_usernames_are_compared_with_unicode_case_folding(backend):
+    backend.add_user(UserResponse(username="Straße", registered_at=REGISTERED_AT))
+
+    assert backend.get_user("STRASSE").username == "Straße"
+    with pytest.raises(UserAlreadyExistsError):
+        backend.add_user(UserResponse(username="strasse", registered_at=REGISTERED_AT))
+    errors = backend.add_users([UserResponse(username="STRASSE", registered_at=REGISTERED_AT)])
+    assert isinstance(errors[0], UserAlreadyExistsError)
+
+
+def test_users_are_looked_up_together_by_the_requested_names(backend):
+    backend.add_users([UserResponse(username=name, registered_at=REGISTERED_AT) for name in ("Straße", "Ångström", "bob")])
+
+    found = backend.get_users(["STRASSE", "åNGSTRÖM", "bob", "carol"])
+    assert {requested: user.username for requested, user in found.items()} == {
+        "STRASSE": "Straße",
+        "åNGSTRÖM": "Ångström",
+        "bob": "bob",
+    }
+
+
+def test_messages_are_found_by_the_folded_recipient(backend):
+    backend.add_message(message("Straße", "1"))
+    backend.add_messages([message("STRASSE", "2"), message("strase", "3")])
+
+    assert [message.message for _, message in backend.iter_messages("strasse")] == ["1", "2"]
+
+
+def create_database_without_keys(path, usernames):
+    # The schema before the case-folded key columns
+    connection = sqlite3.connect(path)
+    connection.executescript("""
+        CREATE TABLE users (id INTEGER PRIMARY KEY AUTOINCREMENT, username TEXT NOT NULL, registered_at TEXT NOT NULL);
+        CREATE UNIQUE INDEX idx_users_username ON users (username COLLATE NOCASE);
+        CREATE TABLE messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sender TEXT NOT NULL,
+            recipient TEXT NOT NULL,
+            subject TEXT NOT NULL,
+            message TEXT NOT NULL,
+            received_at TEXT NOT NULL
+        );
+        CREATE INDEX idx_messages_recipient ON messages (recipient COLLATE NOCASE, id);
+    """)
+    connection.executemany("INSERT INTO users (username, registered_at) VALUES (?, ?)", [(name, REGISTERED_AT) for name in usernames])
+    connection.execute(
+        "INSERT INTO messages (sender, recipient, subject, message, received_at) VALUES ('bob', 'Straße', 's', 'hello', ?)",
+        (REGISTERED_AT,)
+    )
+    connection.commit()
+    connection.close()
+
+
+def test_existing_database_is_migrated_to_case_folded_keys(tmp_path):
+    path = tmp_path / "webhook_data.db"
+    create_database_without_keys(path, ["Straße", "bob"])
+
+    backend = SqliteStorageBackend(path)
+    try:
+        assert backend.get_user("STRASSE").username == "Straße"
+        assert [message.message for _, message in backend.iter_messages("STRASSE")] == ["hello"]
+        with pytest.raises(UserAlreadyExistsError):
+            backend.add_user(UserResponse(username="BOB", registered_at=REGISTERED_AT))
+    finally:
+        backend.close()
+
+    # Opening the migrated database again changes nothing
+    backend = SqliteStorageBackend(path)
+    try:
+        assert backend.get_user("strasse").username == "Straße"
+    finally:
+        backend.close()
+
+
+def test_migration_refuses_users_that_only_differ_in_case(tmp_path):
+    path = tmp_path / "webhook_data.db"
+    # `COLLATE NOCASE` only folds ASCII letters, so it let both users in
+    create_database_without_keys(path, ["Straße", "STRASSE"])
+
+    with pytest.raises(RuntimeError, match="Straße, STRASSE"):
+        SqliteStorageBackend(path)